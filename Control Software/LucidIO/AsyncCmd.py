@@ -0,0 +1,194 @@
+'''
+Created on 17.10.2026
+
+asyncio variants of the LucidControl commands
+'''
+import IoReturn
+import struct
+from Cmd import _Opc, TxCmd, RxCmd
+
+
+buffer = memoryview
+
+class AsyncRxCmd(RxCmd):
+    '''
+    Reply frame decoder reading from an AsyncCom
+    '''
+    async def receive(self):
+        ret = 0
+        com = self.com
+        self.data = com.rxData[0]
+               
+        ioRet = await com.read(com.rxHeader, 2)
+        
+        if (ioRet == True):
+            ret += 2
+            self.status = com.rxBuffer[0]
+            
+            if (self.status == IoReturn.IoReturn.IO_RETURN_OK):
+                expectedBytes = com.rxBuffer[1]
+                if(expectedBytes != 0):
+                    ioRet = await com.read(com.rxData[expectedBytes],
+                                           expectedBytes)
+                    
+                    if (ioRet == True):
+                        self.data = com.rxData[expectedBytes]
+                        ret += expectedBytes
+                    else:
+                        self.status = IoReturn.IoReturn.IO_RETURN_ERR_INTERNAL
+                        ret = -1
+        else:
+            # Timeout, no reply received
+            self.status = IoReturn.IoReturn.IO_RETURN_ERR_INTERNAL
+            ret = -1
+        return ret
+
+
+class AsyncCmd(object):
+    '''
+    Coroutine versions of the Cmd methods
+
+    Every command holds the lock of the AsyncCom from encoding until its
+    reply is decoded, so commands of concurrent tasks never interleave on
+    the wire.
+    '''
+    async def _exchange(self):
+        self.txCmd.transmit()
+        await self.com.drain()
+        await self.rxCmd.receive()
+        return self.rxCmd.status
+
+    async def getIo(self, channel, value):
+        async with self.com.lock:
+            self.txCmd.initCmd(_Opc.OPC_GETIO, channel, value._valueType)
+            ret = await self._exchange()
+            
+            if (ret == IoReturn.IoReturn.IO_RETURN_OK):
+                value._unpackFrom(self.com.rxBuffer, 2)
+        return ret
+        
+    
+    async def getIoGroup(self, channels, values):
+        channelMask = 0
+        valueToken = values[0]._valueType
+        # Build Channel Mask and count values
+        for i in range(0, len(channels)):
+            if (channels[i] == True):
+                channelMask |= (1 << i)
+        
+        async with self.com.lock:
+            self.txCmd.initCmd(_Opc.OPC_GETIO_GROUP, channelMask, valueToken)
+            ret = await self._exchange()
+            
+            if ret == IoReturn.IoReturn.IO_RETURN_OK:
+                j = 0
+                for i in range(0, len(channels)):
+                    if channels[i] == False:
+                        continue
+                    
+                    values[i]._channel = i
+                    values[i]._unpackFrom(self.com.rxBuffer,
+                                          2 + values[i]._size * j)
+                    
+                    # Marker in data frame
+                    j = j + 1
+        return ret
+        
+    
+    async def setIo(self, channel, value):
+        async with self.com.lock:
+            self.txCmd.initCmd(_Opc.OPC_SETIO, channel, value._valueType)
+            self.txCmd.appendValue(value)
+            return await self._exchange()
+
+    
+    async def setIoGroup(self, channels, values):
+        channelMask = 0
+        for i in range(0, len(channels)):
+            if channels[i] == True:
+                channelMask |= (1 << i)
+        
+        async with self.com.lock:
+            self.txCmd.initCmd(_Opc.OPC_SETIO_GROUP, channelMask,
+                               values[0]._valueType)
+            
+            # Fill data
+            for i in range(0, len(channels)):
+                if channels[i] == True:
+                    self.txCmd.appendValue(values[i])
+            
+            return await self._exchange()
+
+    
+    async def getParam(self, pAddress, channel, data):
+        d = bytearray(struct.pack("<H", pAddress))
+        
+        async with self.com.lock:
+            self.txCmd.initCmdData(_Opc.OPC_GETPARAM, channel, 0, d)
+            ret = await self._exchange()
+            
+            if ret == IoReturn.IoReturn.IO_RETURN_OK:
+                data += self.rxCmd.data
+        return ret
+            
+    
+    async def setParam(self, pAddress, channel, persistent, data):
+        p2 = 0
+        
+        if persistent == True:
+            p2 |= 0x80
+            
+        d = bytearray(struct.pack('<H', pAddress))
+        d += data
+        
+        async with self.com.lock:
+            self.txCmd.initCmdData(_Opc.OPC_SETPARAM, channel, p2, d)
+            return await self._exchange()
+    
+
+    async def setParamDefault(self, pAddress, channel, persistent):
+        # Set Default Flag
+        p2 = 0x01
+        
+        if persistent == True:
+            p2 |= 0x80
+            
+        d = bytearray(struct.pack("<H", pAddress))
+        
+        async with self.com.lock:
+            self.txCmd.initCmdData(_Opc.OPC_SETPARAM, channel, p2, d)
+            return await self._exchange()
+    
+
+    async def identify(self, options, lId):
+        async with self.com.lock:
+            self.txCmd.initCmd(_Opc.OPC_GETID, 0, options)
+            ret = await self._exchange()
+            
+            if ret == IoReturn.IoReturn.IO_RETURN_OK:
+                data = self.rxCmd.data
+                lId.revisionFw = struct.unpack("<H", buffer(data[0:2]))[0]
+                lId.revisionHw = struct.unpack("B", buffer(data[2:3]))[0]
+                lId.deviceClass = struct.unpack("<H", buffer(data[3:5]))[0]
+                lId.deviceType = struct.unpack("<H", buffer(data[5:7]))[0]
+                lId.deviceSnr = struct.unpack("<I", buffer(data[7:11]))[0]
+                lId.validData = True
+        return ret
+    
+    async def calibrateIo(self, channel, options, persistent):
+        if persistent == True:
+            options |= 0x80
+        
+        async with self.com.lock:
+            self.txCmd.initCmd(_Opc.OPC_CALIBIO, channel, options)
+            return await self._exchange()
+    
+    def __init__(self, com):
+        self.com = com
+        
+        # Frame encoder and decoder are shared by all commands of a Com
+        if (com.txCmd == None):
+            com.txCmd = TxCmd(com)
+            com.rxCmd = AsyncRxCmd(com)
+        self.txCmd = com.txCmd
+        self.rxCmd = com.rxCmd
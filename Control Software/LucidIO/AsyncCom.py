@@ -0,0 +1,90 @@
+'''
+Created on 17.10.2026
+
+asyncio based communication with LucidControl modules. Requires the
+pyserial-asyncio package.
+'''
+
+import asyncio
+import serial_asyncio
+
+from Com import Com
+
+class AsyncCom(Com):
+    '''
+    Non-blocking counterpart of Com
+
+    Frames are encoded and decoded in the same preallocated buffers as in
+    Com. Several coroutines may share one AsyncCom, the lock serializes
+    their request/reply transactions.
+    '''
+    
+    def write(self, data):
+        # Buffered by the transport, drain() waits until it is sent
+        self.writer.write(data)
+    
+    async def drain(self):
+        await self.writer.drain()
+    
+    async def read(self, data, length):
+        # The transport reads without blocking, so the inter byte timeout
+        # of the profile is applied here as in pyserial: the first byte
+        # within timeout, every further one within interByteTimeout
+        gap = self.profile.interByteTimeout
+        try:
+            if (gap == None):
+                chunk = await asyncio.wait_for(
+                    self.reader.readexactly(length), self.timeout)
+            else:
+                chunk = await asyncio.wait_for(self.reader.readexactly(1),
+                                               self.timeout)
+                while (len(chunk) < length):
+                    more = await asyncio.wait_for(
+                        self.reader.read(length - len(chunk)), gap)
+                    if (len(more) == 0):
+                        return False
+                    chunk += more
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+            # Not enough data received, timeout
+            return False
+        
+        data[0:length] = chunk
+        return True
+    
+
+    async def open(self, profile=None):
+        if (profile != None):
+            self.profile = profile
+        profile = self.profile
+        
+        self.reader, self.writer = await serial_asyncio.open_serial_connection(
+            url=self.portName, baudrate=profile.baudrate,
+            write_timeout=profile.writeTimeout,
+            inter_byte_timeout=profile.interByteTimeout,
+            exclusive=profile.exclusive or None)
+        self.timeout = profile.readTimeout
+        
+        if (profile.lowLatency == True):
+            self.setLowLatency(self.writer.transport.serial)
+        
+        self.bOpen = True
+        return True
+        
+        
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.bOpen = False
+        
+        
+
+    def __init__(self, app, portName):
+        '''
+        Constructor
+        '''
+        Com.__init__(self, app, portName)
+        self.serial = None
+        self.reader = None
+        self.writer = None
+        self.timeout = self.profile.readTimeout
+        self.lock = asyncio.Lock()
@@ -0,0 +1,282 @@
+'''
+Created on 17.10.2026
+
+asyncio variant of the LucidControl module base class
+
+Several modules can be driven from one event loop, e.g.
+
+    ao4 = AsyncLucidControl('COM16')
+    di4 = AsyncLucidControl('COM17')
+    await ao4.open()
+    await di4.open()
+    await asyncio.gather(ao4.setIo(0, voltage), di4.getIo(0, count))
+
+The class is not a LucidControl: it covers identification, IO, raw
+parameter access, calibrateIo and the round-trip measurement as
+coroutines. There is no command pipeline, commands of concurrent tasks are
+serialized by the AsyncCom instead, and no typed parameter methods of the
+module classes (getParamMode etc.), use getParam/setParam with the
+parameter address.
+'''
+import time
+import IoReturn
+from AsyncCom import AsyncCom
+from AsyncCmd import AsyncCmd
+from LucidControl import LucidControl
+from LucidControlId import LucidControlId
+from Values import Value
+
+class AsyncLucidControl(object):
+    """asyncio LucidControl module class
+
+    The IO methods are coroutines and accept every value class supported
+    by the module. Identification data is kept in a LucidControl (control)
+    and read with its getters once identify() has been awaited.
+    """
+
+    def getRevisionFw(self):
+        return self.control.getRevisionFw()
+
+    def getRevisionHw(self):
+        return self.control.getRevisionHw()
+
+    def getDeviceClassName(self):
+        return self.control.getDeviceClassName()
+
+    def getDeviceSnr(self):
+        return self.control.getDeviceSnr()
+
+
+    async def identify(self, options):
+        
+        if not isinstance(options, int):
+            raise TypeError('Expected options as int, got %s' % 
+                type(options))
+
+        if options > 0xFF:
+            raise ValueError('Options out of range')
+
+        self.control.id = LucidControlId() 
+        return await self.cmd.identify(options, self.control.id)
+
+
+    async def getIo(self, channel, value):
+        """Get the value of one IO channel.
+        
+        Args:
+            channel: IO channel number. Must be in the range 0 ... 3
+            value: Value object matching the module type
+            
+        Returns:
+            IO_RETURN_OK in case of success, otherwise detailed IoReturn
+            error code.
+        """
+        self._checkChannel(channel, value)
+        return await self.cmd.getIo(channel, value)
+
+
+    async def getIoGroup(self, channels, values):
+        """Get the values of a group of IO channels.
+        
+        Args:
+            channels: Tuple with 4 boolean values (one for each channel).
+            values: Tuple with 4 value objects filled with read data.
+            
+        Returns:
+            IO_RETURN_OK in case of success, otherwise detailed IoReturn
+            error code.
+        """
+        self._checkGroup(channels, values)
+        return await self.cmd.getIoGroup(channels, values)
+
+
+    async def setIo(self, channel, value):
+        """Write the value of one IO channel.
+        
+        Args:
+            channel: IO channel number. Must be in the range 0 ... 3
+            value: Value object matching the module type
+            
+        Returns:
+            IO_RETURN_OK in case of success, otherwise detailed IoReturn
+            error code.
+        """
+        self._checkChannel(channel, value)
+        return await self.cmd.setIo(channel, value)
+
+
+    async def setIoGroup(self, channels, values):
+        """Write the values of a group of IO channels.
+        
+        Args:
+            channels: Tuple with 4 boolean values (one for each channel).
+            values: Tuple with 4 value objects.
+            
+        Returns:
+            IO_RETURN_OK in case of success, otherwise detailed IoReturn
+            error code.
+        """
+        self._checkGroup(channels, values)
+        return await self.cmd.setIoGroup(channels, values)
+
+
+    def _checkChannel(self, channel, value):
+        if not isinstance(channel, int):
+            raise TypeError('Expected channel as int, got %s' % type(channel))
+
+        if not isinstance(value, Value):
+            raise TypeError('Expected value object, got %s' % type(value))
+
+        if (channel >= self.nrOfChannels):
+            raise ValueError('Channel out of range')
+
+
+    def _checkGroup(self, channels, values):
+        if not isinstance(channels, tuple):
+            raise TypeError('Expected channels as a tuple with 4 channels \
+                (bools), got %s' % type(channels))
+
+        if (len(channels) < self.nrOfChannels):
+            raise TypeError('Expected %d channels, got %d' %
+                (self.nrOfChannels, len(channels)))
+
+        if not isinstance(values, tuple):
+            raise TypeError('Expected values as a tuple with 4 values, got %s'
+                 % type(values))
+
+        if (len(values) < self.nrOfChannels):
+            raise TypeError('Expected %d values, got %d' %
+                (self.nrOfChannels, len(values)))
+
+
+    async def getParam(self, pAddress, channel, data):
+        """Read a configuration parameter.
+
+        Args:
+            pAddress: Parameter address of the module
+            channel: IO channel number. Must be in the range 0 ... 3
+            data: bytearray the parameter data is appended to
+
+        Returns:
+            IO_RETURN_OK in case of success, otherwise detailed IoReturn
+            error code.
+        """
+        self._checkParam(pAddress, channel)
+        return await self.cmd.getParam(pAddress, channel, data)
+
+
+    async def setParam(self, pAddress, channel, persistent, data):
+        """Write a configuration parameter.
+
+        Args:
+            pAddress: Parameter address of the module
+            channel: IO channel number. Must be in the range 0 ... 3
+            persistent: Store the parameter permanently if true
+            data: bytearray with the parameter data
+
+        Returns:
+            IO_RETURN_OK in case of success, otherwise detailed IoReturn
+            error code.
+        """
+        self._checkParam(pAddress, channel, persistent)
+        return await self.cmd.setParam(pAddress, channel, persistent, data)
+
+
+    async def setParamDefault(self, pAddress, channel, persistent):
+        """Set a configuration parameter to its default value.
+
+        Args:
+            pAddress: Parameter address of the module
+            channel: IO channel number. Must be in the range 0 ... 3
+            persistent: Store the parameter permanently if true
+
+        Returns:
+            IO_RETURN_OK in case of success, otherwise detailed IoReturn
+            error code.
+        """
+        self._checkParam(pAddress, channel, persistent)
+        return await self.cmd.setParamDefault(pAddress, channel, persistent)
+
+
+    async def calibrateIo(self, channel, persistent):
+        """Calibration of the IO channels, see LucidControlAO4.calibrateIo.
+
+        Args:
+            channel: IO channel number. Must be in the range 0 ... 3
+            persistent: Store calibration parameter permanently if true
+
+        Returns:
+            IO_RETURN_OK in case of success, otherwise detailed IoReturn
+            error code.
+        """
+        self._checkParam(0, channel, persistent)
+        return await self.cmd.calibrateIo(channel, 0, persistent)
+
+
+    def _checkParam(self, pAddress, channel, persistent=False):
+        if not isinstance(pAddress, int):
+            raise TypeError('Expected pAddress as int, got %s' %
+                type(pAddress))
+
+        if not isinstance(channel, int):
+            raise TypeError('Expected channel as int, got %s' % type(channel))
+
+        if not isinstance(persistent, bool):
+            raise TypeError('Expected persistent as bool, got %s' %
+                type(persistent))
+
+        if (channel >= self.nrOfChannels):
+            raise ValueError('Channel out of range')
+
+
+    async def measureLatency(self, count):
+        """Measures the command round-trip time with identify commands
+
+        Args:
+            count: Number of identify commands to time
+
+        Returns:
+            Tuple with mean and maximum round-trip time in s, None if a
+            command failed. The result is kept in self.roundTrip.
+        """
+        lId = LucidControlId()
+        total = 0.0
+        worst = 0.0
+
+        for i in range(count):
+            t = time.perf_counter()
+            if (await self.cmd.identify(0, lId) !=
+                    IoReturn.IoReturn.IO_RETURN_OK):
+                self.roundTrip = None
+                return None
+            t = time.perf_counter() - t
+            total += t
+            worst = max(worst, t)
+
+        self.roundTrip = (total / count, worst)
+        return self.roundTrip
+
+
+    async def open(self, profile=None):
+        ret = await self.com.open(profile)
+
+        if (ret == True and self.com.profile.probeCount > 0):
+            await self.measureLatency(self.com.profile.probeCount)
+        return ret
+
+
+    async def close(self):
+        return await self.com.close()    
+
+
+    def __init__(self, portName, nrOfChannels=4):
+        '''
+        Constructor
+        '''
+        self.portName = portName
+        self.com = AsyncCom("LucidIo", self.portName)
+        self.cmd = AsyncCmd(self.com)
+        # Holds the identification data, its own Com is never opened
+        self.control = LucidControl(self.portName)
+        self.roundTrip = None
+        self.nrOfChannels = nrOfChannels
@@ -0,0 +1,96 @@
+'''
+Created on 17.10.2026
+
+Allocation benchmark of the LucidIO command path
+
+    python Benchmark.py [<calls>]
+
+Writes an AO4 output with setIo under tracemalloc. The serial port is
+replaced by a loopback that answers every command with an OK status and no
+data and allocates nothing itself, so the traced memory is that of the
+command path alone, in a single thread. An empty loop of the same length is
+measured the same way and subtracted (the loop counter allocates). With the
+preallocated frame buffers a call neither keeps memory nor allocates any on
+the way.
+'''
+import sys
+import time
+import tracemalloc
+
+import IoReturn
+from LucidControlAO4 import LucidControlAO4
+from Values import ValueVOS4
+
+
+class LoopbackSerial(object):
+    '''
+    Stand-in for serial.Serial answering every frame with an empty reply
+    '''
+    in_waiting = 0
+
+    def __init__(self):
+        self.header = bytes([IoReturn.IoReturn.IO_RETURN_OK, 0])
+
+    def write(self, data):
+        return len(data)
+
+    def readinto(self, buf):
+        # Only the 2 byte reply header is ever requested
+        buf[0] = self.header[0]
+        buf[1] = self.header[1]
+        return 2
+
+    def read(self, size):
+        return self.header
+
+    def close(self):
+        pass
+
+
+def _trace(function, calls):
+    # Bytes kept after calls of function and the peak over the start
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    for i in range(calls):
+        function()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current - base, peak - base
+
+
+def benchmarkSetIo(calls=10000, warmup=100):
+    """Memory traced around calls setIo commands
+
+    Args:
+        calls: Number of measured setIo calls
+        warmup: Calls before the measurement, e.g. for the shared commands
+
+    Returns:
+        Tuple (bytes kept after the calls, largest allocation in between
+        in bytes, both over an empty loop, and calls per second)
+    """
+    ao4 = LucidControlAO4('loopback')
+    ao4.com.serial = LoopbackSerial()
+    ao4.com.bOpen = True
+    value = ValueVOS4()
+    value.setVoltage(1.0)
+    setIo = lambda: ao4.setIo(0, value)
+    for i in range(warmup):
+        setIo()
+
+    loopKept, loopPeak = _trace(lambda: None, calls)
+    kept, peak = _trace(setIo, calls)
+
+    start = time.perf_counter()
+    for i in range(calls):
+        setIo()
+    elapsed = time.perf_counter() - start
+    return kept - loopKept, peak - loopPeak, calls / elapsed
+
+
+if __name__ == '__main__':
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    kept, transient, rate = benchmarkSetIo(calls)
+    print("setIo x %d: %d bytes kept, %d bytes allocated at most, "
+          "%.0f calls / s" % (calls, kept, transient, rate))
@@ -5,6 +5,7 @@ Created on 10.06.2013
 '''
 import IoReturn
 import struct
+import collections
 
 
 buffer = memoryview
@@ -21,38 +22,63 @@ class _Opc(object):
   
 class TxCmd(object):
     '''
-    classdocs
+    Command frame encoder
+
+    The frame is built in place in the preallocated transmit buffer of
+    the Com instance: opcode, p1, p2, data length and data.
     '''
     def __init__(self, com):
-        self.data = bytearray()
         self.com = com
+        self.opc = 0
+        self.p1 = 0
+        self.p2 = 0
+        self.length = 0
     
     def initCmd(self, opc, p1, p2):      
         self.opc = opc
         self.p1 = p1
         self.p2 = p2
         
+        buf = self.com.txBuffer
+        buf[0] = opc
+        buf[1] = p1
+        buf[2] = p2
+        self.length = 0
+        
     
     def initCmdData(self, opc, p1, p2, data):
         self.initCmd(opc, p1, p2)
-        self.data = data
+        self.appendData(data)
+        
+    
+    def appendData(self, data):
+        n = len(data)
+        self.com.txBuffer[4 + self.length:4 + self.length + n] = data
+        self.length += n
+        
+    
+    def appendValue(self, value):
+        # Value is packed directly behind the current frame data
+        self.length += value._packInto(self.com.txBuffer, 4 + self.length)
         
 
     def getTxData(self):
-        retData = bytearray([self.opc, self.p1, self.p2])
-        retData.append(len(self.data))
-        retData += self.data 
-        return retData
+        self.com.txBuffer[3] = self.length
+        return bytearray(self.com.txFrames[4 + self.length])
         
     
     def transmit(self):
-        return self.com.write(self.getTxData())
-        pass
+        self.com.txBuffer[3] = self.length
+        return self.com.write(self.com.txFrames[4 + self.length])
    
 
 class RxCmd(object):
     '''
-    classdocs
+    Reply frame decoder
+
+    The reply is read in place into the preallocated receive buffer of the
+    Com instance. data is a view of the received frame data and is only
+    valid until the next reply is received.
     '''
     def __init__(self, com):
         '''
@@ -60,31 +86,34 @@ class RxCmd(object):
         '''
         self.status = 0
         self.com = com
-        self.data = bytearray()
+        self.data = com.rxData[0]
         pass  
     
     def receive(self):
         ret = 0
+        com = self.com
+        self.data = com.rxData[0]
                
-        header = bytearray(2)
-        headerLen = 2
-        ioRet = self.com.read(header, headerLen)
+        ioRet = com.read(com.rxHeader, 2)
         
         if (ioRet == True):
             ret += 2
-            self.status = header[0]
+            self.status = com.rxBuffer[0]
             
             if (self.status == IoReturn.IoReturn.IO_RETURN_OK):
-                if(header[1] != 0):
-                    expectedBytes = header[1]
-                    self.data = bytearray(expectedBytes);
-                    ioRet = self.com.read(self.data, expectedBytes)
+                expectedBytes = com.rxBuffer[1]
+                if(expectedBytes != 0):
+                    ioRet = com.read(com.rxData[expectedBytes], expectedBytes)
                     
                     if (ioRet == True):
+                        self.data = com.rxData[expectedBytes]
                         ret += expectedBytes
                     else:
+                        self.status = IoReturn.IoReturn.IO_RETURN_ERR_INTERNAL
                         ret = -1
         else:
+            # Timeout, no reply received
+            self.status = IoReturn.IoReturn.IO_RETURN_ERR_INTERNAL
             ret = -1
         return ret
         
@@ -94,18 +123,18 @@ class Cmd(object):
         
         valueToken = value._valueType;
         
-        txCmd = TxCmd(self.com)
+        txCmd = self.txCmd
         txCmd.initCmd(_Opc.OPC_GETIO, channel, valueToken)
         
         txCmd.transmit()
         
-        rxCmd = RxCmd(self.com)
+        rxCmd = self.rxCmd
         rxCmd.receive()
         
         ret = rxCmd.status
         
         if (ret == IoReturn.IoReturn.IO_RETURN_OK):
-            value._setData(rxCmd.data)
+            value._unpackFrom(self.com.rxBuffer, 2)
             
         return ret
         
@@ -118,12 +147,12 @@ class Cmd(object):
             if (channels[i] == True):
                 channelMask |= (1 << i)
                 
-        txCmd = TxCmd(self.com)
+        txCmd = self.txCmd
         txCmd.initCmd(_Opc.OPC_GETIO_GROUP, channelMask, valueToken)
         
         txCmd.transmit()
         
-        rxCmd = RxCmd(self.com)
+        rxCmd = self.rxCmd
         rxCmd.receive()
         
         ret = rxCmd.status
@@ -134,8 +163,8 @@ class Cmd(object):
                     continue
                 
                 values[i]._channel = i
-                values[i]._setData(
-                    rxCmd.data[values[i]._size * j:values[i]._size * (j + 1)])
+                values[i]._unpackFrom(self.com.rxBuffer,
+                                      2 + values[i]._size * j)
                 
                 # Marker in data frame
                 j = j + 1
@@ -143,16 +172,14 @@ class Cmd(object):
         
     
     def setIo(self, channel, value):
-        data = bytearray()
         valueToken = value._valueType
         
-        value._getData(data)
-        
-        txCmd = TxCmd(self.com)
-        txCmd.initCmdData(_Opc.OPC_SETIO, channel, valueToken, data)
+        txCmd = self.txCmd
+        txCmd.initCmd(_Opc.OPC_SETIO, channel, valueToken)
+        txCmd.appendValue(value)
         txCmd.transmit()
         
-        rxCmd = RxCmd(self.com)
+        rxCmd = self.rxCmd
         rxCmd.receive()
         
         ret = rxCmd.status
@@ -167,18 +194,17 @@ class Cmd(object):
             if channels[i] == True:
                 channelMask |= (1 << i)
                 
-        data = bytearray()
+        txCmd = self.txCmd
+        txCmd.initCmd(_Opc.OPC_SETIO_GROUP, channelMask, valueToken)
         
         # Fill data
         for i in range(0, len(channels)):
             if channels[i] == True:
-                values[i]._getData(data)
+                txCmd.appendValue(values[i])
 
-        txCmd = TxCmd(self.com)
-        txCmd.initCmdData(_Opc.OPC_SETIO_GROUP, channelMask, valueToken, data)
         txCmd.transmit()
         
-        rxCmd = RxCmd(self.com)
+        rxCmd = self.rxCmd
         rxCmd.receive()
         
         return rxCmd.status
@@ -191,11 +217,11 @@ class Cmd(object):
         # Get Parameter Address
         d += bytearray(struct.pack("<H", pAddress))
         
-        txCmd = TxCmd(self.com)
+        txCmd = self.txCmd
         txCmd.initCmdData(_Opc.OPC_GETPARAM, channel, 0, d)
         txCmd.transmit()
         
-        rxCmd = RxCmd(self.com)
+        rxCmd = self.rxCmd
         rxCmd.receive()
         
         ret = rxCmd.status
@@ -219,11 +245,11 @@ class Cmd(object):
         # Get Data for transmission
         d += data
         
-        txCmd = TxCmd(self.com)
+        txCmd = self.txCmd
         txCmd.initCmdData(_Opc.OPC_SETPARAM, channel, p2, d)
         txCmd.transmit()
         
-        rxCmd = RxCmd(self.com)
+        rxCmd = self.rxCmd
         rxCmd.receive()
         
         return rxCmd.status
@@ -241,22 +267,22 @@ class Cmd(object):
         # Get Parameter Address
         d += bytearray(struct.pack("<H", pAddress))
         
-        txCmd = TxCmd(self.com)
+        txCmd = self.txCmd
         txCmd.initCmdData(_Opc.OPC_SETPARAM, channel, p2, d)
         txCmd.transmit()
         
-        rxCmd = RxCmd(self.com)
+        rxCmd = self.rxCmd
         rxCmd.receive()
         
         return rxCmd.status
     
 
     def identify(self, options, lId):
-        txCmd = TxCmd(self.com)
+        txCmd = self.txCmd
         txCmd.initCmd(_Opc.OPC_GETID, 0, options)
         txCmd.transmit()
         
-        rxCmd = RxCmd(self.com)
+        rxCmd = self.rxCmd
         rxCmd.receive()
         
         ret = rxCmd.status
@@ -277,13 +303,154 @@ class Cmd(object):
         if persistent == True:
             options |= 0x80
             
-        txCmd = TxCmd(self.com)
+        txCmd = self.txCmd
         txCmd.initCmd(_Opc.OPC_CALIBIO, channel, options)
         txCmd.transmit()
         
-        rxCmd = RxCmd(self.com)
+        rxCmd = self.rxCmd
         rxCmd.receive()
         return rxCmd.status
     
+    @staticmethod
+    def shared(com):
+        """Return the Cmd of com, created on first use
+
+        A Cmd holds no state besides its Com, so the module classes use
+        this one instead of a new Cmd for every command.
+        """
+        if (com.cmd == None):
+            com.cmd = Cmd(com)
+        return com.cmd
+    
+
     def __init__(self, com):
-        self.com = com
\ No newline at end of file
+        self.com = com
+        
+        # Frame encoder and decoder are shared by all commands of a Com
+        if (com.txCmd == None):
+            com.txCmd = TxCmd(com)
+            com.rxCmd = RxCmd(com)
+        self.txCmd = com.txCmd
+        self.rxCmd = com.rxCmd
+
+
+class CmdFuture(object):
+    '''
+    Reply handle of a command sent through a CmdPipeline
+    '''
+    def result(self):
+        """Wait for the reply of this command and return its IoReturn status
+        """
+        while not self.done:
+            self._pipeline._receiveOne()
+        return self.status
+
+    def _complete(self, status, data):
+        self.status = status
+        if (status == IoReturn.IoReturn.IO_RETURN_OK and self._decode != None):
+            self._decode(data)
+        self.done = True
+        if (self._callback != None):
+            self._callback(status)
+
+    def __init__(self, pipeline, decode, callback):
+        self._pipeline = pipeline
+        self._decode = decode
+        self._callback = callback
+        self.status = None
+        self.done = False
+
+
+class CmdPipeline(object):
+    '''
+    Pipelined command engine
+
+    Up to depth command frames are transmitted without waiting for the
+    preceding replies. The module answers strictly in order, so replies
+    are matched to the oldest pending CmdFuture. Replies are collected
+    lazily by poll(), flush() or CmdFuture.result(), no thread is used.
+    Call flush() before using a blocking Cmd on the same Com.
+    '''
+    def submit(self, opc, p1, p2, data, decode=None, callback=None):
+        self._reserve()
+        self._txCmd.initCmdData(opc, p1, p2, data)
+        self._txCmd.transmit()
+        return self._queue(decode, callback)
+
+    def getIo(self, channel, value, callback=None):
+        self._reserve()
+        self._txCmd.initCmd(_Opc.OPC_GETIO, channel, value._valueType)
+        self._txCmd.transmit()
+        return self._queue(value._setData, callback)
+
+    def setIo(self, channel, value, callback=None):
+        self._reserve()
+        self._txCmd.initCmd(_Opc.OPC_SETIO, channel, value._valueType)
+        self._txCmd.appendValue(value)
+        self._txCmd.transmit()
+        return self._queue(None, callback)
+
+    def setIoGroup(self, channels, values, callback=None):
+        channelMask = 0
+        for i in range(0, len(channels)):
+            if channels[i] == True:
+                channelMask |= (1 << i)
+
+        self._reserve()
+        self._txCmd.initCmd(_Opc.OPC_SETIO_GROUP, channelMask,
+                            values[0]._valueType)
+        for i in range(0, len(channels)):
+            if channels[i] == True:
+                self._txCmd.appendValue(values[i])
+        self._txCmd.transmit()
+        return self._queue(None, callback)
+
+    def pending(self):
+        return len(self._pending)
+
+    def poll(self):
+        """Complete all commands whose reply has already arrived
+
+        Returns the number of completed commands. Never waits for a reply
+        header which has not been received yet.
+        """
+        n = 0
+        while (len(self._pending) > 0 and self.com.available() >= 2):
+            self._receiveOne()
+            n += 1
+        return n
+
+    def flush(self):
+        """Wait until all pending commands are completed
+        """
+        while (len(self._pending) > 0):
+            self._receiveOne()
+
+    def _reserve(self):
+        # Keep at most depth frames in flight
+        while (len(self._pending) >= self.depth):
+            self._receiveOne()
+
+    def _queue(self, decode, callback):
+        future = CmdFuture(self, decode, callback)
+        self._pending.append(future)
+        return future
+
+    def _receiveOne(self):
+        future = self._pending.popleft()
+        if (self._rxCmd.receive() < 0):
+            # Reply lost, the order of the remaining replies is unknown
+            future._complete(IoReturn.IoReturn.IO_RETURN_ERR_INTERNAL, None)
+            while (len(self._pending) > 0):
+                self._pending.popleft()._complete(
+                    IoReturn.IoReturn.IO_RETURN_ERR_INTERNAL, None)
+            return
+        future._complete(self._rxCmd.status, self._rxCmd.data)
+
+    def __init__(self, com, depth=8):
+        self.com = com
+        self.depth = depth
+        self._pending = collections.deque()
+        cmd = Cmd(com)
+        self._txCmd = cmd.txCmd
+        self._rxCmd = cmd.rxCmd
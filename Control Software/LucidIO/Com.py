@@ -6,6 +6,28 @@ Created on 10.06.2013
 
 import serial
 
+class ComProfile(object):
+    '''
+    Serial connection settings used by Com.open
+
+    Timeouts are given in seconds, None disables the timeout. lowLatency
+    requests the OS low-latency mode of the serial driver where it is
+    supported (Linux). exclusive locks the port against other processes
+    (POSIX). probeCount identify round trips are timed by
+    LucidControl.open, 0 disables the measurement.
+    '''
+    def __init__(self, baudrate=9600, readTimeout=1.0, writeTimeout=1.0,
+                 interByteTimeout=None, lowLatency=False, exclusive=False,
+                 probeCount=0):
+        self.baudrate = baudrate
+        self.readTimeout = readTimeout
+        self.writeTimeout = writeTimeout
+        self.interByteTimeout = interByteTimeout
+        self.lowLatency = lowLatency
+        self.exclusive = exclusive
+        self.probeCount = probeCount
+
+
 class Com(object):
     '''
     classdocs
@@ -15,8 +37,15 @@ class Com(object):
     serial = None
     bOpen = False
     
+    # Longest frame: 4 header bytes and 255 data bytes
+    FRAME_SIZE = 259
+    
     def write(self, data):
-        self.serial.write(data)
+        try:
+            self.serial.write(data)
+        except serial.SerialTimeoutException:
+            return False
+        return True
     
     def read(self, data, length):
         n = self.serial.readinto(data)
@@ -27,16 +56,43 @@ class Com(object):
         
         return True
     
+    def available(self):
+        # Number of received bytes waiting in the input buffer
+        return self.serial.in_waiting
+    
     def isOpened(self):
         return self.bOpen
     
 
-    def open(self):
+    def open(self, profile=None):
+        if (profile != None):
+            self.profile = profile
+        profile = self.profile
+        
         self.serial.port = self.portName
-        self.serial.baudrate = 9600
-        self.serial.timeout = 1000
+        self.serial.baudrate = profile.baudrate
+        self.serial.timeout = profile.readTimeout
+        self.serial.write_timeout = profile.writeTimeout
+        self.serial.inter_byte_timeout = profile.interByteTimeout
+        self.serial.exclusive = profile.exclusive or None
         self.serial.open()
+        
+        if (profile.lowLatency == True):
+            self.setLowLatency(self.serial)
+        
         self.bOpen = True
+        return True
+    
+    
+    def setLowLatency(self, port):
+        # Only available in the POSIX implementation of pyserial
+        if hasattr(port, 'set_low_latency_mode'):
+            try:
+                port.set_low_latency_mode(True)
+            except (IOError, ValueError):
+                return False
+            return True
+        return False
         
         
     def close(self):
@@ -53,4 +109,22 @@ class Com(object):
         self.portName = portName
         self.bOpen = False
         self.serial = serial.Serial()
+        self.profile = ComProfile()
+        
+        # Preallocated frame buffers, commands are encoded and decoded in
+        # place. Views for every frame length are created once here so
+        # no slicing is needed per command.
+        self.txBuffer = bytearray(Com.FRAME_SIZE)
+        self.rxBuffer = bytearray(Com.FRAME_SIZE)
+        txView = memoryview(self.txBuffer)
+        rxView = memoryview(self.rxBuffer)
+        self.txFrames = [txView[0:n] for n in range(Com.FRAME_SIZE + 1)]
+        self.rxHeader = rxView[0:2]
+        self.rxData = [rxView[2:2 + n] for n in range(256)]
+        
+        # Shared TxCmd and RxCmd, created by the first Cmd, and the Cmd
+        # returned by Cmd.shared
+        self.txCmd = None
+        self.rxCmd = None
+        self.cmd = None
         
\ No newline at end of file
@@ -0,0 +1,233 @@
+'''
+Created on 17.10.2026
+
+pty-backed emulator of LucidControl USB IO modules (POSIX only)
+'''
+import os
+import random
+import select
+import struct
+import threading
+import time
+import tty
+
+import IoReturn
+from Cmd import _Opc
+from LucidControl import _DeviceClass
+from Values import _ValueType
+
+
+# Data size of each value type token in bytes
+_VALUE_SIZE = {
+    _ValueType.VALUE_TYPE_DI1:   1,
+    _ValueType.VALUE_TYPE_CNT2:  2,
+    _ValueType.VALUE_TYPE_ANU2:  2,
+    _ValueType.VALUE_TYPE_VOU2:  2,
+    _ValueType.VALUE_TYPE_VOU4:  4,
+    _ValueType.VALUE_TYPE_VOS2:  2,
+    _ValueType.VALUE_TYPE_VOS4:  4,
+    _ValueType.VALUE_TYPE_CUS4:  4,
+    _ValueType.VALUE_TYPE_TMS2:  2,
+    _ValueType.VALUE_TYPE_TMS4:  4,
+    _ValueType.VALUE_TYPE_RMU2:  2,
+}
+
+# Device class and device type reported by GetId for each module
+DEVICES = {
+    'AI4': (_DeviceClass.AI4[0], 0x1012),
+    'AO4': (_DeviceClass.AO4[0], 0x1012),
+    'DI4': (_DeviceClass.DI4[0], 0x1000),
+    'DO4': (_DeviceClass.DO4[0], 0x1000),
+    'RT4': (_DeviceClass.RI4[0], 0x1000),
+}
+
+
+class LucidControlEmulator(object):
+    '''
+    Emulated LucidControl module on a pseudo terminal
+
+    Open the module classes on portName like a real device, e.g.
+    LucidControlAO4(emulator.portName). Frames are answered strictly in
+    order by a background thread after latency + uniform(0, jitter)
+    seconds, so pipelined commands queue up as on the device.
+    IO values and parameters are kept per channel as raw bytes; inputs
+    can be preset with setValue.
+    '''
+    def setValue(self, channel, value):
+        """Preset the raw data returned for channel by GetIo
+
+        Args:
+            channel: IO channel number
+            value: Value object holding the value to return
+        """
+        buf = bytearray(4)
+        n = value._packInto(buf, 0)
+        with self.lock:
+            self.values[channel] = bytes(buf[0:n])
+
+    def getValue(self, channel, value):
+        """Decode the data last written to channel into value
+        """
+        with self.lock:
+            data = self.values.get(channel, bytes(value._size))
+        value._unpackFrom(data + bytes(4), 0)
+        return value
+
+    def dropReplies(self, n):
+        """Do not answer the next n commands, e.g. to test timeouts
+        """
+        self.drop += n
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread != None:
+            self.thread.join()
+            self.thread = None
+
+    def close(self):
+        self.stop()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def _run(self):
+        pending = bytearray()
+        while self.running:
+            ready = select.select([self.master], [], [], 0.05)[0]
+            if not ready:
+                continue
+            try:
+                pending += os.read(self.master, 4096)
+            except OSError:
+                return
+
+            # Complete frames: opcode, p1, p2, length, data
+            while len(pending) >= 4 and len(pending) >= 4 + pending[3]:
+                length = 4 + pending[3]
+                frame = bytes(pending[0:length])
+                del pending[0:length]
+                self.rxBytes += length
+
+                reply = self._execute(frame)
+                self.commands += 1
+
+                if self.drop > 0:
+                    self.drop -= 1
+                    continue
+
+                delay = self.latency + random.uniform(0, self.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+                os.write(self.master, reply)
+                self.txBytes += len(reply)
+
+    def _reply(self, status, data=b''):
+        return bytes([status, len(data)]) + data
+
+    def _execute(self, frame):
+        opc, p1, p2 = frame[0], frame[1], frame[2]
+        data = frame[4:]
+
+        with self.lock:
+            if opc == _Opc.OPC_GETID:
+                return self._reply(IoReturn.IoReturn.IO_RETURN_OK,
+                    struct.pack("<HBHHI", self.revisionFw, self.revisionHw,
+                                self.deviceClass, self.deviceType,
+                                self.deviceSnr))
+
+            if opc in (_Opc.OPC_SETIO, _Opc.OPC_GETIO):
+                if p1 >= self.nrOfChannels:
+                    return self._reply(IoReturn.IoReturn.IO_RETURN_INV_IOCH)
+                if p2 not in _VALUE_SIZE:
+                    return self._reply(IoReturn.IoReturn.IO_RETURN_INV_P2)
+                size = _VALUE_SIZE[p2]
+
+                if opc == _Opc.OPC_GETIO:
+                    return self._reply(IoReturn.IoReturn.IO_RETURN_OK,
+                                       self._read(p1, size))
+                if len(data) != size:
+                    return self._reply(IoReturn.IoReturn.IO_RETURN_INV_LENGTH)
+                self.values[p1] = data
+                return self._reply(IoReturn.IoReturn.IO_RETURN_OK)
+
+            if opc in (_Opc.OPC_SETIO_GROUP, _Opc.OPC_GETIO_GROUP):
+                if p2 not in _VALUE_SIZE:
+                    return self._reply(IoReturn.IoReturn.IO_RETURN_INV_P2)
+                size = _VALUE_SIZE[p2]
+                channels = [ch for ch in range(self.nrOfChannels)
+                            if p1 & (1 << ch)]
+
+                if opc == _Opc.OPC_GETIO_GROUP:
+                    return self._reply(IoReturn.IoReturn.IO_RETURN_OK,
+                        b''.join(self._read(ch, size) for ch in channels))
+                if len(data) != size * len(channels):
+                    return self._reply(IoReturn.IoReturn.IO_RETURN_INV_LENGTH)
+                for i, ch in enumerate(channels):
+                    self.values[ch] = data[i * size:(i + 1) * size]
+                return self._reply(IoReturn.IoReturn.IO_RETURN_OK)
+
+            if opc == _Opc.OPC_GETPARAM:
+                key = (struct.unpack("<H", data[0:2])[0], p1)
+                if key not in self.params:
+                    return self._reply(IoReturn.IoReturn.IO_RETURN_INV_PARAM)
+                return self._reply(IoReturn.IoReturn.IO_RETURN_OK,
+                                   self.params[key])
+
+            if opc == _Opc.OPC_SETPARAM:
+                key = (struct.unpack("<H", data[0:2])[0], p1)
+                if p2 & 0x01:
+                    # Default flag
+                    self.params.pop(key, None)
+                else:
+                    self.params[key] = data[2:]
+                return self._reply(IoReturn.IoReturn.IO_RETURN_OK)
+
+            if opc == _Opc.OPC_CALIBIO:
+                return self._reply(IoReturn.IoReturn.IO_RETURN_OK)
+
+        return self._reply(IoReturn.IoReturn.IO_RETURN_NSUP)
+
+    def _read(self, channel, size):
+        data = self.values.get(channel, b'')
+        return (data + bytes(size))[0:size]
+
+    def __init__(self, device='AO4', latency=0.0, jitter=0.0,
+                 nrOfChannels=4, deviceSnr=1):
+        '''
+        Constructor
+
+        Args:
+            device: Module name, one of the keys of DEVICES
+            latency: Fixed reply delay in s
+            jitter: Maximum additional random reply delay in s
+        '''
+        self.deviceClass, self.deviceType = DEVICES[device]
+        self.revisionFw = 1
+        self.revisionHw = 1
+        self.deviceSnr = deviceSnr
+        self.nrOfChannels = nrOfChannels
+        self.latency = latency
+        self.jitter = jitter
+
+        self.values = {}
+        self.params = {}
+        self.lock = threading.Lock()
+        self.drop = 0
+
+        self.commands = 0
+        self.rxBytes = 0
+        self.txBytes = 0
+
+        # The slave side stays open, so clients can close and reopen the
+        # port like a device that is plugged in
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.portName = os.ttyname(self.slave)
+
+        self.thread = None
+        self.start()
@@ -3,8 +3,10 @@ Created on 12.06.2013
 
 @author: Klaus Ummenhofer
 '''
+import time
+import IoReturn
 from Com import Com
-from Cmd import Cmd
+from Cmd import Cmd, CmdPipeline
 from LucidControlId import LucidControlId
 
 class _DeviceClass(object):
@@ -66,12 +68,50 @@ class LucidControl(object):
             raise ValueError('Options out of range')
 
         self.id = LucidControlId() 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.identify(options, self.id)
 
 
-    def open(self):
-        return self.com.open()
+    def pipeline(self, depth=8):
+        """Returns a CmdPipeline for queueing commands to this module
+        """
+        return CmdPipeline(self.com, depth)
+
+
+    def measureLatency(self, count):
+        """Measures the command round-trip time with identify commands
+
+        Args:
+            count: Number of identify commands to time
+
+        Returns:
+            Tuple with mean and maximum round-trip time in s, None if a
+            command failed. The result is kept in self.roundTrip.
+        """
+        cmd = Cmd.shared(self.com)
+        lId = LucidControlId()
+        total = 0.0
+        worst = 0.0
+
+        for i in range(count):
+            t = time.perf_counter()
+            if (cmd.identify(0, lId) != IoReturn.IoReturn.IO_RETURN_OK):
+                self.roundTrip = None
+                return None
+            t = time.perf_counter() - t
+            total += t
+            worst = max(worst, t)
+
+        self.roundTrip = (total / count, worst)
+        return self.roundTrip
+
+
+    def open(self, profile=None):
+        ret = self.com.open(profile)
+
+        if (ret == True and self.com.profile.probeCount > 0):
+            self.measureLatency(self.com.profile.probeCount)
+        return ret
 
 
     def close(self):
@@ -85,3 +125,4 @@ class LucidControl(object):
         self.portName = portName
         self.com = Com("LucidIo", self.portName)
         self.id = LucidControlId()
+        self.roundTrip = None
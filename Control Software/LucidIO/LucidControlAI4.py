@@ -6,9 +6,9 @@ LucidControl Analog Input USB Module AI4 implementation
 
 from LucidControl import LucidControl
 from Cmd import Cmd
-from lucidIo import IoReturn
+import IoReturn
 import struct
-from lucidIo.Values import ValueANU2, ValueVOS2, ValueVOS4, ValueCUS4
+from Values import ValueANU2, ValueVOS2, ValueVOS4, ValueCUS4
 
 class LCAI4Mode(object):
     """Module Operation Mode values
@@ -41,8 +41,10 @@ class _LCAI4ParamAddress(object):
     VALUE           = 0x1000
     MODE            = 0x1100
     FLAGS           = 0x1101
+    SCAN_INTERVAL   = 0x1111
     NR_SAMPLES      = 0x1112
     OFFSET          = 0x1120
+    CAL             = 0x1130
 
 
 
@@ -79,7 +81,7 @@ class LucidControlAI4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.getIo(channel, value)
    
 
@@ -131,7 +133,7 @@ class LucidControlAI4(LucidControl):
                 raise TypeError('Expected value as ValueANU2 or ValueVOS2, \
                     ValueVOS4 or ValueCUS4 got %s' % type(values[x]))
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.getIoGroup(channels, values)
     
     
@@ -169,7 +171,7 @@ class LucidControlAI4(LucidControl):
             raise ValueError('Channel out of range')
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCAI4ParamAddress.VALUE, channel, data)
         
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -212,7 +214,7 @@ class LucidControlAI4(LucidControl):
             raise ValueError('Channel out of range')     
 
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCAI4ParamAddress.MODE, channel, data)
 
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -254,7 +256,7 @@ class LucidControlAI4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCAI4ParamAddress.MODE, channel, persistent)
 
     
@@ -291,7 +293,7 @@ class LucidControlAI4(LucidControl):
             raise ValueError('Channel out of range')
 
         data = bytearray([mode])
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCAI4ParamAddress.MODE, channel, persistent, data)
 
     
@@ -324,7 +326,7 @@ class LucidControlAI4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCAI4ParamAddress.FLAGS, channel, persistent)
 
 
@@ -367,7 +369,7 @@ class LucidControlAI4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCAI4ParamAddress.SCAN_INTERVAL, channel, data)
     
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -407,7 +409,7 @@ class LucidControlAI4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCAI4ParamAddress.SCAN_INTERVAL, channel,
             persistent)
 
@@ -451,7 +453,7 @@ class LucidControlAI4(LucidControl):
             raise ValueError('Scan Interval out of range')
 
         data = bytearray(struct.pack("<H", scanInterval))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCAI4ParamAddress.SCAN_INTERVAL, channel,
             persistent, data)
         
@@ -496,7 +498,7 @@ class LucidControlAI4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCAI4ParamAddress.NR_SAMPLES, channel, data)
     
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -536,7 +538,7 @@ class LucidControlAI4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCAI4ParamAddress.NR_SAMPLES, channel,
             persistent)
 
@@ -579,7 +581,7 @@ class LucidControlAI4(LucidControl):
             raise ValueError('nrSamples out of range')
 
         data = bytearray(struct.pack("<H", nrSamples))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCAI4ParamAddress.NR_SAMPLES, channel,
             persistent, data)  
     
@@ -622,7 +624,7 @@ class LucidControlAI4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCAI4ParamAddress.OFFSET, channel, data)
     
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -661,7 +663,7 @@ class LucidControlAI4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCAI4ParamAddress.OFFSET, channel, persistent)
     
     
@@ -703,7 +705,7 @@ class LucidControlAI4(LucidControl):
             raise ValueError('Offset out of range')
 
         data = bytearray(struct.pack("<h", offset))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCAI4ParamAddress.OFFSET, channel, persistent,
             data) 
  
@@ -744,7 +746,7 @@ class LucidControlAI4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCAI4ParamAddress.CAL, channel, data)
     
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -783,7 +785,7 @@ class LucidControlAI4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCAI4ParamAddress.CAL, channel, persistent)
 
     
@@ -824,7 +826,7 @@ class LucidControlAI4(LucidControl):
             raise ValueError('Offset out of range')
 
         data = bytearray(struct.pack("<H", cal))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCAI4ParamAddress.CAL, channel, persistent,
             data) 
     
@@ -81,7 +81,7 @@ class LucidControlAO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.getIo(channel, value)
    
 
@@ -133,7 +133,7 @@ class LucidControlAO4(LucidControl):
                 raise TypeError('Expected value as ValueANU2 or ValueVOS2, \
                     ValueVOS4 or ValueCUS4 got %s' % type(values[x]))
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.getIoGroup(channels, values)
     
     
@@ -165,7 +165,7 @@ class LucidControlAO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setIo(channel, value)
 
 
@@ -216,7 +216,7 @@ class LucidControlAO4(LucidControl):
                 raise TypeError('Expected value as ValueANU2 or ValueVOS2, \
                     ValueVOS4 or ValueCUS4 got %s' % (type(values[x])))
             
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setIoGroup(channels, values)
     
     
@@ -248,7 +248,7 @@ class LucidControlAO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.calibrateIo(channel, 0, persistent)
     
     
@@ -286,7 +286,7 @@ class LucidControlAO4(LucidControl):
             raise ValueError('Channel out of range')
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCAO4ParamAddress.VALUE, channel, data)
         
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -329,7 +329,7 @@ class LucidControlAO4(LucidControl):
             raise ValueError('Channel out of range')     
 
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCAO4ParamAddress.MODE, channel, data)
 
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -371,7 +371,7 @@ class LucidControlAO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCAO4ParamAddress.MODE, channel, persistent)
 
     
@@ -408,7 +408,7 @@ class LucidControlAO4(LucidControl):
             raise ValueError('Channel out of range')
 
         data = bytearray([mode])
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCAO4ParamAddress.MODE, channel, persistent, data)
 
     
@@ -441,7 +441,7 @@ class LucidControlAO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCAO4ParamAddress.FLAGS, channel, persistent)
 
 
@@ -484,7 +484,7 @@ class LucidControlAO4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCAO4ParamAddress.REFRESH_INTERVAL, channel, data)
     
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -524,7 +524,7 @@ class LucidControlAO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCAO4ParamAddress.REFRESH_INTERVAL, channel,
             persistent)
 
@@ -568,7 +568,7 @@ class LucidControlAO4(LucidControl):
             raise ValueError('Refresh Interval out of range')
 
         data = bytearray(struct.pack("<I", refreshInterval))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCAO4ParamAddress.REFRESH_INTERVAL, channel,
             persistent, data) 
         
@@ -612,7 +612,7 @@ class LucidControlAO4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCAO4ParamAddress.SETUP_TIME, channel, data)
     
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -652,7 +652,7 @@ class LucidControlAO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCAO4ParamAddress.SETUP_TIME, channel,
             persistent)
 
@@ -696,7 +696,7 @@ class LucidControlAO4(LucidControl):
             raise ValueError('setupTime out of range')
 
         data = bytearray(struct.pack("<I", setupTime))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCAO4ParamAddress.SETUP_TIME, channel,
             persistent, data) 
 
@@ -740,7 +740,7 @@ class LucidControlAO4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCAO4ParamAddress.REFRESH_TIME, channel, data)
     
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -780,7 +780,7 @@ class LucidControlAO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCAO4ParamAddress.REFRESH_TIME, channel,
             persistent)
 
@@ -824,7 +824,7 @@ class LucidControlAO4(LucidControl):
             raise ValueError('refreshTime out of range')
 
         data = bytearray(struct.pack("<I", refreshTime))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCAO4ParamAddress.REFRESH_TIME, channel,
             persistent, data) 
     
@@ -868,7 +868,7 @@ class LucidControlAO4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCAO4ParamAddress.OFFSET, channel, data)
     
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -907,7 +907,7 @@ class LucidControlAO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCAO4ParamAddress.OFFSET, channel, persistent)
     
     
@@ -949,7 +949,7 @@ class LucidControlAO4(LucidControl):
             raise ValueError('Offset out of range')
 
         data = bytearray(struct.pack("<h", offset))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCAO4ParamAddress.OFFSET, channel, persistent,
             data) 
  
@@ -79,7 +79,7 @@ class LucidControlDI4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.getIo(channel, value)
 
 
@@ -129,7 +129,7 @@ class LucidControlDI4(LucidControl):
                 raise TypeError('Expected value as ValueDI1 or ValueCNT2, \
                     got %s' % type(values[x]))
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.getIoGroup(channels, values)
 
 
@@ -169,7 +169,7 @@ class LucidControlDI4(LucidControl):
             raise ValueError('Channel out of range')
 
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDI4ParamAddress.VALUE, channel, data)
 
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -213,7 +213,7 @@ class LucidControlDI4(LucidControl):
             raise ValueError('Channel out of range')     
 
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDI4ParamAddress.MODE, channel, data)
 
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -262,7 +262,7 @@ class LucidControlDI4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCDI4ParamAddress.MODE, channel, persistent)
 
 
@@ -302,7 +302,7 @@ class LucidControlDI4(LucidControl):
 
         data = bytearray([mode])
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCDI4ParamAddress.MODE, channel, persistent, data)
 
 
@@ -335,7 +335,7 @@ class LucidControlDI4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCDI4ParamAddress.FLAGS, channel, persistent)
 
 
@@ -379,7 +379,7 @@ class LucidControlDI4(LucidControl):
             raise ValueError('Channel out of range')
 
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDI4ParamAddress.FLAGS, channel, data)
 
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -425,7 +425,7 @@ class LucidControlDI4(LucidControl):
 
         # Read current flags
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDI4ParamAddress.FLAGS, channel, data)
 
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -477,7 +477,7 @@ class LucidControlDI4(LucidControl):
             raise ValueError('Channel out of range')
 
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDI4ParamAddress.FLAGS, channel, data)
 
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -526,7 +526,7 @@ class LucidControlDI4(LucidControl):
 
         # Read current flags
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDI4ParamAddress.FLAGS, channel, data)
 
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -577,7 +577,7 @@ class LucidControlDI4(LucidControl):
             raise ValueError('Channel out of range')
 
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDI4ParamAddress.FLAGS, channel, data)
         
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -624,7 +624,7 @@ class LucidControlDI4(LucidControl):
         
         # Read current flags
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDI4ParamAddress.FLAGS, channel, data)
         
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -676,7 +676,7 @@ class LucidControlDI4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDI4ParamAddress.SCAN_TIME, channel, data)
     
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -716,7 +716,7 @@ class LucidControlDI4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCDI4ParamAddress.SCAN_TIME, channel,
             persistent)
     
@@ -759,7 +759,7 @@ class LucidControlDI4(LucidControl):
             raise ValueError('Scan Time out of range')
 
         data = bytearray(struct.pack("<I", scanTime))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCDI4ParamAddress.SCAN_TIME,
             channel, persistent, data) 
 
@@ -804,7 +804,7 @@ class LucidControlDI4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDI4ParamAddress.COUNT_TIME, channel, data)
     
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -844,7 +844,7 @@ class LucidControlDI4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCDI4ParamAddress.COUNT_TIME, channel, persistent)
     
     
@@ -887,7 +887,7 @@ class LucidControlDI4(LucidControl):
             raise ValueError('Count Time out of range')
 
         data = bytearray(struct.pack("<I", countTime))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         
         return cmd.setParam(_LCDI4ParamAddress.COUNT_TIME, channel, persistent, data)         
     
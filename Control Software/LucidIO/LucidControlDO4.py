@@ -77,7 +77,7 @@ class LucidControlDO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.getIo(channel, value)
         
 
@@ -128,7 +128,7 @@ class LucidControlDO4(LucidControl):
                 raise TypeError('Expected value as ValueDI1, got %s' %
                     (type(values[x])))
             
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.getIoGroup(channels, values)
             
  
@@ -161,7 +161,7 @@ class LucidControlDO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setIo(channel, value)
 
 
@@ -212,7 +212,7 @@ class LucidControlDO4(LucidControl):
                 raise TypeError('Expected values as ValueDI1, got %s' %
                     (type(values[x])))
             
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setIoGroup(channels, values)
     
     
@@ -251,7 +251,7 @@ class LucidControlDO4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDO4ParamAddress.VALUE, channel, data)
         
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -288,7 +288,7 @@ class LucidControlDO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCDO4ParamAddress.VALUE,
             channel, persistent)
 
@@ -309,7 +309,7 @@ class LucidControlDO4(LucidControl):
             raise ValueError('Channel out of range')
 
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         
         value._getData(data)
         return cmd.setParam(_LCDO4ParamAddress.VALUE, channel, persistent, data)
@@ -352,7 +352,7 @@ class LucidControlDO4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDO4ParamAddress.MODE, channel, data)
         
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -399,7 +399,7 @@ class LucidControlDO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCDO4ParamAddress.MODE, channel, persistent)
     
     
@@ -438,7 +438,7 @@ class LucidControlDO4(LucidControl):
         
         data = bytearray([mode])
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCDO4ParamAddress.MODE, channel, persistent, data)
 
     
@@ -472,7 +472,7 @@ class LucidControlDO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCDO4ParamAddress.FLAGS,
             channel, persistent)
 
@@ -515,7 +515,7 @@ class LucidControlDO4(LucidControl):
             raise ValueError('Channel out of range')
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDO4ParamAddress.FLAGS, channel, data)
         
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -561,7 +561,7 @@ class LucidControlDO4(LucidControl):
         
         # Read current flags
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDO4ParamAddress.FLAGS, channel, data)
         
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -614,7 +614,7 @@ class LucidControlDO4(LucidControl):
             raise ValueError('Channel out of range')
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDO4ParamAddress.FLAGS, channel, data)
         
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -661,7 +661,7 @@ class LucidControlDO4(LucidControl):
         
         # Read current flags
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDO4ParamAddress.FLAGS, channel, data)
         
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -712,7 +712,7 @@ class LucidControlDO4(LucidControl):
             raise ValueError('Channel out of range')
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDO4ParamAddress.FLAGS, channel, data)
         
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -758,7 +758,7 @@ class LucidControlDO4(LucidControl):
         
         # Read current flags
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDO4ParamAddress.FLAGS, channel, data)
         
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -810,7 +810,7 @@ class LucidControlDO4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDO4ParamAddress.CYCLE_TIME, channel, data)
     
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -850,7 +850,7 @@ class LucidControlDO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCDO4ParamAddress.CYCLE_TIME,
             channel, persistent)
     
@@ -894,7 +894,7 @@ class LucidControlDO4(LucidControl):
             raise ValueError('Cycle Time out of range')
 
         data = bytearray(struct.pack("<I", cycleTime))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         
         return cmd.setParam(_LCDO4ParamAddress.CYCLE_TIME, channel,
             persistent, data) 
@@ -941,7 +941,7 @@ class LucidControlDO4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDO4ParamAddress.DUTY_CYCLE, channel, data)
 
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -981,7 +981,7 @@ class LucidControlDO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCDO4ParamAddress.DUTY_CYCLE, channel,
             persistent)
     
@@ -1025,7 +1025,7 @@ class LucidControlDO4(LucidControl):
             raise ValueError('DutyCycle out of range')
         
         data = bytearray(struct.pack("<H", dutyCycle))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCDO4ParamAddress.DUTY_CYCLE, channel,
             persistent, data) 
     
@@ -1070,7 +1070,7 @@ class LucidControlDO4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDO4ParamAddress.ON_HOLD, channel, data)
         
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -1110,7 +1110,7 @@ class LucidControlDO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCDO4ParamAddress.ON_HOLD,
             channel, persistent)
     
@@ -1153,7 +1153,7 @@ class LucidControlDO4(LucidControl):
             raise ValueError('On Hold out of range')
         
         data = bytearray(struct.pack("<I", onHold))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCDO4ParamAddress.ON_HOLD, channel,
             persistent, data) 
     
@@ -1195,7 +1195,7 @@ class LucidControlDO4(LucidControl):
                 type(onDelay[0])) 
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCDO4ParamAddress.ON_DELAY, channel, data)
         
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -1235,7 +1235,7 @@ class LucidControlDO4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCDO4ParamAddress.ON_DELAY, channel,
             persistent)
 
@@ -1277,7 +1277,7 @@ class LucidControlDO4(LucidControl):
             raise ValueError('On Delay out of range')
 
         data = bytearray(struct.pack("<I", onDelay))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCDO4ParamAddress.ON_DELAY, channel,
             persistent, data) 
     
@@ -76,7 +76,7 @@ class LucidControlRT4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.getIo(channel, value)
    
     
@@ -128,7 +128,7 @@ class LucidControlRT4(LucidControl):
                 raise TypeError('Expected value as ValueRMU2 or ValueTMS2 or \
                     ValueTMS4, got %s' % type(values[x]))
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.getIoGroup(channels, values)
     
     
@@ -164,7 +164,7 @@ class LucidControlRT4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.calibrateIo(channel, calMode, persistent)
     
     
@@ -202,7 +202,7 @@ class LucidControlRT4(LucidControl):
             raise ValueError('Channel out of range')
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCRT4ParamAddress.VALUE, channel, data)
         
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -245,7 +245,7 @@ class LucidControlRT4(LucidControl):
             raise ValueError('Channel out of range')     
 
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCRT4ParamAddress.MODE, channel, data)
 
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -287,7 +287,7 @@ class LucidControlRT4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCRT4ParamAddress.MODE, channel, persistent)
 
     
@@ -324,7 +324,7 @@ class LucidControlRT4(LucidControl):
             raise ValueError('Channel out of range')
 
         data = bytearray([mode])
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCRT4ParamAddress.MODE, channel, persistent, data)
 
     
@@ -357,7 +357,7 @@ class LucidControlRT4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCRT4ParamAddress.FLAGS, channel, persistent)
 
 
@@ -400,7 +400,7 @@ class LucidControlRT4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCRT4ParamAddress.SCAN_INTERVAL, channel, data)
     
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -440,7 +440,7 @@ class LucidControlRT4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCRT4ParamAddress.SCAN_INTERVAL, channel,
             persistent)
 
@@ -484,7 +484,7 @@ class LucidControlRT4(LucidControl):
             raise ValueError('Scan Interval out of range')
 
         data = bytearray(struct.pack("<H", scanInterval))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCRT4ParamAddress.SCAN_INTERVAL, channel, persistent, data) 
     
  
@@ -527,7 +527,7 @@ class LucidControlRT4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCRT4ParamAddress.SETUP_TIME, channel, data)
     
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -567,7 +567,7 @@ class LucidControlRT4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
         
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCRT4ParamAddress.SETUP_TIME, channel,
             persistent)
 
@@ -611,7 +611,7 @@ class LucidControlRT4(LucidControl):
             raise ValueError('Setup Time out of range')
 
         data = bytearray(struct.pack("<H", setupTime))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCRT4ParamAddress.SETUP_TIME, channel, persistent, data) 
  
  
@@ -653,7 +653,7 @@ class LucidControlRT4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCRT4ParamAddress.OFFSET, channel, data)
     
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -692,7 +692,7 @@ class LucidControlRT4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCRT4ParamAddress.OFFSET, channel, persistent)
     
     
@@ -734,7 +734,7 @@ class LucidControlRT4(LucidControl):
             raise ValueError('Offset out of range')
 
         data = bytearray(struct.pack("<h", offset))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCRT4ParamAddress.OFFSET, channel, persistent,
             data) 
  
@@ -777,7 +777,7 @@ class LucidControlRT4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCRT4ParamAddress.CAL_UM, channel, data)
     
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -816,7 +816,7 @@ class LucidControlRT4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCRT4ParamAddress.CAL_UM, channel, persistent)
 
     
@@ -855,7 +855,7 @@ class LucidControlRT4(LucidControl):
             raise ValueError('CalUm out of range')
         
         data = bytearray(struct.pack("<H", calUm))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCRT4ParamAddress.CAL_UM, channel, persistent,
             data) 
  
@@ -898,7 +898,7 @@ class LucidControlRT4(LucidControl):
             raise ValueError('Channel out of range')     
         
         data = bytearray()
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         ret = cmd.getParam(_LCRT4ParamAddress.CAL_URS, channel, data)
     
         if ret == IoReturn.IoReturn.IO_RETURN_OK:
@@ -937,7 +937,7 @@ class LucidControlRT4(LucidControl):
         if (channel >= self.nrOfChannels):
             raise ValueError('Channel out of range')   
 
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParamDefault(_LCRT4ParamAddress.CAL_URS, channel, persistent)
 
     
@@ -976,7 +976,7 @@ class LucidControlRT4(LucidControl):
             raise ValueError('CalUrs out of range')
         
         data = bytearray(struct.pack("<h", calUrs))
-        cmd = Cmd(self.com)
+        cmd = Cmd.shared(self.com)
         return cmd.setParam(_LCRT4ParamAddress.CAL_URS, channel, persistent,
             data) 
     
@@ -7,6 +7,11 @@ LucidControl Value Classes
 from abc import abstractmethod
 import struct
 
+# Precompiled formats for packing values in place
+_U2 = struct.Struct("<H")
+_S2 = struct.Struct("<h")
+_S4 = struct.Struct("<i")
+
 class _ValueType(object):
     
     VALUE_TYPE_NONE             = 0
@@ -58,16 +63,26 @@ class ValueDI1(Value):
         self._value = value
         
     def _setData(self, data):
-        if (data[0] == 0):
-            self._value = False
-        else:
-            self._value = True
+        self._unpackFrom(data, 0)
         
     def _getData(self, data):
         if (self._value == True):
             data += bytearray([0x01])
         else:
             data += bytearray([0x00])
+    
+    def _unpackFrom(self, buf, offset):
+        if (buf[offset] == 0):
+            self._value = False
+        else:
+            self._value = True
+    
+    def _packInto(self, buf, offset):
+        if (self._value == True):
+            buf[offset] = 0x01
+        else:
+            buf[offset] = 0x00
+        return 1
 
 
 
@@ -91,12 +106,18 @@ class ValueCNT2(Value):
         self._value = value
     
     def _setData(self, data):
-        self._value = struct.unpack("<H", buffer(data))[0]
+        self._unpackFrom(data, 0)
         
     def _getData(self, data):
-        data += bytearray(struct.pack("<H", self._value)) 
-        
-        
+        data += bytearray(struct.pack("<H", self._value))
+    
+    def _unpackFrom(self, buf, offset):
+        self._value = _U2.unpack_from(buf, offset)[0]
+    
+    def _packInto(self, buf, offset):
+        _U2.pack_into(buf, offset, int(self._value))
+        return _U2.size
+
 
 class ValueANU2(Value):
     """Analog value class
@@ -118,12 +139,19 @@ class ValueANU2(Value):
         self._value = value 
     
     def _setData(self, data):
-        self._value= struct.unpack("<H", buffer(data))[0]
+        self._unpackFrom(data, 0)
         
     def _getData(self, data):
         data += bytearray(struct.pack("<H", self._value))
+    
+    def _unpackFrom(self, buf, offset):
+        self._value = _U2.unpack_from(buf, offset)[0]
+    
+    def _packInto(self, buf, offset):
+        _U2.pack_into(buf, offset, int(self._value))
+        return _U2.size
+
 
-            
 class ValueVOS2(Value):
     """Analog Voltage value class
     """
@@ -166,12 +194,19 @@ class ValueVOS2(Value):
         return voltage 
         
     def _setData(self, data):
-        self._value = struct.unpack("<h", buffer(data))[0]
-        self._voltage = self._calcValue(self._value)
+        self._unpackFrom(data, 0)
         
     def _getData(self, data):
         data += bytearray(struct.pack("<h", self._value))
-        
+    
+    def _unpackFrom(self, buf, offset):
+        self._value = _S2.unpack_from(buf, offset)[0]
+        self._voltage = self._calcVoltage(self._value)
+    
+    def _packInto(self, buf, offset):
+        _S2.pack_into(buf, offset, int(self._value))
+        return _S2.size
+
 
 class ValueVOS4(Value):
     """Analog Voltage value class
@@ -215,13 +250,20 @@ class ValueVOS4(Value):
         return voltage 
         
     def _setData(self, data):
-        self._value = struct.unpack("<i", buffer(data))[0]
-        self._voltage = self._calcVoltage(self._value)
+        self._unpackFrom(data, 0)
         
     def _getData(self, data):
         data += bytearray(struct.pack("<i", int(self._value)))
-        
-        
+    
+    def _unpackFrom(self, buf, offset):
+        self._value = _S4.unpack_from(buf, offset)[0]
+        self._voltage = self._calcVoltage(self._value)
+    
+    def _packInto(self, buf, offset):
+        _S4.pack_into(buf, offset, int(self._value))
+        return _S4.size
+
+
 class ValueCUS4(Value):
     """Analog Current value class
     """
@@ -264,13 +306,20 @@ class ValueCUS4(Value):
         return current
         
     def _setData(self, data):
-        self._value = struct.unpack("<i", buffer(data))[0]
-        self._current = self._calcCurrent(self._value)
+        self._unpackFrom(data, 0)
         
     def _getData(self, data):
-        data += bytearray(struct.pack("<i", self._value))    
-        
-        
+        data += bytearray(struct.pack("<i", self._value))
+    
+    def _unpackFrom(self, buf, offset):
+        self._value = _S4.unpack_from(buf, offset)[0]
+        self._current = self._calcCurrent(self._value)
+    
+    def _packInto(self, buf, offset):
+        _S4.pack_into(buf, offset, int(self._value))
+        return _S4.size
+
+
 class ValueTMS2(Value):
     """Temperature Value class
     """
@@ -313,12 +362,19 @@ class ValueTMS2(Value):
         return temperature
         
     def _setData(self, data):
-        self._value = struct.unpack("<h", buffer(data))[0]
-        self._temperature = self._calcTemperature(self._value)
+        self._unpackFrom(data, 0)
         
     def _getData(self, data):
         data += bytearray(struct.pack("<h", self._value))
-        
+    
+    def _unpackFrom(self, buf, offset):
+        self._value = _S2.unpack_from(buf, offset)[0]
+        self._temperature = self._calcTemperature(self._value)
+    
+    def _packInto(self, buf, offset):
+        _S2.pack_into(buf, offset, int(self._value))
+        return _S2.size
+
 
 class ValueTMS4(Value):
     """Temperature Value class
@@ -362,13 +418,20 @@ class ValueTMS4(Value):
         return temperature
     
     def _setData(self, data):
-        self._value = struct.unpack("<i", buffer(data))[0]
-        self._temperature = self._calcTemperature(self._value)
+        self._unpackFrom(data, 0)
         
     def _getData(self, data):
         data += bytearray(struct.pack("<i", self._value))
     
+    def _unpackFrom(self, buf, offset):
+        self._value = _S4.unpack_from(buf, offset)[0]
+        self._temperature = self._calcTemperature(self._value)
     
+    def _packInto(self, buf, offset):
+        _S4.pack_into(buf, offset, int(self._value))
+        return _S4.size
+
+
 class ValueRMU2(Value):
     """Resistance Value class
     """
@@ -411,8 +474,15 @@ class ValueRMU2(Value):
         return resistance
     
     def _setData(self, data):
-        self._value = struct.unpack("<H", buffer(data))[0]
-        self._resistance = self._calcResistance(self._value)
+        self._unpackFrom(data, 0)
         
     def _getData(self, data):
-        data += bytearray(struct.pack("<H", self._value))
\ No newline at end of file
+        data += bytearray(struct.pack("<H", self._value))
+    
+    def _unpackFrom(self, buf, offset):
+        self._value = _U2.unpack_from(buf, offset)[0]
+        self._resistance = self._calcResistance(self._value)
+    
+    def _packInto(self, buf, offset):
+        _U2.pack_into(buf, offset, int(self._value))
+        return _U2.size
@@ -0,0 +1,284 @@
+import numpy as np
+
+
+def savgolCoefficients(window, order, deriv=0):
+    # Savitzky-Golay weights: least-squares polynomial of the given order
+    # over 'window' samples (odd), evaluated (or derived) at each position.
+    # Row k gives the result at sample k of the window.
+    if window % 2 == 0 or window <= order:
+        raise ValueError("window must be odd and larger than order")
+    x = np.arange(window, dtype=float) - window // 2
+    vander = x[:, None] ** np.arange(order + 1)
+    pinv = np.linalg.pinv(vander)            # (order+1) x window
+
+    # d^deriv/dx^deriv of the fitted polynomial at every window position
+    powers = np.arange(order + 1)
+    factor = np.ones(order + 1)
+    for i in range(deriv):
+        factor *= np.clip(powers - i, 0, None)
+    exps = np.clip(powers - deriv, 0, None)
+    basis = factor * x[:, None] ** exps      # window x (order+1)
+    return basis.dot(pinv)
+
+
+def savgolDerivative(y, dt, window=51, order=3, deriv=1):
+    # deriv-th derivative of the uniformly sampled y, from a sliding
+    # Savitzky-Golay fit. The first and last half windows use the fit of the
+    # first and last full window, so the result has the length of y.
+    y = np.asarray(y, dtype=float)
+    window = min(window, len(y) - (1 - len(y) % 2))
+    coeffs = savgolCoefficients(window, order, deriv) / dt ** deriv
+    half = window // 2
+
+    out = np.empty_like(y)
+    # Interior: the centre row as one convolution
+    out[half:len(y) - half] = np.convolve(y, coeffs[half][::-1], 'valid')
+    out[:half] = coeffs[:half].dot(y[:window])
+    out[len(y) - half:] = coeffs[half + 1:].dot(y[-window:])
+    return out
+
+
+def matchedDerivative(coil_pos, induction, dt, window=51, order=3):
+    # Coil velocity and induction voltage through the same filter: the
+    # velocity is the Savitzky-Golay derivative of the position, the voltage
+    # is integrated (trapezoid) and derived by the same Savitzky-Golay fit.
+    # Comparing the smoothed velocity with the raw voltage instead biases BL
+    # by the filter's gain at the drive frequency, a few 1e-3 for the 51
+    # sample window at 1 kHz.
+    u = np.asarray(induction, dtype=float)
+    flux = np.concatenate(([0.0], np.cumsum((u[1:] + u[:-1]) / 2) * dt))
+    return (savgolDerivative(coil_pos, dt, window, order),
+            savgolDerivative(flux, dt, window, order))
+
+
+def phaseLag(reference, signal, dt, max_lag=None):
+    # Time by which signal lags reference (negative if it leads). For every
+    # lag the correlation coefficient over the overlapping samples is taken,
+    # so a record of only a few periods does not pull the peak towards zero
+    # lag; the peak is refined by a parabola through its neighbours.
+    a = np.asarray(reference, dtype=float)
+    b = np.asarray(signal, dtype=float)
+    n = len(a)
+    max_k = n // 4 if max_lag == None else min(int(max_lag / dt), n - 3)
+    lags = np.arange(-max_k, max_k + 1)
+
+    # Sums of a[i] * b[i + k] for all k at once, via zero-padded FFTs
+    size = 1 << int(2 * n - 1).bit_length()
+    corr = np.fft.irfft(np.conj(np.fft.rfft(a, size)) * np.fft.rfft(b, size),
+                        size)
+    sab = corr[lags % size]
+
+    # Sums over the overlap a[max(0, -k):n - max(0, k)] and b shifted by k
+    ca = np.concatenate(([0.0], np.cumsum(a)))
+    cb = np.concatenate(([0.0], np.cumsum(b)))
+    caa = np.concatenate(([0.0], np.cumsum(a * a)))
+    cbb = np.concatenate(([0.0], np.cumsum(b * b)))
+    a0 = np.maximum(-lags, 0)
+    a1 = n - np.maximum(lags, 0)
+    b0 = a0 + lags
+    b1 = a1 + lags
+    m = a1 - a0
+    sa = ca[a1] - ca[a0]
+    sb = cb[b1] - cb[b0]
+    cov = sab - sa * sb / m
+    var = (caa[a1] - caa[a0] - sa * sa / m) * (cbb[b1] - cbb[b0] - sb * sb / m)
+    r = cov / np.sqrt(np.maximum(var, 1e-300))
+
+    i = int(np.argmax(r))
+    offset = 0.0
+    if 0 < i < len(r) - 1:
+        denom = r[i - 1] - 2 * r[i] + r[i + 1]
+        if denom != 0:
+            offset = 0.5 * (r[i - 1] - r[i + 1]) / denom
+    return (lags[i] + offset) * dt
+
+
+def shift(y, dt, lag):
+    # y delayed by lag seconds (linear interpolation, ends held)
+    t = np.arange(len(y)) * dt
+    return np.interp(t - lag, t, y)
+
+
+def fitLine(x, y, sigma=None):
+    # Weighted least-squares y = slope * x + offset. Returns slope, offset,
+    # their 2x2 covariance and the residuals. Without sigma the covariance
+    # is scaled by the residual variance (unknown, equal errors).
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    w = np.ones_like(x)
+    if sigma is not None:
+        w = w / np.asarray(sigma, dtype=float) ** 2
+
+    design = np.column_stack((x, np.ones_like(x)))
+    normal = design.T.dot(design * w[:, None])
+    cov = np.linalg.inv(normal)
+    slope, offset = cov.dot(design.T.dot(w * y))
+
+    residuals = y - slope * x - offset
+    if sigma is None:
+        cov = cov * residuals.dot(residuals) / max(len(x) - 2, 1)
+    return slope, offset, cov, residuals
+
+
+class BLFit(object):
+    # Velocity mode result. BL is the slope of the induction voltage over
+    # the coil velocity; the velocity is the derivative of the measured coil
+    # position, shifted by the lag found between velocity and induction.
+    # Both go through the same filter (see matchedDerivative).
+    #
+    # The fotodiode noise makes the velocity noisy as well, which pulls the
+    # slope low by var(noise) / var(velocity) (errors in x). The noise of
+    # the position follows from its second differences, the motion hardly
+    # shows in them at the scan rate, and through the derivative weights
+    # gives that of the velocity; the slope is corrected by it. The window
+    # keeps the correction small: with 51 samples at 1 kHz it is about
+    # 1e-3 on the simulated balance, with 101 samples 1e-4. Wider windows
+    # correlate the residuals over many samples, and sigmaBL() understates
+    # the error. The record has to span two windows, the ends of one are
+    # left out of the fit.
+    def __init__(self, coil_pos, induction, dt, window=101, order=3,
+                 max_lag=None, sigma=None):
+        if len(coil_pos) < 2 * window:
+            raise ValueError("record of " + str(len(coil_pos))
+                             + " samples shorter than two derivative windows")
+        self.dt = dt
+        self.coil_pos = np.asarray(coil_pos, dtype=float)
+        velocity, self.induction = matchedDerivative(self.coil_pos, induction,
+                                                     dt, window, order)
+        self.lag = phaseLag(velocity, self.induction, dt, max_lag)
+        self.velocity = shift(velocity, dt, self.lag)
+
+        # Ends are extrapolated by the derivative and the shift, keep them
+        # out of the fit
+        skip = window // 2 + int(np.ceil(abs(self.lag) / dt))
+        self.used = slice(skip, max(len(velocity) - skip, skip + 2))
+
+        self.BL, self.offset, self.cov, self.residuals = fitLine(
+            self.velocity[self.used], self.induction[self.used], sigma)
+
+        weights = savgolCoefficients(window, order, 1)[window // 2] / dt
+        noise = np.var(np.diff(self.coil_pos, 2)) / 6 * weights.dot(weights)
+        self.attenuation = noise / np.var(self.velocity[self.used])
+        self.BL /= 1 - self.attenuation
+        self.cov = self.cov / (1 - self.attenuation) ** 2
+
+    def sigmaBL(self):
+        return np.sqrt(self.cov[0, 0])
+
+    def summary(self):
+        return ("BL = %.5f +- %.5f Tm  offset = %.3g +- %.2g V  lag = %.2f ms"
+                "  residual rms = %.3g V  samples = %d"
+                % (self.BL, self.sigmaBL(), self.offset, np.sqrt(self.cov[1, 1]),
+                   self.lag * 1e3, np.sqrt(np.mean(self.residuals ** 2)),
+                   len(self.residuals)))
+
+
+def massBudget(BL, sigma_BL, I, sigma_I, g, sigma_g=0.0, shunt_rel=0.0):
+    # m = BL * I / g with uncorrelated errors; I is measured over the shunt,
+    # whose relative uncertainty shunt_rel adds to that of I. Returns the
+    # mass, its standard uncertainty and each source's share of the relative
+    # variance. Without a current (I == 0) the relative uncertainty of I is
+    # undefined.
+    if I == 0:
+        raise ValueError("no current, the mass budget needs I != 0")
+    mass = BL * I / g
+    rel = {'BL': (sigma_BL / BL) ** 2,
+           'I': (sigma_I / I) ** 2,
+           'shunt': shunt_rel ** 2,
+           'g': (sigma_g / g) ** 2}
+    total = sum(rel.values())
+    shares = dict((name, value / total if total > 0 else 0.0)
+                  for name, value in rel.items())
+    return mass, abs(mass) * np.sqrt(total), shares
+
+
+class LockIn(object):
+    # Lock-in analysis of the velocity mode: coil velocity and induction
+    # voltage (matched filters, see matchedDerivative) are projected onto
+    # the drive frequency 1/period and its harmonics, by least squares on
+    # cos/sin of every harmonic plus offset and linear drift, so records of
+    # a non-integer number of periods do not leak into each other. Both
+    # records go through the same projection, so U = BL * v holds for the
+    # phasors of every harmonic, start transients included: BL_k is
+    # Re(U_k / V_k) and the phase of U_k / V_k the lag of the induction
+    # voltage behind the velocity, ideally 0.
+    # The record has to span at least one period, below that the harmonics
+    # and the drift can not be told apart, and the start transient of the
+    # PID should be left out: it is not periodic and pulls BL by about
+    # 1e-3 in a single period record. For a multi-tone drive period is
+    # the sequence of tone periods; a frequency shared by two tones is fitted
+    # once, for the tone it is the lower harmonic of (see tone, harmonic).
+    def __init__(self, coil_pos, induction, dt, period, harmonics=3,
+                 window=51, order=3):
+        periods = np.atleast_1d(np.asarray(period, dtype=float))
+        if len(coil_pos) * dt < periods.max():
+            raise ValueError("record shorter than one drive period")
+        velocity, induction = matchedDerivative(coil_pos, induction, dt,
+                                                window, order)
+        # Without the extrapolated ends of the derivatives
+        used = slice(window // 2, len(velocity) - window // 2)
+        data = np.column_stack((velocity[used], induction[used]))
+        n = len(data)
+        t = np.arange(n) * dt
+        numbers = np.arange(1, harmonics + 1)
+        freq = (numbers[:, None] / periods[None, :]).ravel()
+        first = np.unique(np.round(freq, 9), return_index=True)[1]
+        first.sort()
+        self.freq = freq[first]
+        self.tone = first % len(periods)
+        self.harmonic = numbers[first // len(periods)]
+        harmonics = len(self.freq)
+        phase = 2 * np.pi * np.outer(t, self.freq)
+
+        design = np.column_stack((np.ones(n), t - t.mean(),
+                                  np.cos(phase), np.sin(phase)))
+        coef = np.linalg.lstsq(design, data, rcond=None)[0]
+        residuals = data - design.dot(coef)
+        cov = np.linalg.inv(design.T.dot(design))
+
+        # Phasors: y(t) = Re(Y exp(i w t)) = a cos(w t) + b sin(w t)
+        k = slice(2, 2 + harmonics)
+        s = slice(2 + harmonics, 2 + 2 * harmonics)
+        V = coef[k, 0] - 1j * coef[s, 0]
+        U = coef[k, 1] - 1j * coef[s, 1]
+        omega = 2 * np.pi * self.freq
+
+        self.velocity = V
+        self.position = V / (1j * omega)
+        self.induction = U
+        ratio = U / V
+        self.BL = ratio.real
+        self.phase = np.angle(ratio)
+        self.lag = -self.phase / omega
+
+        # U_k - BL_k V_k is the projection of the noise u - BL_k v: motion
+        # outside the harmonics cancels and only the measurement noise is
+        # left. cos and sin coefficients of one harmonic have (nearly) the
+        # same variance c_k from the normal matrix.
+        c = np.diag(cov)[k]
+        dof = max(n - design.shape[1], 1)
+        noise = (residuals[:, 1][:, None]
+                 - self.BL[None, :] * residuals[:, 0][:, None])
+        var = (noise ** 2).sum(axis=0) / dof
+        self.sigma_BL = np.sqrt(var * c) / np.abs(V)
+        self.residual_rms = np.sqrt(var)
+
+    def combined(self):
+        # Inverse variance weighted mean of BL over the harmonics
+        w = 1.0 / self.sigma_BL ** 2
+        return (w * self.BL).sum() / w.sum(), 1.0 / np.sqrt(w.sum())
+
+    def amplitude(self):
+        # Amplitudes of position [m], velocity [m/s] and induction [V]
+        return np.abs(self.position), np.abs(self.velocity), np.abs(self.induction)
+
+    def summary(self):
+        lines = []
+        pos, vel, ind = self.amplitude()
+        for i, f in enumerate(self.freq):
+            lines.append("  %.3f Hz: x = %.3g m  v = %.3g m/s  U = %.3g V  "
+                         "lag = %.2f ms  BL = %.5f +- %.5f Tm"
+                         % (f, pos[i], vel[i], ind[i], self.lag[i] * 1e3,
+                            self.BL[i], self.sigma_BL[i]))
+        lines.append("  combined: BL = %.5f +- %.5f Tm" % self.combined())
+        return "Lock-in:\n" + "\n".join(lines)
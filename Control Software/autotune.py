@@ -0,0 +1,125 @@
+import math
+
+import numpy as np
+
+from positionloop import PositionLoop
+
+
+# Tuning rules from the ultimate gain Ku and period Tu:
+#   p_gain = kp * Ku, i_gain = p_gain / (ti * Tu), d_gain = p_gain * td * Tu
+TUNING_RULES = {
+    'ziegler-nichols': (0.6, 0.5, 0.125),
+    'some overshoot': (0.33, 0.5, 0.33),
+    'no overshoot': (0.2, 0.5, 0.33),
+}
+
+
+class RelayTuner(object):
+    # Relay feedback experiment (Astrom-Hagglund): instead of the PID the
+    # output switches between bias + relay and bias - relay whenever the
+    # coil position crosses the setpoint (with a hysteresis against the
+    # fotodiode noise). The loop settles into a limit cycle at the
+    # frequency where it has 180 degrees phase lag, sampling and output
+    # delay of the control loop included. Its period is the ultimate period
+    # Tu, and from the position amplitude a the ultimate gain is
+    #   Ku = 4 relay / (pi sqrt(a**2 - hysteresis**2))
+    # The bias follows the mean output of every cycle, so a load on the
+    # coil (e.g. in force mode) does not make the cycle asymmetric.
+    #
+    # Period and amplitude are taken from the scanned fotodiode samples of
+    # the last 'cycles' periods; the run stops early, with the output off,
+    # if the coil leaves setpoint +- max_amplitude.
+    #
+    # With track the relay switches on the position of the Kalman tracker
+    # (positionloop.PositionLoop) like the velocity mode PID acts on it, so
+    # Ku and Tu include its lag.
+    def __init__(self, hw, foto_slope, foto_yoffset, scan_inputs, scan_rate,
+                 dt, relay=0.5, hysteresis=1e-5, cycles=6, settle=2,
+                 max_amplitude=1e-3, timeout=20.0, track=True):
+        self.hw = hw
+        self.foto_slope = foto_slope
+        self.foto_yoffset = foto_yoffset
+        self.loop = PositionLoop(hw, None, foto_slope, foto_yoffset, dt,
+                                 track)
+        self.fotodiode = scan_inputs.index('fotodiode')
+        self.scan_rate = scan_rate
+        self.dt = dt
+        self.relay = relay
+        self.hysteresis = hysteresis
+        self.cycles = cycles
+        self.settle = settle
+        self.max_amplitude = max_amplitude
+        self.timeout = timeout
+
+        self.Ku = None
+        self.Tu = None
+        self.amplitude = None
+        self.bias = 0.0
+
+    def run(self, setpoint=0.0):
+        # Returns (Ku, Tu), None if no steady limit cycle was reached
+        self.hw.readScan() # drop the frames before the experiment
+        blocks = []
+        switches = [] # frame index of every switch to the high output
+        outputs = []
+        high = False
+        count = 0
+
+        self.loop.reset()
+        for t in self.loop.run(self.timeout):
+            coil_pos = self.loop.filter(self.loop.position())[0]
+            error = setpoint - coil_pos
+            # (the first tick may come before the first scanned frame)
+            if count > 0 and abs(error) > self.max_amplitude:
+                print("Relay tuning stopped: coil at " + str(coil_pos)
+                      + " m, reduce the relay amplitude")
+                break
+
+            if not high and error > self.hysteresis:
+                high = True
+                switches.append(count)
+                # Bias: mean output of the cycle that ends here
+                if len(switches) > 1:
+                    self.bias = float(np.mean(outputs))
+                outputs = []
+            elif high and error < -self.hysteresis:
+                high = False
+
+            output = self.bias + (self.relay if high else -self.relay)
+            outputs.append(output)
+            self.loop.drive(output)
+
+            block = self.hw.readScan()
+            blocks.append(block)
+            count += len(block)
+            if len(switches) > self.settle + self.cycles:
+                break
+
+        self.hw.setOutput(0)
+        if len(switches) <= self.settle + self.cycles:
+            print("Relay tuning: no steady limit cycle within "
+                  + str(self.timeout) + " s")
+            return None
+
+        # Last 'cycles' full periods of the scanned position
+        start, end = switches[-self.cycles - 1], switches[-1]
+        coil = ((np.concatenate(blocks)[start:end, self.fotodiode]
+                 - self.foto_yoffset) / self.foto_slope)
+        self.Tu = (end - start) / float(self.cycles) / self.scan_rate
+        self.amplitude = (coil.max() - coil.min()) / 2
+        self.Ku = (4 * self.relay / math.pi
+                   / math.sqrt(max(self.amplitude ** 2 - self.hysteresis ** 2,
+                                   1e-30)))
+        return self.Ku, self.Tu
+
+    def gains(self, rule='some overshoot'):
+        # (p_gain, i_gain, d_gain) from Ku and Tu by the named rule
+        kp, ti, td = TUNING_RULES[rule]
+        p_gain = kp * self.Ku
+        return p_gain, p_gain / (ti * self.Tu), p_gain * td * self.Tu
+
+    def summary(self):
+        return ("Relay tuning: Ku = " + '{:.4g}'.format(self.Ku) + " V/m  Tu = "
+                + '{:.4g}'.format(self.Tu * 1e3) + " ms  amplitude = "
+                + '{:.3g}'.format(self.amplitude * 1e6) + " um  bias = "
+                + '{:.3g}'.format(self.bias) + " V")
@@ -0,0 +1,212 @@
+import time
+
+import numpy as np
+
+from recorder import openRun
+from scheduler import Sleeper
+
+
+class ScanRing(object):
+    # Host side ring buffer of a continuous multi-input scan. Frames are
+    # rows with one calibrated sample per input; the ring keeps the last
+    # 'seconds' of frames and 'latest' the newest one.
+    def __init__(self, names, rate, seconds=10):
+        self.names = tuple(names)
+        self.index = dict((name, i) for i, name in enumerate(self.names))
+        self.nch = len(self.names)
+        self.rate = rate
+
+        self.ring = np.zeros((max(int(rate * seconds), 1), self.nch))
+        self.head = 0
+        self.filled = 0
+        self.pushed = 0
+        self.taken = 0
+        self.latest = np.zeros(self.nch)
+        self.overruns = 0
+        self.empty = np.zeros((0, self.nch))
+
+    def poll(self):
+        # Returns the new frames (n x inputs) since the last call
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+    def last(self, n):
+        # Last n frames in acquisition order
+        n = min(n, self.filled)
+        idx = (self.head - n + np.arange(n)) % len(self.ring)
+        return self.ring[idx]
+
+    def take(self):
+        # Frames pushed since the last take(), at most one ring length
+        n = self.pushed - self.taken
+        self.taken = self.pushed
+        return self.last(n)
+
+    def _push(self, block):
+        if len(block) == 0:
+            return
+        self.latest = block[-1]
+
+        size = len(self.ring)
+        if len(block) >= size:
+            block = block[-size:]
+        n = len(block)
+        end = self.head + n
+        if end <= size:
+            self.ring[self.head:end] = block
+        else:
+            split = size - self.head
+            self.ring[self.head:] = block[:split]
+            self.ring[:end - size] = block[split:]
+        self.head = end % size
+        self.filled = min(self.filled + n, size)
+        self.pushed += n
+
+
+class Backend(object):
+    # Data acquisition backend behind Hardware. Inputs are addressed by
+    # name ('shunt', 'induction', 'fotodiode') and returned in volts after
+    # the input gains, outputs are AO4 channel voltages. The clock methods
+    # let simulated backends run on virtual time; real backends use the
+    # monotonic perf_counter clock and a hybrid sleep-then-spin wait.
+    def __init__(self):
+        self.scan = None
+        self.sleeper = Sleeper(time.perf_counter)
+
+    def setOutputs(self, voltages, wait=True):
+        # voltages: dict {channel: voltage}
+        raise NotImplementedError
+
+    def readInput(self, name):
+        raise NotImplementedError
+
+    def readChannel(self, ch):
+        raise NotImplementedError
+
+    def startScan(self, rate, names, seconds):
+        raise NotImplementedError
+
+    def stopScan(self):
+        if self.scan != None:
+            self.scan.stop()
+            self.scan = None
+
+    def switchRelay(self, state):
+        raise NotImplementedError
+
+    def time(self):
+        return time.perf_counter()
+
+    def waitUntil(self, t):
+        self.sleeper.waitUntil(t)
+
+    def finished(self):
+        # True once a replay has no more recorded inputs
+        return False
+
+    def prompt(self, message):
+        # Operator has to confirm before the run continues
+        return input(message)
+
+    def changeMasses(self, message, masses):
+        # masses: {'tare': side, 'test': side} with side -1 (left),
+        # 1 (right) or 0 (removed); the operator does it on the rig
+        print(message)
+
+    def close(self):
+        self.stopScan()
+
+
+class ReplayScan(ScanRing):
+    # Delivers the recorded frames between two polls
+    def __init__(self, replay, names, rate, seconds):
+        ScanRing.__init__(self, names, rate, seconds)
+        self.replay = replay
+        self.columns = [replay.inputs[name] for name in self.names]
+        self.next = replay.position()
+
+    def poll(self):
+        end = self.replay.position() + 1
+        if end <= self.next:
+            return self.empty
+        block = np.column_stack([c[self.next:end] for c in self.columns])
+        self.next = end
+        self._push(block)
+        return block
+
+
+class ReplayBackend(Backend):
+    # Plays back recorded inputs on a virtual clock starting at t[0].
+    # Written outputs and relay states are collected in 'outputs' but do
+    # not influence the replayed inputs.
+    def __init__(self, t, inputs):
+        Backend.__init__(self)
+        self.t = np.asarray(t, dtype=float)
+        self.inputs = dict((name, np.asarray(v, dtype=float))
+                           for name, v in inputs.items())
+        self.now = self.t[0]
+        self.outputs = []
+
+    @classmethod
+    def load(cls, path):
+        # .npz file with the time stamps 't' and one array per input
+        data = np.load(path)
+        inputs = dict((name, data[name]) for name in data.files if name != 't')
+        return cls(data['t'], inputs)
+
+    @classmethod
+    def fromRun(cls, path):
+        # Scanned frames of a run directory (recorder.openRun). The frame
+        # numbers start over with every scan, frame / rate after its
+        # recorded start is the acquisition time.
+        run = openRun(path)
+        if 'scan' not in run or 'scan_start' not in run:
+            raise ValueError("no scan with start times recorded in " + path)
+        scan = run['scan']
+        frame = np.asarray(scan['frame'])
+        segment = np.concatenate(([0], np.cumsum(np.diff(frame) <= 0)))
+        start = np.asarray(run['scan_start']['t'])[segment]
+        rate = np.asarray(run['scan_start']['rate'])[segment]
+        inputs = dict((name, np.asarray(column))
+                      for name, column in scan.items() if name != 'frame')
+        return cls(start + frame / rate, inputs)
+
+    def position(self):
+        # Index of the newest recorded sample at the current replay time
+        i = np.searchsorted(self.t, self.now, side='right') - 1
+        return min(max(i, 0), len(self.t) - 1)
+
+    def finished(self):
+        return self.now >= self.t[-1]
+
+    def setOutputs(self, voltages, wait=True):
+        self.outputs.append((self.now, dict(voltages)))
+        return True
+
+    def readInput(self, name):
+        return self.inputs[name][self.position()]
+
+    def readChannel(self, ch):
+        return self.inputs['ch' + str(ch)][self.position()]
+
+    def startScan(self, rate, names, seconds):
+        self.stopScan()
+        self.scan = ReplayScan(self, names, rate, seconds)
+        return self.scan
+
+    def switchRelay(self, state):
+        self.outputs.append((self.now, {'relay': state}))
+
+    def time(self):
+        return self.now
+
+    def waitUntil(self, t):
+        self.now = max(self.now, t)
+
+    def prompt(self, message):
+        print(message)
+
+    def changeMasses(self, message, masses):
+        print(message)
@@ -0,0 +1,146 @@
+import numpy as np
+
+from analysis import fitLine, matchedDerivative
+
+
+class BLProfile(object):
+    # Position dependence BL(z) of the main coil from velocity mode records.
+    # The samples are binned by coil position and every bin gives BL as the
+    # least-squares slope of induction voltage over velocity (through the
+    # origin, after the offset of the whole record). A weighted polynomial
+    # in z smooths the bins and is cached as a table on a fine z grid, so
+    # evaluate() is one np.interp per call. Profile and bins are saved to
+    # and loaded from .npz files.
+    #
+    # A velocity mode BL is the v**2 weighted mean of BL(z) over the
+    # positions it swept; basis holds that mean of the polynomial basis for
+    # the records of the profile, so relative(z) is the factor from such a
+    # BL to BL(z). For a BL from other records (e.g. a loaded profile
+    # applied to a new run) pass their basis from weighting() or
+    # weightingOf().
+    def __init__(self, coef, cov, basis, z_range, bins=None, points=201):
+        self.coef = np.asarray(coef, dtype=float)
+        self.cov = np.asarray(cov, dtype=float)
+        self.basis = np.asarray(basis, dtype=float)
+        self.z_range = tuple(z_range)
+        self.bins = bins
+
+        self.z = np.linspace(self.z_range[0], self.z_range[1], points)
+        table = np.vander(self.z, len(self.coef))
+        self.BL = table.dot(self.coef)
+        self.sigma = np.sqrt(np.einsum('ij,jk,ik->i', table, self.cov, table))
+
+    @classmethod
+    def fromRecords(cls, records, dt, bin_width=2e-4, degree=2,
+                    min_samples=50, window=51, order=3):
+        # records: (coil_pos, induction) pairs of uniformly sampled frames,
+        # e.g. the velocity mode and every sweep segment
+        z, v, u = _samples(records, dt, window, order)
+        u = u - fitLine(v, u)[1]
+
+        # Per bin sums for the slope through the origin and its error
+        edges = np.arange(z.min(), z.max() + bin_width, bin_width)
+        index = np.clip(np.digitize(z, edges) - 1, 0, len(edges) - 2)
+        nbins = len(edges) - 1
+        n = np.bincount(index, minlength=nbins)
+        svv = np.bincount(index, v * v, nbins)
+        suv = np.bincount(index, u * v, nbins)
+        suu = np.bincount(index, u * u, nbins)
+        sz = np.bincount(index, z, nbins)
+
+        keep = (n >= min_samples) & (svv > 0)
+        slope = suv[keep] / svv[keep]
+        ssr = suu[keep] - slope * suv[keep]
+        sigma = np.sqrt(np.maximum(ssr, 0) / (n[keep] - 1) / svv[keep])
+        centers = sz[keep] / n[keep]
+        bins = np.rec.fromarrays((centers, slope, sigma, n[keep]),
+                                 names=('z', 'BL', 'sigma', 'n'))
+
+        # Weighted polynomial through the bins, with its covariance scaled
+        # up if the bins scatter more than their errors
+        degree = min(degree, len(centers) - 1)
+        design = np.vander(centers, degree + 1)
+        w = 1.0 / sigma ** 2
+        cov = np.linalg.inv(design.T.dot(design * w[:, None]))
+        coef = cov.dot(design.T.dot(w * slope))
+        if len(centers) > degree + 1:
+            chi2 = (w * (slope - design.dot(coef)) ** 2).sum()
+            cov = cov * max(chi2 / (len(centers) - degree - 1), 1.0)
+
+        basis = _weighting(z, v, degree + 1)
+        return cls(coef, cov, basis, (centers.min(), centers.max()), bins)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        bins = None
+        if 'bins' in data:
+            bins = data['bins'].view(np.recarray)
+        return cls(data['coef'], data['cov'], data['basis'], data['z_range'],
+                   bins)
+
+    def save(self, path):
+        arrays = {'coef': self.coef, 'cov': self.cov, 'basis': self.basis,
+                  'z_range': np.array(self.z_range)}
+        if self.bins is not None:
+            arrays['bins'] = np.asarray(self.bins)
+        np.savez(path, **arrays)
+
+    def covers(self, z):
+        return self.z_range[0] <= z <= self.z_range[1]
+
+    def evaluate(self, z):
+        # BL and its uncertainty at z from the table; outside the measured
+        # range the end values are held
+        return np.interp(z, self.z, self.BL), np.interp(z, self.z, self.sigma)
+
+    def weighting(self, z, v):
+        # Basis of a BL measured at coil positions z with velocities v
+        return _weighting(np.asarray(z, dtype=float),
+                          np.asarray(v, dtype=float), len(self.coef))
+
+    def weightingOf(self, records, dt, window=51, order=3):
+        # Basis of a BL measured on (coil_pos, induction) records, as in
+        # fromRecords
+        z, v, u = _samples(records, dt, window, order)
+        return _weighting(z, v, len(self.coef))
+
+    def relative(self, z, basis=None):
+        # BL(z) over the velocity mode BL and its uncertainty, for the BL
+        # of basis (by default the records of the profile). The common level
+        # of the profile cancels, only the shape errors remain.
+        if basis is None:
+            basis = self.basis
+        z = min(max(z, self.z_range[0]), self.z_range[1])
+        ref = basis.dot(self.coef)
+        d = np.vander([z], len(self.coef))[0] - basis
+        return 1 + d.dot(self.coef) / ref, np.sqrt(d.dot(self.cov).dot(d)) / ref
+
+    def summary(self):
+        mid = len(self.z) // 2
+        return ("BL(z) profile: z = " + '{:.3f}'.format(self.z[0] * 1e3)
+                + " .. " + '{:.3f}'.format(self.z[-1] * 1e3) + " mm  BL = "
+                + '{:.5f}'.format(self.BL[0]) + " .. "
+                + '{:.5f}'.format(self.BL[-1]) + " Tm  BL("
+                + '{:.3f}'.format(self.z[mid] * 1e3) + " mm) = "
+                + '{:.5f}'.format(self.BL[mid]) + " +- "
+                + '{:.5f}'.format(self.sigma[mid]) + " Tm")
+
+
+def _samples(records, dt, window, order):
+    # Coil positions, velocities and induction voltages of the records,
+    # without the extrapolated ends of the derivatives
+    z, v, u = [], [], []
+    for coil_pos, induction in records:
+        velocity, voltage = matchedDerivative(coil_pos, induction, dt,
+                                              window, order)
+        used = slice(window // 2, len(velocity) - window // 2)
+        z.append(np.asarray(coil_pos, dtype=float)[used])
+        v.append(velocity[used])
+        u.append(voltage[used])
+    return np.concatenate(z), np.concatenate(v), np.concatenate(u)
+
+
+def _weighting(z, v, columns):
+    # v**2 weighted mean of the polynomial basis over the positions z
+    return (v * v).dot(np.vander(z, columns)) / v.dot(v)
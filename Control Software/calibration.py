@@ -0,0 +1,137 @@
+import json
+import os
+import sys
+import time
+
+
+class Calibration(object):
+    # Calibration values in effect at one point of the store history:
+    # name -> (value, uncertainty, id, time) of the newest entry setting it
+    def __init__(self, values, cal_id=None):
+        self.values = values
+        self.id = cal_id
+
+    def value(self, name, default=None):
+        if name in self.values:
+            return self.values[name][0]
+        return default
+
+    def sigma(self, name, default=0.0):
+        if name in self.values and self.values[name][1] != None:
+            return self.values[name][1]
+        return default
+
+    def summary(self):
+        if self.id == None:
+            return "Calibration: no entries in the store, defaults used"
+        lines = ["Calibration (up to #" + str(self.id) + "):"]
+        for name in sorted(self.values):
+            value, sigma, cal_id, stamp = self.values[name]
+            line = "  " + name + " = " + str(value)
+            if sigma:
+                line += " +- " + str(sigma)
+            lines.append(line + "   (#" + str(cal_id) + ", " + stamp + ")")
+        return "\n".join(lines)
+
+
+class CalibrationStore(object):
+    # Append-only history of calibrations in one JSON file. Every entry has
+    # an id, a time stamp, the values it measured with their uncertainties
+    # ({name: [value, sigma]}, sigma None if unknown), a note and its source
+    # (e.g. the run directory). An entry only holds what one calibration
+    # measured; select() merges the history up to an id or a date into the
+    # values in effect then.
+    def __init__(self, path='calibrations.json'):
+        self.path = path
+        self.entries = []
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def add(self, values, note='', source=''):
+        # values: {name: value} or {name: (value, sigma)}; returns the id
+        entry = {
+            'id': self.entries[-1]['id'] + 1 if self.entries else 1,
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'values': {},
+            'note': note,
+            'source': source,
+        }
+        for name, value in values.items():
+            if isinstance(value, (tuple, list)):
+                entry['values'][name] = [float(value[0]), None if value[1] == None
+                                         else float(value[1])]
+            else:
+                entry['values'][name] = [float(value), None]
+        self.entries.append(entry)
+        self._save()
+        return entry['id']
+
+    def entry(self, cal_id):
+        for entry in self.entries:
+            if entry['id'] == cal_id:
+                return entry
+        raise KeyError("no calibration #" + str(cal_id))
+
+    def select(self, cal_id=None, at=None, source=None):
+        # Values in effect after entry cal_id, or at the given time
+        # ('YYYY-MM-DD' for the end of that day, or 'YYYY-MM-DD HH:MM:SS');
+        # the newest entries without either. Later entries from source
+        # (e.g. calibrated in the current run) are applied on top.
+        if cal_id != None:
+            self.entry(cal_id)
+        if at != None and len(at) == 10:
+            at += ' 23:59:59'
+
+        values = {}
+        last = None
+        for entry in self.entries:
+            later = ((cal_id != None and entry['id'] > cal_id)
+                     or (at != None and entry['time'] > at))
+            if later and (source == None or entry['source'] != source):
+                continue
+            for name, (value, sigma) in entry['values'].items():
+                values[name] = (value, sigma, entry['id'], entry['time'])
+            last = entry['id']
+        return Calibration(values, last)
+
+    def selectArg(self, arg, source=None):
+        # Command line selection: an id ('12') or a date / time
+        if arg.isdigit():
+            return self.select(cal_id=int(arg), source=source)
+        return self.select(at=arg, source=source)
+
+    def _save(self):
+        # Written to a temporary file first, so a crash never leaves a
+        # truncated store
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+if __name__ == '__main__':
+    # python calibration.py [--store <file>] list
+    # python calibration.py [--store <file>] set <name> <value> [<sigma>] [<note>]
+    # The store defaults to calibrations.json, the simulation keeps
+    # calibrations-sim.json.
+    args = sys.argv[1:]
+    path = 'calibrations.json'
+    if "--store" in args:
+        i = args.index("--store")
+        path = args[i + 1]
+        del args[i:i + 2]
+    store = CalibrationStore(path)
+    if len(args) > 0 and args[0] == 'set':
+        sigma = float(args[3]) if len(args) > 3 else None
+        note = args[4] if len(args) > 4 else 'set by hand'
+        print("Stored as #" + str(store.add({args[1]: (float(args[2]),
+                                                       sigma)}, note)))
+    elif len(store.entries) == 0:
+        print("Calibration store " + path + " is empty")
+    else:
+        for entry in store.entries:
+            print("#" + str(entry['id']) + "  " + entry['time'] + "  "
+                  + ", ".join(name + " = " + str(value[0])
+                              for name, value in sorted(entry['values'].items()))
+                  + ("  (" + entry['note'] + ")" if entry['note'] else ""))
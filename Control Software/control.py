@@ -1,27 +1,34 @@
 import matplotlib.pyplot as plt
 
-from mcculw import ul
-from mcculw.enums import ULRange
-from mcculw.ul import ULError
-
 import sys
-sys.path.insert(0, 'LucidIO')
-
-from LucidControlAO4 import LucidControlAO4
-from Values import ValueVOS4
-import IoReturn
 
 import numpy as np
 
-import time, math
+import math
+
+import os
 
 from hardware import Hardware
+from backend import ReplayBackend
+from simulation import SimBackend
+from positionloop import PositionLoop
+from telemetry import Telemetry
+from recorder import RunRecorder
+from analysis import BLFit, LockIn, fitLine, massBudget
+from estimators import (MassEstimator, PlateauDetector, RecursiveLine,
+                        RunningStats, StreamingDerivative)
+from sweep import SWEEP_FIELDS, VelocitySweep
+from blprofile import BLProfile
+from calibration import CalibrationStore
+from filters import FilterChain, mainsNotches
+from fotocal import FOTOCAL_FIELDS, FotodiodeCalibration
+from autotune import RelayTuner
 
 
 
 
 def calibrate():
-    # Fotodiode intensity calibration
+    # Fotodiode intensity calibration, stored in the calibration store
     print("Give calibration values in m: ")
     L = float(input("L: "))
     l = float(input("l: "))
@@ -43,7 +50,10 @@ def calibrate():
         a_list.append(a)
         intensity_list.append(hw.readChannel(3))
 
-    slope, yoffset = np.polyfit(a_list, intensity_list, 1)
+    slope, yoffset, cov, residuals = fitLine(a_list, intensity_list)
+    cal_id = calibration_store.add({'foto_slope': (slope, math.sqrt(cov[0, 0])),
+                                'foto_yoffset': (yoffset, math.sqrt(cov[1, 1]))},
+                               note="fotodiode calibration", source=run.path)
 
     print("##### RESULTS #####")       
     print("d values: " + str(d_list))
@@ -51,6 +61,7 @@ def calibrate():
     print("intensity values: " + str(intensity_list))
     print("slope: " + str(slope))
     print("y-offset: " + str(yoffset))
+    print("Stored as calibration #" + str(cal_id))
 
     plt.scatter(a_list, intensity_list, s=8)
 
@@ -65,51 +76,110 @@ def calibrate():
     plt.show()
 
 
-def getNeededCurrent(p_gain, i_gain, d_gain, setpoint, duration):
-    # PID control to level the balance to a satisfiable uncertainty
-    t_start = time.time()
-    t = 0
+def calibrateAuto():
+    # Automatic fotodiode calibration ("--calibrate auto"): the coil is
+    # stepped through calibration_positions and its position measured with
+    # the integrated induction voltage (fotocal.FotodiodeCalibration), which
+    # needs a BL from an earlier velocity mode
+    BL = cal.value('BL')
+    if BL == None:
+        print("No BL in the calibration store, run the velocity mode or "
+              "the manual calibration first")
+        return
+
+    fotocal = FotodiodeCalibration(hw, (p_gain_vel, i_gain_vel, d_gain_vel),
+                                   cal.value('foto_slope', 4.9042),
+                                   cal.value('foto_yoffset', -0.0209), BL,
+                                   scan_inputs, scan_rate,
+                                   stream=run.stream('fotocal', FOTOCAL_FIELDS))
+    try:
+        points = fotocal.run(calibration_positions)
+    except RuntimeError as e:
+        print("Automatic calibration failed, the current one is kept: " + str(e))
+        return
+    print(fotocal.summary())
+
+    (slope, yoffset), cov, residuals = fotocal.fit(1)
+    cal_id = calibration_store.add({'foto_slope': (slope, math.sqrt(cov[0, 0])),
+                                'foto_yoffset': (yoffset, math.sqrt(cov[1, 1]))},
+                               note="automatic fotodiode calibration",
+                               source=run.path)
+
+    print("##### RESULTS #####")
+    print("slope: " + str(slope) + " +- " + str(math.sqrt(cov[0, 0])))
+    print("y-offset: " + str(yoffset) + " +- " + str(math.sqrt(cov[1, 1])))
+    print("Stored as calibration #" + str(cal_id))
+
+    plt.scatter(points['z'], points['fotodiode'], s=8)
 
-    last_error = 0
-    i_correction = 0
+    axes = plt.gca()
+    plt.title('Automatic fotodiode intensity calibration')
+    plt.xlabel('z [m]')
+    plt.ylabel('Fotodiode voltage [V]')
+    x_vals = np.array(axes.get_xlim())
+    y_vals = yoffset + slope * x_vals
+    plt.plot(x_vals, y_vals, color='#f29f04', ls='--')
 
-    current_list = []
+    plt.show()
 
-    while t < duration:
-        t = time.time() - t_start
-        error = setpoint - (hw.readFotodiode() - foto_yoffset) / foto_slope
-        p_correction = p_gain * error
-        i_correction += i_gain * error * dt
-        d_correction = d_gain * (error - last_error) / dt
 
-        total_correction = p_correction + i_correction + d_correction
+def tune():
+    # Relay feedback tuning ("--tune", autotune.RelayTuner) of the velocity
+    # mode (drive coil, 40 ms loop) and force mode (main coil, 10 ms loop)
+    # PIDs. On the simulated balance Ziegler-Nichols gains track the
+    # velocity mode sine closest, the force mode settles fastest after a
+    # mass change without overshoot.
+    values = {}
+    for mode, relay, loop_dt, rule, names in (
+            ('velocity', False, 0.04, 'ziegler-nichols',
+             ('p_gain_vel', 'i_gain_vel', 'd_gain_vel', 'Ku_vel', 'Tu_vel')),
+            ('force', True, 0.01, 'no overshoot',
+             ('p_gain', 'i_gain', 'd_gain', 'Ku', 'Tu'))):
+        hw.switchRelay(relay)
+        tuner = RelayTuner(hw, cal.value('foto_slope', 4.9042),
+                           cal.value('foto_yoffset', -0.0209), scan_inputs,
+                           scan_rate, loop_dt, track=(mode == 'velocity'))
+        if tuner.run() == None:
+            print("No " + mode + " mode gains, the current ones are kept")
+            continue
+        gains = tuner.gains(rule)
+        print(mode.capitalize() + " mode:  " + tuner.summary())
+        print("  " + rule + " gains: P = " + str(round(gains[0], 1)) + "  I = "
+              + str(round(gains[1], 1)) + "  D = " + str(round(gains[2], 2)))
+        values.update(zip(names, gains + (tuner.Ku, tuner.Tu)))
+    hw.switchRelay(False)
+
+    if values:
+        cal_id = calibration_store.add(values, note="relay tuning", source=run.path)
+        print("Stored as calibration #" + str(cal_id))
 
-        if total_correction > 12.0:
-            total_correction = 12.0
-        elif total_correction < -12.0:
-            total_correction = -12.0
-        
-        hw.setOutput(total_correction)
-        current_list.append(hw.readShuntVoltage() / 198)
+
+def getNeededCurrent(p_gain, i_gain, d_gain, setpoint, duration):
+    # PID control to level the balance to a satisfiable uncertainty
+    last_error = 0
+    loop = PositionLoop(hw, (p_gain, i_gain, d_gain), foto_slope,
+                        foto_yoffset, dt, track=False)
+
+    current_log = Telemetry(('t', 'current'), int(duration / dt) + 1,
+                            stream=run.stream('level', ('t', 'current')))
+
+    for t in loop.run(duration):
+        coil_pos = loop.step(setpoint)
+        error = setpoint - coil_pos
+        current_log.append(t, hw.readShuntVoltage() / shunt)
 
         #print("error: " + str(error) + "  output: " + str(total_correction))
         last_error = error
-        
-        while time.time() - t_start < t + dt:
-            pass
 
-    # Measure current through coil
-    I_mean = 0
-    current_list_len = len(current_list)
-    
-    for i in range(current_list_len - 101, current_list_len):
-        I_mean += hw.readShuntVoltage() / 198 # 198 Ohms shunt resistor
-        
-    I = I_mean / 100
+    print(loop.summary())
+
+    # Measure current through coil: mean of the last 100 samples, taken
+    # from the scan record instead of 100 extra reads
+    I = current_log.mean('current', 100)
 
     print("PID control finished. I = " + str(I) + " A  Error = " + str(last_error))
 
-    plt.plot(current_list)
+    plt.plot(current_log.data()['current'])
     plt.show()
     
     return I
@@ -117,163 +187,360 @@ def getNeededCurrent(p_gain, i_gain, d_gain, setpoint, duration):
 
 def getNeededCurrentFast(p_gain, i_gain, d_gain):
     # PID control to level the balance to a satisfiable uncertainty
-    t_start = time.time()
-    t = 0
-
     last_error = 0
-    i_correction = 0
-
-    current_list = []
-
-    meas_step = 1
-    I1, I2, I3, I4, I5 = 0, 0, 0, 0, 0
-
-    while True:
-        t = time.time() - t_start
-        
-        if t >= 20 * meas_step:
-            if meas_step == 1:
-                print("Put the Tare MASS on the left side")
-            elif meas_step == 2:
-                I1 = sum(current_list[-100:]) / 100
-                print("Put the TEST MASS on the right side")
-            elif meas_step == 3:
-                I2 = sum(current_list[-100:]) / 100
-                print("Remove the TEST MASS on the right side")
-            elif meas_step == 4:
-                I3 = sum(current_list[-100:]) / 100
-                print("Put the TEST MASS on the left right side")
-            elif meas_step == 5:
-                I4 = sum(current_list[-100:]) / 100
-                print("Remove the TEST MASS on the right side")
-            elif meas_step == 6:
-                I5 = sum(current_list[-100:]) / 100
-                print("Remove the TARE MASS on the left side")
+    loop = PositionLoop(hw, (p_gain, i_gain, d_gain), foto_slope,
+                        foto_yoffset, dt, track=False)
+
+    # Last minute of coil currents, all of them are recorded with the run
+    current_log = Telemetry(('t', 'current'), int(60 / dt),
+                            stream=run.stream('force', ('t', 'current')))
+
+    # Mass changes of the sequence. Every change is followed by a plateau
+    # of the current: I1..I5 after the first five, and the level balance
+    # after the last one ends the force mode.
+    changes = [("Put the Tare MASS on the left side", {'tare': -1}),
+               ("Put the TEST MASS on the right side", {'test': 1}),
+               ("Remove the TEST MASS on the right side", {'test': 0}),
+               ("Put the TEST MASS on the left right side", {'test': 1}),
+               ("Remove the TEST MASS on the right side", {'test': 0}),
+               ("Remove the TARE MASS on the left side", {'tare': 0})]
+
+    # The next mass change is prompted as soon as the current has settled
+    # and has been averaged long enough (estimators.PlateauDetector). A
+    # plateau within step_min of the previous one means the masses have not
+    # been moved yet, so it is measured again; after max_repeats of them in
+    # a row the mass change is prompted once more. The force mode ends after
+    # force_timeout or at the end of a replay, with the plateaus measured by
+    # then.
+    plateau = PlateauDetector()
+    step_min = 1e-3 # A
+    max_repeats = 10
+    force_timeout = 600 # s
+    meas_step = 0
+    previous = None
+    repeats = 0
+
+    # Plateau means I1..I5 and the live mass from the plateaus measured so
+    # far. The plateau being averaged counts with its running mean once it
+    # is step_min away from the previous one, the live mass of every tick is
+    # recorded with the run.
+    mass_est = MassEstimator(BL, sigma_BL, g)
+    live_log = run.stream('live_mass', ('t', 'mass', 'sigma_mass'))
+
+    # Mean coil position while the currents are measured, for BL(z)
+    position = RunningStats()
+
+    try:
+        for t in loop.run(force_timeout):
+            if hw.finished():
+                print("Replay finished in force mode step " + str(meas_step))
+                break
+            coil_pos = loop.step(setpoint)
+            error = setpoint - coil_pos
+            current = hw.readShuntVoltage() / shunt
+            current_log.append(t, current)
+
+            last_error = error
+            if meas_step >= 1:
+                position.push(coil_pos)
+
+            state = plateau.push(current)
+            if 1 <= meas_step <= 5:
+                if (state != PlateauDetector.SETTLING
+                        and abs(plateau.mean() - previous) >= step_min
+                        and plateau.sem() < math.inf):
+                    mass_est.push(meas_step - 1, plateau.mean(), plateau.sem())
+                else:
+                    mass_est.clear(meas_step - 1)
+            live = mass_est.mass()
+            if live != None:
+                live_log.append(t, live[0], live[1])
             else:
+                live_log.append(t, math.nan, math.nan)
+
+            if state != PlateauDetector.DONE:
+                continue
+
+            if previous != None and abs(plateau.mean() - previous) < step_min:
+                plateau.reset()
+                repeats += 1
+                if repeats >= max_repeats:
+                    print("The current did not change in step " + str(meas_step)
+                          + ", waiting for the mass change")
+                    hw.changeMasses(*changes[meas_step - 1])
+                    repeats = 0
+                continue
+            repeats = 0
+
+            print("Plateau " + str(meas_step) + " at " + str(round(t, 2))
+                  + " s: I = " + str(plateau.mean()) + " +- "
+                  + str(plateau.sem()) + " A")
+            if 1 <= meas_step <= 5:
+                if live != None:
+                    print("Live: m = " + str(live[0]) + " +- " + str(live[1]) + " kg")
+            if meas_step == len(changes):
                 break
 
+            hw.changeMasses(*changes[meas_step])
+            previous = plateau.mean()
+            plateau.reset()
             meas_step += 1
-        
-        error = setpoint - (hw.readFotodiode() - foto_yoffset) / foto_slope
-        p_correction = p_gain * error
-        i_correction += i_gain * error * dt
-        d_correction = d_gain * (error - last_error) / dt
+        else:
+            print("Force mode timed out after " + str(force_timeout)
+                  + " s in step " + str(meas_step))
+    except KeyboardInterrupt:
+        # Operator abort, keep the plateaus measured so far
+        print("Force mode aborted in step " + str(meas_step))
 
-        total_correction = p_correction + i_correction + d_correction
+    print(loop.summary())
 
-        if total_correction > 12.0:
-            total_correction = 12.0
-        elif total_correction < -12.0:
-            total_correction = -12.0
-        
-        hw.setOutput(total_correction)
-        current_list.append(hw.readShuntVoltage() / 198)
-
-        last_error = error
-        
-        while time.time() - t_start < t + dt:
-            pass
+    # A plateau still being averaged is left out of the result
+    if 1 <= meas_step <= 5:
+        mass_est.clear(meas_step - 1)
 
+    plt.plot(current_log.data()['current'])
+    plt.show()
+    current_log.close()
+
+    # An aborted or cut short force mode leaves plateaus unmeasured. With at
+    # least one tare and one test mass plateau the current is the partial
+    # one of MassEstimator, with the plateau errors as uncertainty (None
+    # otherwise).
+    missing = [i + 1 for i, p in enumerate(mass_est.plateaus) if p == None]
+    if len(missing) > 0:
+        print("PID control finished without I"
+              + ", I".join(str(i) for i in missing) + "  Error = " + str(last_error))
+        partial = mass_est.current()
+        if partial == None:
+            return None, None, position.mean
+        print("Partial I = " + str(-partial[0]) + " +- " + str(partial[1]) + " A")
+        return -partial[0], partial[1], position.mean
+
+    I1, I2, I3, I4, I5 = [mean for mean, sem in mass_est.plateaus]
     I_total = - (I1 + I3 + I5) / 3 + (I2 + I4) / 2 
 
+    # Uncertainty from the spread of the repeated tare and test currents
+    sigma_I = math.sqrt(np.var([I1, I3, I5], ddof=1) / 3
+                        + np.var([I2, I4], ddof=1) / 2)
+
     print("PID control finished. I = " + str(I_total) + " A  Error = " + str(last_error))
     print("Currents [A]: ", I1, I2, I3, I4, I5)
-
-    plt.plot(current_list)
-    plt.show()
     
-    return I_total
+    return I_total, sigma_I, position.mean
 
 
 
 
 
 
+# Calibration: fotodiode fit, BL, shunt, g and gains with uncertainties
+# from the calibration store (calibration.py), the newest values or with
+# "--calibration <id or date>" those in effect then. Simulated and replayed
+# sessions keep their own store. The numbers below are the fallbacks for
+# values never calibrated.
+if "--sim" in sys.argv or "--replay" in sys.argv:
+    calibration_store = CalibrationStore('calibrations-sim.json')
+else:
+    calibration_store = CalibrationStore('calibrations.json')
+def selectCalibration(source=None):
+    # The calibration chosen with "--calibration", or the newest; source
+    # adds the entries calibrated in that run to a chosen one
+    if "--calibration" in sys.argv:
+        return calibration_store.selectArg(
+            sys.argv[sys.argv.index("--calibration") + 1], source)
+    return calibration_store.select()
+
+cal = selectCalibration()
+print(cal.summary())
+
+shunt = cal.value('shunt', 198) # Ohm
+
 # Parameters
 # Velocity Mode
 max_coil_pos = 0.0012 # 5mm
 T = 1.5 # Period of the sin. actuation voltage in s
-runningTime = 1 # Velocity Mode measuring time in s
+runningTime = 2 * T # Velocity Mode measuring time in s, at most
+lockin_settle = 1.0 # s of the velocity mode left out of the lock-in check
 dt = 0.001
-p_gain_vel = 900
-i_gain_vel = 700
-d_gain_vel = 10
-
-
-hw = Hardware()
+p_gain_vel = cal.value('p_gain_vel', 900)
+i_gain_vel = cal.value('i_gain_vel', 700)
+d_gain_vel = cal.value('d_gain_vel', 10)
+
+# The velocity mode PID acts on coil position and velocity from the Kalman
+# tracker of positionloop.PositionLoop. The force mode keeps the raw
+# position: the tracker lowers its fast current noise, but not the slow
+# noise that limits the plateau means, and the correlated current makes the
+# plateaus average longer.
+
+# Velocity sweep ("--sweep"): (periods, amplitudes, cycles[, center]), several
+# periods and amplitudes in one segment make a multi-tone drive
+sweep_segments = [
+    (T, max_coil_pos, 2),
+    (T / 2, max_coil_pos, 4),
+    (2 * T, max_coil_pos, 1),
+    (T, max_coil_pos / 2, 2),
+    (T, max_coil_pos, 2, 0.001),
+    ((T, T / 3), (0.7 * max_coil_pos, 0.3 * max_coil_pos), 2),
+]
+
+
+# Everything the run reads and writes is recorded to runs/<date_time>/,
+# open it again with recorder.openRun()
+run = RunRecorder()
+print("Recording to " + run.path)
+
+# Backend: lab rig by default, "--sim" for the simulated watt balance,
+# "--replay <file.npz or run directory>" to play back recorded inputs (of a
+# run directory its scanned frames). "--ai4 <port>" reads the shunt voltage
+# from a LucidControl AI4 module averaging on the device (each read the mean
+# over the last 10 ms) instead of single scanned samples.
+ai4_inputs = ()
+if "--sim" in sys.argv:
+    hw = Hardware(SimBackend(), run)
+elif "--replay" in sys.argv:
+    replay = sys.argv[sys.argv.index("--replay") + 1]
+    if os.path.isdir(replay):
+        hw = Hardware(ReplayBackend.fromRun(replay), run)
+    else:
+        hw = Hardware(ReplayBackend.load(replay), run)
+elif "--ai4" in sys.argv:
+    from labbackend import AI4Inputs, LabBackend
+    ai4_inputs = ('shunt',)
+    hw = Hardware(LabBackend(AI4Inputs(sys.argv[sys.argv.index("--ai4") + 1],
+                                       ai4_inputs, nr_samples=10,
+                                       scan_interval=1)), run)
+else:
+    hw = Hardware(recorder=run)
 hw.switchRelay(False)
 
-#calibrate()
+# Hardware-timed acquisition of shunt, induction and fotodiode inputs, the
+# loops read the latest scanned samples without blocking
+scan_rate = 1000
+scan_inputs = tuple(name for name in ('shunt', 'induction', 'fotodiode')
+                    if name not in ai4_inputs)
+# Filter stage of the scanned inputs (filters.py), {} to read them raw:
+# notches at 50 Hz and its harmonics against mains pickup. Fotodiode and
+# induction get the same filters, so velocity and induction voltage of the
+# BL fit stay matched; a filters.MovingMedian in front of both helps
+# against spikes.
+scan_filters = dict((name, FilterChain(mainsNotches(scan_rate)))
+                    for name in ('fotodiode', 'induction'))
+hw.setFilters(scan_filters)
+hw.startScan(scan_rate, scan_inputs)
+hw.waitUntil(hw.time() + 0.5) # until the filters have settled
+
+# Coil positions of the automatic fotodiode calibration
+calibration_positions = np.linspace(-max_coil_pos, max_coil_pos, 13)
+
+if "--calibrate" in sys.argv:
+    if sys.argv[sys.argv.index("--calibrate") + 1:][:1] == ["auto"]:
+        calibrateAuto()
+    else:
+        calibrate()
+    cal = selectCalibration(run.path)
+
+if "--tune" in sys.argv:
+    tune()
+    cal = selectCalibration(run.path)
+    p_gain_vel = cal.value('p_gain_vel', p_gain_vel)
+    i_gain_vel = cal.value('i_gain_vel', i_gain_vel)
+    d_gain_vel = cal.value('d_gain_vel', d_gain_vel)
 
 ##### Calibration
 hw.setOutput(0)
-input("Move the balance in a levelled position and press enter!")
+hw.prompt("Move the balance in a levelled position and press enter!")
 setpoint = hw.readFotodiode() # level position
 
 
 
 ##### Velocity Mode
-t = 0
-t_start = time.time()
 # Fotodiode calibration values
-foto_slope = 4.9042
-foto_yoffset = -0.0209
-
-t_list = []
-t_start = time.time()
-t = 0
+foto_slope = cal.value('foto_slope', 4.9042)
+foto_yoffset = cal.value('foto_yoffset', -0.0209)
 
-last_error = 0
-i_correction = 0
 mean_intensity = 0
 
-setpoint_list = []
-coil_pos_list = []
-induction_voltages = []
-velocities = []
-
 dt = 0.04
 
-while t < runningTime:
-    t = time.time() - t_start
-
-    raw_intensity = hw.readFotodiode()
-    coil_pos = (raw_intensity - foto_yoffset) / foto_slope # coil-position in m
-    setpoint = max_coil_pos * math.sin(2*math.pi / T * t)
-    error = setpoint - coil_pos
-    p_correction = p_gain_vel * error
-    i_correction += i_gain_vel * error * dt
-    d_correction = d_gain_vel * (error - last_error) / dt
-
-    total_correction = p_correction + i_correction + d_correction
-
-    if total_correction > 12.0:
-        total_correction = 12.0
-    elif total_correction < -12.0:
-        total_correction = -12.0
-    
-    hw.setOutput(total_correction)
-
-    #t_list.append(t)
-    setpoint_list.append(setpoint)
-    coil_pos_list.append(coil_pos)
-    induction_voltages.append(hw.readInductionVoltage())
-    velocities.append(max_coil_pos * math.cos(2*math.pi / T * t - 0.63) * 2 * math.pi / T)
-    mean_intensity += raw_intensity
-    
-    while time.time() - t_start < t + dt:
-        pass
-
-    #print("dt: " + str(time.time() - t_start - t))
+velocity_fields = ('t', 'setpoint', 'coil_pos', 'velocity', 'induction')
+velocity_log = Telemetry(velocity_fields, int(runningTime / dt) + 1,
+                         stream=run.stream('velocity', velocity_fields))
+
+loop = PositionLoop(hw, (p_gain_vel, i_gain_vel, d_gain_vel), foto_slope,
+                    foto_yoffset, dt)
+
+# Live BL: recursive line fit of the induction voltage over the velocity of
+# every scanned frame. The velocity mode ends early once BL is known to
+# bl_target (relative) and one drive period after lockin_settle is recorded,
+# or on Ctrl-C.
+bl_target = 1e-3
+live_velocity = StreamingDerivative(1.0 / scan_rate, channels=1)
+live_BL = RecursiveLine()
+scan_blocks = []
+
+hw.readScan() # drop the frames before the velocity mode
+
+try:
+    for t in loop.run(runningTime):
+        setpoint = max_coil_pos * math.sin(2*math.pi / T * t)
+        coil_pos = loop.step(setpoint) # coil-position in m
+
+        velocity_log.append(t, setpoint, coil_pos, loop.velocity,
+                            hw.readInductionVoltage())
+        mean_intensity += loop.raw
+
+        block = hw.readScan()
+        scan_blocks.append(block)
+        v, u = live_velocity.extend(
+            (block[:, scan_inputs.index('fotodiode')] - foto_yoffset) / foto_slope,
+            block[:, scan_inputs.index('induction')])
+        live_BL.extend(v, u)
+
+        if (t >= lockin_settle + T
+                and live_BL.sigmaSlope() < bl_target * abs(live_BL.slope())):
+            print("BL precision reached after " + str(round(t, 3)) + " s")
+            break
+except KeyboardInterrupt:
+    print("Velocity mode aborted")
+
+print(loop.summary())
+print("Live BL = " + str(live_BL.slope()) + " +- " + str(live_BL.sigmaSlope()))
+
+# Scanned fotodiode and induction frames of the whole velocity mode
+scan_blocks.append(hw.readScan())
+frames = np.concatenate(scan_blocks)
+scan_coil_pos = (frames[:, scan_inputs.index('fotodiode')] - foto_yoffset) / foto_slope
+scan_induction = frames[:, scan_inputs.index('induction')]
+
+# BL fit, lock-in and profile need at least one drive period of motion, a
+# velocity mode aborted before that ends the run
+if len(frames) < T * scan_rate:
+    print("Velocity mode record of " + str(round(len(frames) / scan_rate, 3))
+          + " s is shorter than one drive period (" + str(T)
+          + " s), no BL evaluated")
+    hw.setOutput(0)
+    hw.close()
+    sys.exit(1)
+
+# Velocity from the measured coil position (Savitzky-Golay derivative, the
+# induction voltage through the matched filter), aligned to the induction
+# voltage by their cross-correlation lag; the slope of the line fit is BL
+bl_fit = BLFit(scan_coil_pos, scan_induction, 1.0 / scan_rate)
+velocities = bl_fit.velocity[bl_fit.used]
+induction_voltages = bl_fit.induction[bl_fit.used]
 
 axes = plt.gca()
 plt.title('Velocity Mode PID control')
 plt.xlabel('Time [s]')
 plt.ylabel('Coil position [mm]')
-plt.plot(setpoint_list)
-plt.plot(coil_pos_list)
-plt.plot(induction_voltages)
-plt.plot(velocities)
+velocity_data = velocity_log.data()
+setpoints = velocity_data['setpoint']
+coil_positions = velocity_data['coil_pos']
+
+plt.plot(velocity_data['t'], setpoints)
+plt.plot(velocity_data['t'], coil_positions)
+plt.plot(np.arange(len(scan_induction)) / scan_rate, scan_induction)
+plt.plot(np.arange(len(scan_induction)) / scan_rate, bl_fit.velocity)
 
 plt.show()
 
@@ -283,13 +550,51 @@ hw.setOutput(0)
 
 
 
-mean_intensity /= len(velocities)
+mean_intensity /= len(velocity_data)
+
 
+BL, offset = bl_fit.BL, bl_fit.offset
+sigma_BL = bl_fit.sigmaBL()
 
-# Fit to linear function -> slope will be BL
-BL, offset = np.polyfit(velocities, induction_voltages, 1)
+print("Scatter fit: " + bl_fit.summary())
 
-print("VELOCITY MODE FINISHED:  BL = " + str(BL) + " Offset = " + str(offset))
+# Lock-in of the drive frequency and its harmonics as a cross-check, on the
+# frames after the PID start transient (which is not periodic and biases
+# it). The scatter fit stays the result: it uses the transient as well, and
+# the remaining record of at most two periods is too short for a better
+# lock-in result. The sweep below records settled periods for it.
+lockin_start = int(lockin_settle * scan_rate)
+if len(frames) - lockin_start >= T * scan_rate:
+    lockin = LockIn(scan_coil_pos[lockin_start:],
+                    scan_induction[lockin_start:], 1.0 / scan_rate, T)
+    print(lockin.summary())
+
+# Sweep over drive periods, amplitudes and positions, its pooled BL replaces
+# the single velocity mode result
+if "--sweep" in sys.argv:
+    sweep = VelocitySweep(hw, (p_gain_vel, i_gain_vel, d_gain_vel),
+                          foto_slope, foto_yoffset, scan_inputs, scan_rate,
+                          dt=dt, stream=run.stream('sweep', SWEEP_FIELDS))
+    sweep.run(sweep_segments)
+    print(sweep.summary())
+    BL, sigma_BL = sweep.pooled()[:2]
+
+# BL(z) profile from the velocity mode and sweep records; "--profile
+# <file.npz>" reuses the profile of an earlier run instead. Either way it is
+# saved with the run.
+if "--profile" in sys.argv:
+    profile = BLProfile.load(sys.argv[sys.argv.index("--profile") + 1])
+else:
+    records = [(scan_coil_pos, scan_induction)]
+    if "--sweep" in sys.argv:
+        records += sweep.records
+    profile = BLProfile.fromRecords(records, 1.0 / scan_rate)
+profile.save(os.path.join(run.path, 'bl_profile.npz'))
+print(profile.summary())
+
+print("VELOCITY MODE FINISHED:  BL = " + str(BL) + " +- " + str(sigma_BL) + " Tm")
+calibration_store.add({'BL': (BL, sigma_BL)}, note="velocity mode",
+                      source=run.path)
 
 
 plt.scatter(velocities, induction_voltages, s=8)
@@ -310,19 +615,65 @@ hw.switchRelay(True)
 
 
 ##### Force Mode
-g = 9.8326
-p_gain = 1900
-i_gain = 15000   ########## !!!!!! NOT ZERO
-d_gain = 50
+g = cal.value('g', 9.8326)
+p_gain = cal.value('p_gain', 1900)
+i_gain = cal.value('i_gain', 15000)   ########## !!!!!! NOT ZERO
+d_gain = cal.value('d_gain', 50)
 
 dt = 0.01 #s
-
-I_total = getNeededCurrentFast(p_gain, i_gain, d_gain)
-
-I_total *= -1
-
-mass = BL * I_total / g
-
-print("FORCE MODE FINISHED:  m = " + str(mass) + " kg   I = " + str(I_total) + " A")
+# Level position of the coil, the centre of the velocity mode sine (which
+# can stop early anywhere in its period)
+setpoint = 0.0
+
+I_total, sigma_I, z_force = getNeededCurrentFast(p_gain, i_gain, d_gain)
+
+if I_total != None:
+    I_total *= -1
+
+    # BL at the force mode position: the velocity mode BL scaled by the
+    # profile. The profile of the velocity mode alone is too poorly
+    # determined for that (it doubles sigma_BL), it is only applied with
+    # "--profile" or "--sweep" and BL is used unprofiled otherwise. The
+    # factor is taken against the positions BL was measured at in this run
+    # (the sweep or the velocity mode), not those of a loaded profile.
+    if "--profile" in sys.argv or "--sweep" in sys.argv:
+        if not profile.covers(z_force):
+            print("Force mode position " + str(z_force) + " m is outside the BL(z) profile")
+        if "--sweep" in sys.argv:
+            basis = profile.weightingOf(sweep.records, 1.0 / scan_rate)
+        else:
+            basis = profile.weighting(scan_coil_pos[bl_fit.used],
+                                      bl_fit.velocity[bl_fit.used])
+        ratio, sigma_ratio = profile.relative(z_force, basis)
+    else:
+        ratio, sigma_ratio = 1.0, 0.0
+    BL_force = BL * ratio
+    sigma_BL_force = math.sqrt((sigma_BL * ratio) ** 2 + (BL * sigma_ratio) ** 2)
+    print("BL(" + str(round(z_force * 1e3, 4)) + " mm) = " + str(BL_force)
+          + " +- " + str(sigma_BL_force) + " Tm")
+
+    mass, sigma_mass, shares = massBudget(BL_force, sigma_BL_force, I_total,
+                                          sigma_I, g, cal.sigma('g'),
+                                          cal.sigma('shunt') / shunt)
+
+    print("FORCE MODE FINISHED:  m = " + str(mass) + " +- " + str(sigma_mass)
+          + " kg   I = " + str(I_total) + " +- " + str(sigma_I) + " A")
+    print("Uncertainty budget:  BL " + str(round(100 * shares['BL'], 1))
+          + " %   I " + str(round(100 * shares['I'], 1)) + " %   shunt "
+          + str(round(100 * shares['shunt'], 1)) + " %   g "
+          + str(round(100 * shares['g'], 1)) + " %")
+else:
+    # No mass from part of the plateaus, the result row is kept with NaNs
+    print("FORCE MODE INCOMPLETE:  no mass evaluated")
+    I_total = sigma_I = BL_force = sigma_BL_force = math.nan
+    mass = sigma_mass = math.nan
 
 hw.setOutput(0)
+hw.stopScan()
+
+run.stream('result', ('BL', 'sigma_BL', 'offset', 'lag', 'z_force', 'BL_force',
+                       'sigma_BL_force', 'I_total', 'sigma_I', 'mass',
+                       'sigma_mass')).append(
+    BL, sigma_BL, offset, bl_fit.lag, z_force, BL_force, sigma_BL_force,
+    I_total, sigma_I, mass, sigma_mass)
+hw.close()
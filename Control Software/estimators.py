@@ -0,0 +1,355 @@
+import math
+
+import numpy as np
+
+from analysis import savgolCoefficients
+
+
+class RunningStats(object):
+    # Mean and variance of a sample stream (Welford), O(1) per sample
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def push(self, x):
+        self.n += 1
+        d = x - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (x - self.mean)
+
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    def stderr(self):
+        # Standard error of the mean, for uncorrelated samples
+        return math.sqrt(self.variance() / self.n) if self.n > 1 else math.inf
+
+
+class RecursiveLine(object):
+    # Recursive least squares for y = slope * x + offset. Each sample updates
+    # the estimate, its 2x2 covariance and the residual sum of squares in
+    # O(1); with forget = 1 the result equals the batch fit of all samples.
+    # The first two samples with different x give the exact start values.
+    def __init__(self, forget=1.0):
+        self.forget = forget
+        self.reset()
+
+    def reset(self):
+        self.theta = np.zeros(2)
+        self.P = None
+        self.first = None
+        self.ssr = 0.0
+        self.n = 0
+
+    def push(self, x, y):
+        if self.P is None:
+            if self.first == None or self.first[0] == x:
+                self.first = (x, y)
+                self.n = 1
+                return
+            design = np.array(((self.first[0], 1.0), (x, 1.0)))
+            self.P = np.linalg.inv(design.T.dot(design))
+            self.theta = np.linalg.solve(design, (self.first[1], y))
+            self.n = 2
+            return
+
+        phi = np.array((x, 1.0))
+        Pphi = self.P.dot(phi)
+        denom = self.forget + phi.dot(Pphi)
+        gain = Pphi / denom
+        error = y - phi.dot(self.theta)
+
+        self.theta = self.theta + gain * error
+        self.P = (self.P - np.outer(gain, Pphi)) / self.forget
+        self.ssr = self.forget * self.ssr + error * error * self.forget / denom
+        self.n += 1
+
+    def extend(self, xs, ys):
+        for x, y in zip(xs, ys):
+            self.push(x, y)
+
+    def slope(self):
+        return self.theta[0]
+
+    def offset(self):
+        return self.theta[1]
+
+    def cov(self):
+        # Covariance of (slope, offset), scaled by the residual variance
+        if self.P is None:
+            return np.eye(2) * math.inf
+        return self.P * self.ssr / max(self.n - 2, 1)
+
+    def sigmaSlope(self):
+        return math.sqrt(self.cov()[0, 0]) if self.n > 2 else math.inf
+
+    def ready(self):
+        return self.P is not None
+
+
+class StreamingDerivative(object):
+    # Savitzky-Golay derivative of a sample stream, evaluated at the centre
+    # of the last window: every new sample yields the derivative half a
+    # window back. Side channels passed to extend() come out delayed by the
+    # same amount, so they stay aligned with the derivative.
+    def __init__(self, dt, window=51, order=3, channels=0):
+        self.coeffs = savgolCoefficients(window, order, 1)[window // 2][::-1] / dt
+        self.window = window
+        self.history = np.zeros((0, channels + 1))
+
+    def extend(self, x, *aligned):
+        # Returns the derivatives (and delayed side channels) of all samples
+        # that now have a full window around them
+        block = np.column_stack((x,) + aligned)
+        data = np.concatenate((self.history, block))
+        self.history = data[-(self.window - 1):]
+        if len(data) < self.window:
+            return (np.zeros(0),) * (1 + len(aligned))
+
+        derivative = np.convolve(data[:, 0], self.coeffs, 'valid')
+        half = self.window // 2
+        delayed = tuple(data[half:len(data) - half, 1 + i]
+                        for i in range(len(aligned)))
+        return (derivative,) + delayed
+
+
+class KalmanTracker(object):
+    # Position and velocity of the coil from its position samples: Kalman
+    # filter of a constant velocity model driven by white acceleration
+    # noise (spectral density accel**2), with measurement noise sigma. Each
+    # sample costs a few scalar operations; the gains converge to those of
+    # the steady state alpha-beta filter. The first two samples start it
+    # (position from the first, velocity from their difference).
+    def __init__(self, dt, sigma, accel):
+        self.dt = dt
+        self.r = sigma ** 2
+        # Process noise of one step
+        self.q11 = accel ** 2 * dt ** 3 / 3
+        self.q12 = accel ** 2 * dt ** 2 / 2
+        self.q22 = accel ** 2 * dt
+        self.reset()
+
+    def reset(self):
+        self.position = None
+        self.velocity = 0.0
+        self.n = 0
+
+    def push(self, z):
+        # Returns the filtered (position, velocity) after sample z
+        dt = self.dt
+        if self.n == 0:
+            self.position = z
+            self.p11, self.p12, self.p22 = self.r, 0.0, math.inf
+        elif self.n == 1:
+            self.velocity = (z - self.position) / dt
+            self.position = z
+            self.p11, self.p12, self.p22 = self.r, self.r / dt, 2 * self.r / dt ** 2
+        else:
+            # Predict
+            x = self.position + dt * self.velocity
+            p11 = (self.p11 + 2 * dt * self.p12 + dt * dt * self.p22
+                   + self.q11)
+            p12 = self.p12 + dt * self.p22 + self.q12
+            p22 = self.p22 + self.q22
+            # Update
+            s = p11 + self.r
+            k1 = p11 / s
+            k2 = p12 / s
+            innovation = z - x
+            self.position = x + k1 * innovation
+            self.velocity = self.velocity + k2 * innovation
+            self.p11 = (1 - k1) * p11
+            self.p12 = (1 - k1) * p12
+            self.p22 = p22 - k2 * p12
+        self.n += 1
+        return self.position, self.velocity
+
+    def extend(self, zs):
+        # Filtered positions and velocities of a block of samples
+        out = np.array([self.push(z) for z in zs]).reshape(-1, 2)
+        return out[:, 0], out[:, 1]
+
+    def cov(self):
+        # Covariance of (position, velocity)
+        return np.array(((self.p11, self.p12), (self.p12, self.p22)))
+
+
+class MassEstimator(object):
+    # Live force mode result: the current plateaus are averaged as they are
+    # measured, with the tare-only plateaus (I1, I3, I5) against the test
+    # mass ones (I2, I4), and combined with BL from the velocity mode. The
+    # test mass weight is balanced by I = I_tare - I_test. Each plateau is
+    # (mean, sem) of its PlateauDetector, so its uncertainty is the one
+    # corrected for correlated samples; None until it is measured. push()
+    # updates the plateau being measured on every sample, so the mass is
+    # live while it is averaged.
+    def __init__(self, BL, sigma_BL, g, groups=('tare', 'test', 'tare',
+                                                'test', 'tare')):
+        self.BL = BL
+        self.sigma_BL = sigma_BL
+        self.g = g
+        self.groups = groups
+        self.plateaus = [None for group in groups]
+
+    def push(self, plateau, mean, sem):
+        # Running mean and sem of plateau, the latest replaces the earlier
+        self.plateaus[plateau] = (mean, sem)
+
+    def clear(self, plateau):
+        # Plateau not (or no longer) measured
+        self.plateaus[plateau] = None
+
+    def current(self):
+        # I and its uncertainty from the plateaus measured so far, None
+        # until each group has one
+        means = {}
+        for group in set(self.groups):
+            measured = [p for p, g in zip(self.plateaus, self.groups)
+                        if g == group and p != None]
+            if len(measured) == 0:
+                return None
+            means[group] = (sum(mean for mean, sem in measured) / len(measured),
+                            sum(sem ** 2 for mean, sem in measured)
+                            / len(measured) ** 2)
+        I = means['tare'][0] - means['test'][0]
+        return I, math.sqrt(means['test'][1] + means['tare'][1])
+
+    def mass(self):
+        # (mass, uncertainty) or None, see current(); None for I == 0 too
+        result = self.current()
+        if result == None or result[0] == 0:
+            return None
+        I, sigma_I = result
+        mass = self.BL * I / self.g
+        sigma = abs(mass) * math.sqrt((self.sigma_BL / self.BL) ** 2
+                                      + (sigma_I / I) ** 2)
+        return mass, sigma
+
+
+class PlateauDetector(object):
+    # Decides when a stream (the force mode coil current) has settled and
+    # how long to average it. Over a rolling window of the last 'window'
+    # samples it keeps the sums for a line fit in O(1) per sample:
+    #   - slope test: the drift over the window must be below drift_tol, or
+    #     not significant (|slope| < 2 sigma) if the noise is larger
+    #   - variance test: the scatter about the line must be below std_max,
+    #     which rejects oscillations and disturbances
+    # Once both pass the window samples are taken as the start of the
+    # plateau, and averaging goes on until the standard error of the mean,
+    # corrected for the lag-1 autocorrelation of the samples, is below
+    # sem_target (or max_samples are reached). A failed test while averaging
+    # starts over.
+    SETTLING = 0
+    AVERAGING = 1
+    DONE = 2
+
+    def __init__(self, window=100, drift_tol=2e-6, std_max=5e-4,
+                 sem_target=5e-6, min_samples=200, max_samples=3000):
+        self.window = window
+        self.drift_tol = drift_tol
+        self.std_max = std_max
+        self.sem_target = sem_target
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.ring = np.zeros(window)
+
+        # Sums over k = 0 .. window-1 for the fixed window positions
+        k = np.arange(window, dtype=float)
+        self.k_mean = k.mean()
+        self.k_var = ((k - self.k_mean) ** 2).sum()
+        self.reset()
+
+    def reset(self):
+        self.state = PlateauDetector.SETTLING
+        self.n = 0
+        self.sy = 0.0
+        self.syy = 0.0
+        self.sky = 0.0
+        self.stats = RunningStats()
+        self.lag1 = 0.0
+        self.last = None
+
+    def push(self, y):
+        # Returns the state after sample y
+        if self.state == PlateauDetector.DONE:
+            return self.state
+
+        i = self.n % self.window
+        if self.n >= self.window:
+            old = self.ring[i]
+            # All samples move one position back in the window
+            self.sky -= self.sy - old
+            self.sy -= old
+            self.syy -= old * old
+            m = self.window - 1
+        else:
+            m = self.n
+        self.ring[i] = y
+        self.sy += y
+        self.syy += y * y
+        self.sky += m * y
+        self.n += 1
+
+        if self.state == PlateauDetector.AVERAGING:
+            self._average(y)
+
+        if self.n < self.window:
+            return self.state
+
+        stable = self.stable()
+        if self.state == PlateauDetector.SETTLING and stable:
+            self.state = PlateauDetector.AVERAGING
+            start = self.n % self.window
+            for x in np.roll(self.ring, -start):
+                self._average(x)
+        elif self.state == PlateauDetector.AVERAGING and not stable:
+            self.stats.reset()
+            self.lag1 = 0.0
+            self.last = None
+            self.state = PlateauDetector.SETTLING
+
+        if (self.state == PlateauDetector.AVERAGING
+                and self.stats.n >= self.min_samples
+                and (self.sem() < self.sem_target
+                     or self.stats.n >= self.max_samples)):
+            self.state = PlateauDetector.DONE
+        return self.state
+
+    def line(self):
+        # Slope per sample, its standard error and the residual std of the
+        # line fit over the window
+        w = self.window
+        mean = self.sy / w
+        slope = (self.sky - self.k_mean * self.sy) / self.k_var
+        ssr = max(self.syy - w * mean * mean - slope * slope * self.k_var, 0.0)
+        std = math.sqrt(ssr / (w - 2))
+        return slope, std / math.sqrt(self.k_var), std
+
+    def stable(self):
+        slope, sigma_slope, std = self.line()
+        drift = abs(slope) * self.window
+        return (std < self.std_max
+                and (drift < self.drift_tol or abs(slope) < 2 * sigma_slope))
+
+    def sem(self):
+        # Standard error of the plateau mean, inflated by the effective
+        # sample size of an AR(1) process with the measured lag-1 correlation
+        n = self.stats.n
+        if n < 3 or self.stats.m2 == 0:
+            return math.inf
+        r = min(max(self.lag1 / self.stats.m2, 0.0), 0.99)
+        return self.stats.stderr() * math.sqrt((1 + r) / (1 - r))
+
+    def mean(self):
+        return self.stats.mean
+
+    def _average(self, y):
+        # Lag-1 sum about the running mean, approximate but O(1)
+        if self.last != None:
+            self.lag1 += (self.last - self.stats.mean) * (y - self.stats.mean)
+        self.stats.push(y)
+        self.last = y
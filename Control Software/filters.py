@@ -0,0 +1,185 @@
+import bisect
+import collections
+import math
+
+import numpy as np
+
+
+class IIRFilter(object):
+    # Streaming IIR filter y = (b / a) x in transposed direct form II.
+    # push() filters one sample; extend() filters a block with the state
+    # space form of the same recursion,
+    #   s[n+1] = A s[n] + B x[n],  y[n] = C s[n] + D x[n]
+    # as matrix products over chunks of up to 'chunk' samples: the output
+    # is the impulse response (a lower triangular Toeplitz matrix) applied
+    # to the chunk plus the free response of the state it started with.
+    # Both paths carry the same state, so they can be mixed and give the
+    # same result up to rounding. The state starts at the steady state of
+    # the first sample, so a constant input passes without a transient.
+    def __init__(self, b, a, chunk=64):
+        a = np.asarray(a, dtype=float)
+        b = np.asarray(b, dtype=float) / a[0]
+        a = a / a[0]
+        order = max(len(a), len(b)) - 1
+        self.a = np.concatenate((a, np.zeros(order + 1 - len(a))))
+        self.b = np.concatenate((b, np.zeros(order + 1 - len(b))))
+        self.order = order
+        self.chunk = chunk
+
+        A = np.zeros((order, order))
+        A[:, 0] = -self.a[1:]
+        A[:-1, 1:] = np.eye(order - 1)
+        B = self.b[1:] - self.a[1:] * self.b[0]
+        self.A = A
+        self.B = B
+        # State of a constant input of 1
+        self.steady = np.linalg.solve(np.eye(order) - A, B)
+
+        # powers[k] = A**k, k = 0 .. chunk
+        powers = [np.eye(order)]
+        for k in range(chunk):
+            powers.append(A.dot(powers[-1]))
+        self.powers = np.array(powers)
+        # Free response C A**k and impulse response D, C A**(k-1) B
+        self.free = self.powers[:chunk, 0, :]
+        response = np.concatenate(([self.b[0]], self.free[:chunk - 1].dot(B)))
+        index = np.arange(chunk)
+        lag = index[:, None] - index[None, :]
+        self.toeplitz = np.where(lag >= 0, response[np.maximum(lag, 0)], 0.0)
+        # State after the chunk: A**(chunk-1-j) B for input sample j
+        self.reach = self.powers[chunk - 1 - index].dot(B).T
+        self.reset()
+
+    def reset(self):
+        self.state = None
+
+    def push(self, x):
+        if self.state is None:
+            self.state = self.steady * x
+        s = self.state
+        y = self.b[0] * x + s[0]
+        s[:-1] = s[1:] + self.b[1:-1] * x - self.a[1:-1] * y
+        s[-1] = self.b[-1] * x - self.a[-1] * y
+        return y
+
+    def extend(self, xs):
+        xs = np.asarray(xs, dtype=float)
+        out = np.empty_like(xs)
+        if len(xs) and self.state is None:
+            self.state = self.steady * xs[0]
+        for start in range(0, len(xs), self.chunk):
+            x = xs[start:start + self.chunk]
+            n = len(x)
+            out[start:start + n] = (self.toeplitz[:n, :n].dot(x)
+                                    + self.free[:n].dot(self.state))
+            self.state = (self.powers[n].dot(self.state)
+                          + self.reach[:, self.chunk - n:].dot(x))
+        return out
+
+    def response(self, freq, rate):
+        # Complex frequency response at freq [Hz] for the sample rate
+        z = np.exp(-2j * math.pi * np.asarray(freq, dtype=float) / rate)
+        return (np.polyval(self.b[::-1], z) / np.polyval(self.a[::-1], z))
+
+
+class LowPass(IIRFilter):
+    # Butterworth low-pass of the given order, cutoff [Hz] at the -3 dB
+    # point, from the analog prototype by the bilinear transform (with
+    # prewarping); unity gain at DC
+    def __init__(self, cutoff, rate, order=2, chunk=64):
+        if not 0 < cutoff < rate / 2.0:
+            raise ValueError("cutoff must be between 0 and rate / 2")
+        warped = 2 * rate * math.tan(math.pi * cutoff / rate)
+        poles = warped * np.exp(1j * math.pi * (2 * np.arange(1, order + 1)
+                                                + order - 1) / (2 * order))
+        poles = (1 + poles / (2 * rate)) / (1 - poles / (2 * rate))
+        a = np.poly(poles).real
+        b = np.poly(-np.ones(order))
+        IIRFilter.__init__(self, b * a.sum() / b.sum(), a, chunk)
+        self.cutoff = cutoff
+
+
+class Notch(IIRFilter):
+    # Second order notch at freq [Hz] with quality q (bandwidth freq / q),
+    # unity gain away from the notch
+    def __init__(self, freq, rate, q=30.0, chunk=64):
+        if not 0 < freq < rate / 2.0:
+            raise ValueError("notch frequency must be between 0 and rate / 2")
+        w0 = 2 * math.pi * freq / rate
+        alpha = math.sin(w0) / (2 * q)
+        IIRFilter.__init__(self, (1.0, -2 * math.cos(w0), 1.0),
+                           (1 + alpha, -2 * math.cos(w0), 1 - alpha), chunk)
+        self.freq = freq
+
+
+def mainsNotches(rate, mains=50.0, q=10.0, harmonics=None):
+    # Notches at the mains frequency and its harmonics below the Nyquist
+    # frequency (or the first 'harmonics' of them). The default q still
+    # takes out 20 dB when the mains frequency is off by 0.2 Hz, and the
+    # notches settle with the time constant q / (pi * mains), 64 ms.
+    count = int(math.ceil(rate / 2.0 / mains)) - 1
+    if harmonics != None:
+        count = min(count, harmonics)
+    return [Notch(k * mains, rate, q) for k in range(1, count + 1)]
+
+
+class MovingMedian(object):
+    # Median of the last 'window' samples, against spikes; until the window
+    # is full, of all samples so far. push() keeps the window sorted,
+    # extend() takes the medians of all windows in the block at once.
+    def __init__(self, window=5):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.history = collections.deque(maxlen=self.window)
+        self.sorted = []
+
+    def push(self, x):
+        if len(self.history) == self.window:
+            del self.sorted[bisect.bisect_left(self.sorted, self.history[0])]
+        self.history.append(x)
+        bisect.insort(self.sorted, x)
+        n = len(self.sorted)
+        if n % 2:
+            return self.sorted[n // 2]
+        return (self.sorted[n // 2 - 1] + self.sorted[n // 2]) / 2
+
+    def extend(self, xs):
+        xs = np.asarray(xs, dtype=float)
+        # Start up sample by sample, the windows are not full yet
+        first = min(self.window - len(self.history), len(xs))
+        out = np.empty_like(xs)
+        for i in range(first):
+            out[i] = self.push(xs[i])
+        if first == len(xs):
+            return out
+
+        data = np.concatenate((np.array(self.history)[1:], xs[first:]))
+        out[first:] = np.median(
+            np.lib.stride_tricks.sliding_window_view(data, self.window),
+            axis=1)
+        self.history.extend(data[-self.window:])
+        self.sorted = sorted(self.history)
+        return out
+
+
+class FilterChain(object):
+    # Filters applied one after the other to one channel
+    def __init__(self, filters=()):
+        self.filters = list(filters)
+
+    def reset(self):
+        for f in self.filters:
+            f.reset()
+
+    def push(self, x):
+        for f in self.filters:
+            x = f.push(x)
+        return x
+
+    def extend(self, xs):
+        xs = np.asarray(xs, dtype=float)
+        for f in self.filters:
+            xs = f.extend(xs)
+        return xs
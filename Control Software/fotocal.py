@@ -0,0 +1,207 @@
+import numpy as np
+
+from estimators import PlateauDetector
+from positionloop import PositionLoop
+
+
+# One result row per calibration point
+FOTOCAL_FIELDS = ('point', 'setpoint', 'z', 'fotodiode', 'sigma_fotodiode',
+                  'flux', 't')
+
+
+class FotodiodeCalibration(object):
+    # Automatic fotodiode calibration: the PID steps the coil through a
+    # grid of positions and holds it at each until the scanned fotodiode
+    # samples have settled (estimators.PlateauDetector), then averages the
+    # next 'samples' of them.
+    #
+    # The coil position of a point does not come from the fotodiode (that
+    # is what is calibrated) but from the induction voltage of the open main
+    # coil, integrated over the whole run: flux = BL * z. Its zero is the
+    # rest position with the drive off, measured before and after the grid;
+    # the flux between the two is the integrated induction offset. The length
+    # scale therefore is that of BL: this tracks the offset, drift and
+    # linearity of the fotodiode, the absolute scale still rests on the
+    # geometric calibration behind BL.
+    #
+    # A point that does not settle within 'timeout' is measured again, up
+    # to 'retries' times; the calibration fails if fewer than min_points of
+    # the grid settle.
+    #
+    # The coil is held by a positionloop.PositionLoop in velocity mode; its
+    # setpoints are in the current calibration, which only has to be good
+    # enough to hold the coil.
+    def __init__(self, hw, gains, foto_slope, foto_yoffset, BL, scan_inputs,
+                 scan_rate, dt=0.04, samples=500, timeout=5.0, retries=2,
+                 min_points=None, stream=None):
+        self.hw = hw
+        self.foto_slope = foto_slope
+        self.foto_yoffset = foto_yoffset
+        self.BL = BL
+        self.fotodiode = scan_inputs.index('fotodiode')
+        self.induction = scan_inputs.index('induction')
+        self.scan_rate = scan_rate
+        self.dt = dt
+        self.samples = samples
+        self.timeout = timeout
+        self.retries = retries
+        self.min_points = min_points
+        self.stream = stream
+
+        self.loop = PositionLoop(hw, gains, foto_slope, foto_yoffset, dt)
+        # Settled: drift below about 10 um (5 sigma of the fotodiode noise)
+        # and scatter below about 20 um over 0.1 s; averaging stops after
+        # exactly 'samples' samples
+        self.plateau = PlateauDetector(window=100, drift_tol=5e-5,
+                                       std_max=1e-4, sem_target=0.0,
+                                       min_samples=samples,
+                                       max_samples=samples)
+        self.flux = 0.0
+        self.count = 0
+        self.rows = []
+        self.noise = []
+
+    def run(self, positions):
+        # Rest position, every grid setpoint [m] and the rest position
+        # again; returns the points as a structured array (see results).
+        # min_points defaults to all but a quarter of the grid.
+        min_points = self.min_points
+        if min_points == None:
+            min_points = len(positions) - len(positions) // 4
+        self.hw.readScan() # drop the frames before the calibration
+        if self.measure(None) == None:
+            raise RuntimeError("the coil does not come to rest")
+        self.loop.reset()
+        settled = 0
+        for setpoint in positions:
+            for attempt in range(self.retries + 1):
+                if self.measure(setpoint) != None:
+                    settled += 1
+                    break
+            else:
+                print("Calibration point at " + str(setpoint)
+                      + " m dropped after " + str(self.retries) + " retries")
+        self.hw.setOutput(0)
+        if settled < min_points:
+            raise RuntimeError("only " + str(settled) + " of "
+                               + str(len(positions)) + " calibration points "
+                               "settled, " + str(min_points) + " needed")
+        if self.measure(None) == None:
+            raise RuntimeError("the coil does not come to rest")
+
+        points = self.results()
+        if self.stream != None:
+            for row in points:
+                self.stream.append(*row)
+        return points
+
+    def measure(self, setpoint):
+        # Holds the coil at setpoint (None: drive off) until the fotodiode
+        # has settled and 'samples' frames are averaged
+        self.plateau.reset()
+        blocks = []
+        for t in self.loop.run(self.timeout):
+            if setpoint == None:
+                self.loop.drive(0)
+            else:
+                self.loop.step(setpoint)
+
+            block = self._integrate(self.hw.readScan())
+            blocks.append(block)
+            done = self._push(block[:, 0])
+            if done != None:
+                break
+        else:
+            print("Calibration point at " + str(setpoint)
+                  + " m did not settle within " + str(self.timeout) + " s")
+            return None
+
+        # The averaged samples end with the one that completed the plateau
+        frames = np.concatenate(blocks)
+        end = len(frames) - len(block) + done + 1
+        frames = frames[max(end - self.samples, 0):end]
+
+        # z follows from all points in results()
+        row = (len(self.rows), np.nan if setpoint == None else setpoint,
+               0.0, frames[:, 0].mean(), self.plateau.sem(),
+               frames[:, 1].mean(), frames[:, 2].mean())
+        self.rows.append(row)
+        # White noise of the induction voltage, from the differences of
+        # successive samples so the remaining motion does not count
+        self.noise.append(np.diff(frames[:, 3]).var() / 2)
+        return row
+
+    def results(self):
+        # Points with z from the flux [Vs] relative to the first rest point.
+        # The coil is back at rest in the last point, so the flux it shows
+        # there is the induction offset integrated over the run; it is
+        # taken out as a linear drift. The rest positions differ by a few
+        # um (the beam still creeps), which the fotodiode resolves well
+        # enough with the current calibration, and which would otherwise
+        # tilt the later points against the earlier ones.
+        dtype = np.dtype([(name, 'f8') for name in FOTOCAL_FIELDS])
+        points = np.array(self.rows, dtype=dtype)
+        first, last = points[0], points[-1]
+        moved = (last['fotodiode'] - first['fotodiode']) / self.foto_slope
+        drift = ((last['flux'] - first['flux'] - self.BL * moved)
+                 / (last['t'] - first['t']))
+        flux = points['flux'] - first['flux'] - drift * (points['t'] - first['t'])
+        points['z'] = flux / self.BL
+        return points
+
+    def fit(self, degree=1):
+        # Fotodiode voltage as a polynomial in z (highest power first; degree
+        # 1 is the linear calibration slope, offset) with its covariance and
+        # the residuals. The covariance adds the errors of z to the scatter
+        # of the points: the induction noise integrates to a random walk of
+        # the flux, pinned to zero at both rest points, so it is correlated
+        # over the points and does not show in their scatter.
+        points = self.results()
+        z = points['z']
+        design = np.vander(z, degree + 1)
+        coef = np.linalg.lstsq(design, points['fotodiode'], rcond=None)[0]
+        residuals = points['fotodiode'] - design.dot(coef)
+        dof = max(len(z) - degree - 1, 1)
+        cov = (np.linalg.inv(design.T.dot(design))
+               * residuals.dot(residuals) / dof)
+
+        t = points['t'] - points['t'][0]
+        span = t[-1]
+        walk = (np.mean(self.noise) / self.scan_rate / self.BL ** 2
+                * (np.minimum.outer(t, t) - np.outer(t, t) / span))
+        gain = np.polyval(np.polyder(coef), z)
+        jacobian = np.linalg.pinv(design) * gain[None, :]
+        return coef, cov + jacobian.dot(walk).dot(jacobian.T), residuals
+
+    def summary(self, degrees=(1, 2, 3)):
+        points = self.results()
+        lines = ["Fotodiode calibration: " + str(len(points)) + " points  z = "
+                 + '{:.3f}'.format(points['z'].min() * 1e3) + " .. "
+                 + '{:.3f}'.format(points['z'].max() * 1e3) + " mm"]
+        for degree in degrees:
+            if len(points) <= degree + 1:
+                break
+            coef, cov, residuals = self.fit(degree)
+            lines.append("  degree " + str(degree) + ": coefficients "
+                         + " ".join('{:.6g}'.format(c) for c in coef)
+                         + "  residual rms = "
+                         + '{:.3g}'.format(np.sqrt(np.mean(residuals ** 2)))
+                         + " V")
+        return "\n".join(lines)
+
+    def _push(self, values):
+        # Index of the sample that completes the plateau, or None
+        for i, value in enumerate(values):
+            if self.plateau.push(value) == PlateauDetector.DONE:
+                return i
+        return None
+
+    def _integrate(self, block):
+        # Frames as (fotodiode, integrated induction, t, induction)
+        u = block[:, self.induction]
+        flux = self.flux + np.cumsum(u) / self.scan_rate
+        t = (self.count + np.arange(len(u))) / self.scan_rate
+        if len(u):
+            self.flux = flux[-1]
+        self.count += len(u)
+        return np.column_stack((block[:, self.fotodiode], flux, t, u))
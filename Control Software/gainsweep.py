@@ -0,0 +1,186 @@
+import itertools
+import math
+import multiprocessing
+import sys
+
+import numpy as np
+
+from positionloop import PositionLoop
+from simulation import WattBalanceSim
+
+
+# One row per gain set: the gains, the loop period and the three objectives
+GAIN_FIELDS = ('p_gain', 'i_gain', 'd_gain', 'dt', 'settle', 'rms_error',
+               'current_noise')
+
+
+def velocityError(p_gains, i_gains, d_gains, dt, seed=None, period=1.5,
+                  amplitude=0.0012, periods=2, **sim_args):
+    # RMS tracking error [m] of the velocity mode sine for every gain set,
+    # over the last period (the first ones are the start transient). The
+    # loop is that of control.py (positionloop.PositionLoop): fotodiode
+    # read, Kalman tracker, PID step with the tracker velocity as D, drive
+    # voltage.
+    n = len(p_gains)
+    sim = WattBalanceSim(seed=seed, **sim_args)
+    sim.z, sim.v, sim.voltage = np.zeros(n), np.zeros(n), np.zeros(n)
+    loop = PositionLoop(None, (p_gains, i_gains, d_gains), sim.foto_slope,
+                        sim.foto_yoffset, dt)
+
+    omega = 2 * math.pi / period
+    ticks = int(round(periods * period / dt))
+    last = ticks - int(round(period / dt))
+    squares = np.zeros(n)
+    for k in range(ticks):
+        coil_pos = (sim.fotodiode() - sim.foto_yoffset) / sim.foto_slope
+        sim.voltage = loop.control(amplitude * math.sin(omega * k * dt),
+                                   coil_pos)
+        sim.advance((k + 1) * dt)
+        if k >= last:
+            squares += (amplitude * math.sin(omega * (k + 1) * dt) - sim.z) ** 2
+    return np.sqrt(squares / (ticks - last))
+
+
+def forceResponse(p_gains, i_gains, d_gains, dt, seed=None, step=1.0,
+                  duration=5.0, tolerance=1e-5, noise_time=1.0, **sim_args):
+    # Force mode: the PID holds the coil level and the test mass is put on
+    # after 'step' seconds. Returns for every gain set the settling time
+    # [s] after the step (until the coil stays within tolerance of the
+    # level, inf if it does not) and the rms noise [A] of the coil current
+    # over the last noise_time seconds. Like control.py the force mode PID
+    # acts on the raw position.
+    n = len(p_gains)
+    sim = WattBalanceSim(seed=seed, **sim_args)
+    sim.z, sim.v, sim.voltage = np.zeros(n), np.zeros(n), np.zeros(n)
+    sim.relay = True
+    loop = PositionLoop(None, (p_gains, i_gains, d_gains), sim.foto_slope,
+                        sim.foto_yoffset, dt, track=False)
+
+    ticks = int(round(duration / dt))
+    first = int(round(step / dt))
+    quiet = ticks - int(round(noise_time / dt))
+    settled = np.full(n, first * dt)
+    current = []
+    for k in range(ticks):
+        if k == first:
+            sim.sides['test'] = 1
+        coil_pos = (sim.fotodiode() - sim.foto_yoffset) / sim.foto_slope
+        sim.voltage = loop.control(0.0, coil_pos)
+        sim.advance((k + 1) * dt)
+        if k >= first:
+            # Last time outside the tolerance
+            settled = np.where(np.abs(sim.z) > tolerance, (k + 1) * dt,
+                               settled)
+        if k >= quiet:
+            current.append(sim.current())
+
+    settle = settled - first * dt
+    settle[settled >= ticks * dt] = np.inf
+    return settle, np.std(current, axis=0)
+
+
+def evaluateShard(shard):
+    # Objectives of one batch of gain sets with a common dt, as GAIN_FIELDS
+    # rows; top level so that the process pool can pickle it
+    gains, dt, seed, sim_args = shard
+    p_gains, i_gains, d_gains = gains.T
+    rms = velocityError(p_gains, i_gains, d_gains, dt, seed, **sim_args)
+    settle, noise = forceResponse(p_gains, i_gains, d_gains, dt, seed,
+                                  **sim_args)
+    return np.column_stack((gains, np.full(len(gains), dt), settle, rms,
+                            noise))
+
+
+def paretoFront(objectives):
+    # Mask of the rows of (n x k) objectives (all minimized) that no other
+    # row is at least as good as in every objective and better in one
+    objectives = np.asarray(objectives, dtype=float)
+    front = np.ones(len(objectives), dtype=bool)
+    for i, row in enumerate(objectives):
+        if front[i]:
+            dominated = (np.all(objectives >= row, axis=1)
+                         & np.any(objectives > row, axis=1))
+            front[dominated] = False
+    return front
+
+
+class GainSweep(object):
+    # Grid of (P, I, D, dt) PID settings evaluated on the simulated
+    # balance. The gain sets of one dt are simulated together as arrays
+    # (PIDController and WattBalanceSim both take them), in shards of
+    # 'shard' sets that a process pool runs in parallel. Every set gets
+    #   - settle: settling time after the test mass is put on in force mode
+    #   - rms_error: tracking error of the velocity mode sine
+    #   - current_noise: coil current noise in force mode
+    # and the Pareto front over the three is reported. Sets that do not
+    # settle in force mode (e.g. unstable ones) get settle = inf.
+    def __init__(self, p_gains, i_gains, d_gains, dts, shard=128,
+                 processes=None, seed=0, **sim_args):
+        self.gains = np.array(list(itertools.product(p_gains, i_gains,
+                                                     d_gains)), dtype=float)
+        self.dts = tuple(dts)
+        self.shard = shard
+        self.processes = processes
+        self.seed = seed
+        self.sim_args = sim_args
+        self.rows = None
+
+    def shards(self):
+        shards = []
+        for dt in self.dts:
+            for start in range(0, len(self.gains), self.shard):
+                shards.append((self.gains[start:start + self.shard], dt,
+                               self.seed + len(shards), self.sim_args))
+        return shards
+
+    def run(self):
+        # All gain sets as a structured array with GAIN_FIELDS
+        shards = self.shards()
+        if self.processes == 1:
+            blocks = [evaluateShard(shard) for shard in shards]
+        else:
+            with multiprocessing.Pool(self.processes) as pool:
+                blocks = pool.map(evaluateShard, shards)
+        dtype = np.dtype([(name, 'f8') for name in GAIN_FIELDS])
+        self.rows = np.rec.fromarrays(np.concatenate(blocks).T, dtype=dtype)
+        return self.rows
+
+    def front(self, fields=('settle', 'rms_error', 'current_noise')):
+        # Pareto optimal gain sets over the given objectives, by settling
+        # time. control.py has separate velocity and force mode gains, so
+        # ('rms_error',) and ('settle', 'current_noise') give the best sets
+        # for each mode on its own.
+        rows = self.rows
+        front = rows[paretoFront(np.column_stack([rows[name]
+                                                  for name in fields]))]
+        return front[np.lexsort((front.rms_error, front.settle))]
+
+    def summary(self, n=20):
+        front = self.front()
+        lines = ["Gain sweep: " + str(len(self.rows)) + " gain sets, "
+                 + str(np.isfinite(self.rows.settle).sum()) + " settled, "
+                 + str(len(front)) + " on the Pareto front"]
+        lines.append("      P        I       D     dt   settle  rms error"
+                     "  current noise")
+        for row in front[:n]:
+            lines.append("%7.0f  %7.0f  %6.1f  %5.3f  %5.2f s  %6.1f um"
+                         "  %9.3g A" % (row.p_gain, row.i_gain, row.d_gain,
+                                        row.dt, row.settle,
+                                        row.rms_error * 1e6,
+                                        row.current_noise))
+        if len(front) > n:
+            lines.append("  ... " + str(len(front) - n) + " more")
+        return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    # python gainsweep.py [<processes>] [<result.npz>]
+    sweep = GainSweep(p_gains=np.geomspace(300, 3000, 8),
+                      i_gains=np.geomspace(500, 30000, 8),
+                      d_gains=(0, 10, 30, 60, 100, 150),
+                      dts=(0.01, 0.02, 0.04),
+                      processes=int(sys.argv[1]) if len(sys.argv) > 1 else None)
+    sweep.run()
+    print(sweep.summary())
+    if len(sys.argv) > 2:
+        np.savez(sys.argv[2], rows=sweep.rows, front=sweep.front())
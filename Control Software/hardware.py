@@ -1,100 +1,167 @@
-from mcculw import ul
-from mcculw.enums import ULRange, InfoType, BoardInfo, DigitalInfo, DigitalPortType, DigitalIODirection, FunctionType
-from mcculw.ul import ULError
+import numpy as np
 
-import sys
-sys.path.insert(0, 'LucidIO')
+from backend import ScanRing
 
-from LucidControlAO4 import LucidControlAO4
-from Values import ValueVOS4
-import IoReturn
 
 class Hardware(object):
-    def __init__(self):
-        # LucidIO
-        self.ao4 = LucidControlAO4('COM16')
-
-        # Open AO4 port
-        if (self.ao4.open() == False):
-            self.ao4.close()
-            exit()
-
-        ret = self.ao4.identify(0)
-        if ret == IoReturn.IoReturn.IO_RETURN_OK:
-            pass
-        else:
-            print ('Error while initializing LucidIO')
-            self.ao4.close()
-            exit()
-
-        '''
-        # MCC
-        board_num = 0
-        channel = 0
-        ai_range = ULRange.BIP5VOLTS
-
-        try:
-            # Get a value from the device
-            value = ul.a_in(board_num, channel, ai_range)
-            # Convert the raw value to engineering units
-            eng_units_value = ul.to_eng_units(board_num, ai_range, value)
-
-            # Display the raw value
-            print("Raw Value: " + str(value))
-            # Display the engineering value
-            print("Engineering Value: " + '{:.3f}'.format(eng_units_value))
-        except ULError as e:
-            # Display the error
-            print("A UL error occurred. Code: " + str(e.errorcode)
-                  + " Message: " + e.message)
-        '''
-
-    def setOutput(self, voltage):
-        # Create a value object for value type VOS4
-        # 4 bytes signed value
-        value = ValueVOS4()
-        
-        value.setVoltage(voltage)
-
-        # Write value to channel 0
-        ret = self.ao4.setIo(0, value)
-
-        # Check return value for success
-        if (ret != IoReturn.IoReturn.IO_RETURN_OK):
-            print ('Error setting CH0 voltage')
-            self.ao4.close()
-            return False
-
-        return True
+    # Front end used by the control software. All device access goes
+    # through a backend: the lab rig (default), a replay of recorded data
+    # or the watt balance simulation, see backend.py and simulation.py.
+    #
+    # With a RunRecorder (recorder.py) every output write, relay switch,
+    # input read, scan start and scanned frame is streamed to the run
+    # directory.
+    #
+    # Scanned inputs can go through a filter stage (setFilters): the
+    # loops then read the filtered frames from a second ring, while the
+    # recorder keeps the raw frames, so a replay filters them the same way.
+    def __init__(self, backend=None, recorder=None):
+        if backend == None:
+            # Imported here so replay and simulation run without mcculw
+            from labbackend import LabBackend
+            backend = LabBackend()
+        self.backend = backend
+        self.recorder = recorder
+        self.recorded = 0
+        self.filters = {}
+        self.filtered = None
+        self.passed = 0
+
+    def setFilters(self, filters):
+        # filters: {input name: filters.FilterChain} for the scanned inputs,
+        # the others pass unfiltered; takes effect with the next scan
+        self.filters = dict(filters)
+
+    def setOutput(self, voltage, wait=True):
+        # Coil voltage on channel 0
+        return self.setOutputs({0: voltage}, wait)
+
+    def setOutputs(self, voltages, wait=True):
+        # voltages is a dict {channel: voltage} or an array with the
+        # voltages of channels 0, 1, ...
+        if not isinstance(voltages, dict):
+            voltages = dict(enumerate(np.asarray(voltages, dtype=float)))
+        if self.recorder != None:
+            outputs = self.recorder.stream('outputs', ('t', 'channel', 'voltage'))
+            t = self.time()
+            for ch, voltage in voltages.items():
+                outputs.append(t, ch, voltage)
+        return self.backend.setOutputs(voltages, wait)
 
     def readChannel(self, ch):
-        ai_range = ULRange.BIP5VOLTS
-        value = ul.a_in(0, ch, ai_range)
-        dec_value = ul.to_eng_units(0, ai_range, value)
-        return dec_value * 2
+        return self.backend.readChannel(ch)
 
     def readShuntVoltage(self):
-        ai_range = ULRange.BIP1PT67VOLTS
-        value = ul.a_in(0, 1, ai_range)
-        dec_value = ul.to_eng_units(0, ai_range, value)
-        return dec_value * 5.988
+        return self.readInput('shunt')
 
     def readFotodiode(self):
-        ai_range = ULRange.BIPPT05VOLTS
-        value = ul.a_in(0, 3, ai_range)
-        dec_value = ul.to_eng_units(0, ai_range, value)
-        return dec_value * 200
+        return self.readInput('fotodiode')
 
     def readInductionVoltage(self):
-        ai_range = ULRange.BIPPT156VOLTS
-        value = ul.a_in(0, 2, ai_range)
-        dec_value = ul.to_eng_units(0, ai_range, value)
-        return dec_value * 64.103
+        return self.readInput('induction')
+
+    def readInput(self, name):
+        # Latest scanned sample while a scan of this input is running,
+        # otherwise a single software-timed conversion
+        scan = self.backend.scan
+        if scan != None and name in scan.index:
+            scan.poll()
+            self._recordScan()
+            if self.filtered != None:
+                self._filterScan()
+                return self.filtered.latest[scan.index[name]]
+            return scan.latest[scan.index[name]]
+        value = self.backend.readInput(name)
+        if self.recorder != None:
+            self.recorder.stream('input_' + name, ('t', 'value')).append(
+                self.time(), value)
+        return value
+
+    def startScan(self, rate, names=('shunt', 'induction', 'fotodiode'),
+                  seconds=10):
+        # Start a hardware-timed scan of the named inputs at rate frames/s
+        scan = self.backend.startScan(rate, names, seconds)
+        if self.recorder != None:
+            self.recorder.stream('scan_start', ('t', 'rate')).append(
+                self.time(), rate)
+        self.recorded = 0
+        self.filtered = None
+        self.passed = 0
+        if any(name in self.filters for name in names):
+            self.filtered = ScanRing(names, rate, seconds)
+            for chain in self.filters.values():
+                chain.reset()
+        return scan
+
+    def readScan(self):
+        # Calibrated frames (n x inputs) acquired since the last call
+        scan = self.backend.scan
+        scan.poll()
+        self._recordScan()
+        frames = scan.take()
+        if self.filtered != None:
+            self._filterScan()
+            return self.filtered.take()
+        return frames
+
+    def stopScan(self):
+        scan = self.backend.scan
+        if scan != None:
+            scan.poll()
+            self._recordScan()
+        self.backend.stopScan()
 
     def switchRelay(self, state):
-        ul.d_config_port(0, 1, DigitalIODirection.OUT)
-        if state == False:
-            ul.d_out(0, 1, 0)
-        else:
-            ul.d_out(0, 1, 0x01)
-
+        if self.recorder != None:
+            self.recorder.stream('relay', ('t', 'state')).append(
+                self.time(), state)
+        self.backend.switchRelay(state)
+
+    def time(self):
+        return self.backend.time()
+
+    def finished(self):
+        return self.backend.finished()
+
+    def waitUntil(self, t):
+        self.backend.waitUntil(t)
+
+    def prompt(self, message):
+        return self.backend.prompt(message)
+
+    def changeMasses(self, message, masses):
+        self.backend.changeMasses(message, masses)
+
+    def close(self):
+        self.stopScan()
+        self.backend.close()
+        if self.recorder != None:
+            self.recorder.close()
+
+    def _recordScan(self):
+        # Frames pushed since the last call, numbered from the scan start
+        # (frame / rate is the acquisition time); frames that fell out of
+        # the ring in between are lost
+        scan = self.backend.scan
+        if self.recorder == None or scan.pushed == self.recorded:
+            return
+        n = min(scan.pushed - self.recorded, scan.filled)
+        frames = np.empty((n, scan.nch + 1))
+        frames[:, 0] = np.arange(scan.pushed - n, scan.pushed)
+        frames[:, 1:] = scan.last(n)
+        self.recorder.stream('scan', ('frame',) + scan.names).extend(frames)
+        self.recorded = scan.pushed
+
+    def _filterScan(self):
+        # Frames pushed since the last call through the filters, into the
+        # filtered ring
+        scan = self.backend.scan
+        if scan.pushed == self.passed:
+            return
+        frames = scan.last(min(scan.pushed - self.passed, scan.filled))
+        for name, chain in self.filters.items():
+            if name in scan.index:
+                frames[:, scan.index[name]] = chain.extend(
+                    frames[:, scan.index[name]])
+        self.filtered._push(frames)
+        self.passed = scan.pushed
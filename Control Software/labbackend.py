@@ -0,0 +1,351 @@
+from mcculw import ul
+from mcculw.enums import ULRange, InfoType, BoardInfo, DigitalInfo, DigitalPortType, DigitalIODirection, FunctionType, ScanOptions
+from mcculw.ul import ULError
+
+import ctypes
+import time
+
+import sys
+sys.path.insert(0, 'LucidIO')
+
+from LucidControlAI4 import LucidControlAI4, LCAI4DeviceType, LCAI4Mode
+from LucidControlAO4 import LucidControlAO4
+from Values import ValueVOS4
+from Com import ComProfile
+import IoReturn
+
+import numpy as np
+
+from backend import Backend, ScanRing
+
+
+# Analog inputs of the MCC board: name -> (channel, input range, scale of
+# the readings in that range, 10 V over the range)
+AI_CHANNELS = {
+    'shunt':     (1, ULRange.BIP1PT67VOLTS, 5.988),
+    'induction': (2, ULRange.BIPPT156VOLTS, 64.103),
+    'fotodiode': (3, ULRange.BIPPT05VOLTS, 200),
+}
+
+# Inputs on the LucidControl AI4 module: name -> (channel, full scale of the
+# signal in V, that of its MCC range). The module reads ValueVOS4 in V
+# whatever its range, so unlike the MCC readings they need no scale; the
+# range, given by the device type, only has to cover the signal.
+AI4_CHANNELS = {
+    'shunt':     (0, 1.67),
+    'induction': (1, 0.156),
+    'fotodiode': (2, 0.05),
+}
+
+# Input range (low, high) in V of the voltage input AI4 variants
+AI4_RANGES = {
+    LCAI4DeviceType.AI_0_5[0]:   (0.0, 5.0),
+    LCAI4DeviceType.AI_0_10[0]:  (0.0, 10.0),
+    LCAI4DeviceType.AI_0_12[0]:  (0.0, 12.0),
+    LCAI4DeviceType.AI_0_15[0]:  (0.0, 15.0),
+    LCAI4DeviceType.AI_0_20[0]:  (0.0, 20.0),
+    LCAI4DeviceType.AI_0_24[0]:  (0.0, 24.0),
+    LCAI4DeviceType.AI_5_5[0]:   (-5.0, 5.0),
+    LCAI4DeviceType.AI_10_10[0]: (-10.0, 10.0),
+    LCAI4DeviceType.AI_12_12[0]: (-12.0, 12.0),
+    LCAI4DeviceType.AI_15_15[0]: (-15.0, 15.0),
+    LCAI4DeviceType.AI_20_20[0]: (-20.0, 20.0),
+    LCAI4DeviceType.AI_24_24[0]: (-24.0, 24.0),
+}
+
+
+class AnalogScan(ScanRing):
+    # Hardware-timed, continuous background scan of several analog inputs.
+    # The driver fills a circular buffer with scaled samples; poll() copies
+    # the frames acquired since the last call out of it, applies the input
+    # gains and appends them to the host ring.
+    def __init__(self, board_num, names, rate, seconds=10):
+        ScanRing.__init__(self, names, rate, seconds)
+        self.board_num = board_num
+        self.chans = [AI_CHANNELS[name][0] for name in self.names]
+        self.ranges = [AI_CHANNELS[name][1] for name in self.names]
+        self.gains = np.array([AI_CHANNELS[name][2] for name in self.names])
+
+        # Driver buffer holds one second of frames
+        self.frames = max(int(rate), 1)
+        self.total = self.frames * self.nch
+
+        self.count = 0
+        self.memhandle = None
+
+    def start(self):
+        # Per-channel ranges through the gain queue
+        ul.a_load_queue(self.board_num, self.chans, self.ranges, self.nch)
+
+        self.memhandle = ul.scaled_win_buf_alloc(self.total)
+        data = ctypes.cast(self.memhandle, ctypes.POINTER(ctypes.c_double))
+        self.buffer = np.ctypeslib.as_array(data, shape=(self.total,))
+
+        options = (ScanOptions.BACKGROUND | ScanOptions.CONTINUOUS
+                   | ScanOptions.SCALEDATA)
+        self.rate = ul.a_in_scan(self.board_num, min(self.chans),
+                                 max(self.chans), self.total, self.rate,
+                                 self.ranges[0], self.memhandle, options)
+        self.count = 0
+
+    def stop(self):
+        if self.memhandle == None:
+            return
+        ul.stop_background(self.board_num, FunctionType.AIFUNCTION)
+        ul.win_buf_free(self.memhandle)
+        self.memhandle = None
+
+    def poll(self):
+        # Returns the new frames (n x channels) since the last call
+        status, count, index = ul.get_status(self.board_num,
+                                             FunctionType.AIFUNCTION)
+        count -= count % self.nch
+        n = count - self.count
+
+        if n <= 0:
+            return self.empty
+
+        if n > self.total:
+            # Driver buffer was overwritten before it was read
+            self.overruns += 1
+            self.count = count - self.total
+            n = self.total
+
+        start = self.count % self.total
+        end = start + n
+        if end <= self.total:
+            samples = self.buffer[start:end].copy()
+        else:
+            samples = np.concatenate((self.buffer[start:],
+                                      self.buffer[:end - self.total]))
+        self.count = count
+
+        block = samples.reshape(-1, self.nch) * self.gains
+        self._push(block)
+        return block
+
+
+class AI4Inputs(object):
+    # Software-timed inputs on a LucidControl AI4 module that averages on
+    # the device: it samples every channel each scan_interval ms and
+    # returns the mean of the last nr_samples samples. One GetIoGroup frame
+    # reads all channels; reads within one scan interval get the values of
+    # that frame, the module has no newer mean yet. A loop tick reading
+    # several inputs so costs one USB round trip, and each value is the
+    # mean over nr_samples * scan_interval ms instead of a single sample.
+    def __init__(self, port, names=('shunt',), nr_samples=10, scan_interval=1):
+        self.names = tuple(names)
+        self.nr_samples = nr_samples
+        self.scan_interval = scan_interval
+        self.channels = tuple(any(AI4_CHANNELS[name][0] == ch
+                                  for name in self.names) for ch in range(4))
+        self.values = tuple(ValueVOS4() for ch in range(4))
+        self.latest = None
+        self.readTime = None
+
+        self.ai4 = LucidControlAI4(port)
+        profile = ComProfile(baudrate=115200, readTimeout=0.1,
+                             writeTimeout=0.1, lowLatency=True,
+                             exclusive=True)
+        if (self.ai4.open(profile) == False):
+            self.ai4.close()
+            raise RuntimeError("can not open the AI4 on " + port)
+
+        # Input range from the device type, it has to take the signals
+        if self.ai4.identify(0) != IoReturn.IoReturn.IO_RETURN_OK:
+            self.ai4.close()
+            raise RuntimeError("can not identify the AI4 on " + port)
+        self.range = AI4_RANGES.get(self.ai4.id.deviceType)
+        if self.range == None:
+            self.ai4.close()
+            raise RuntimeError("AI4 device type " + hex(self.ai4.id.deviceType)
+                               + " is no voltage input module")
+        for name in self.names:
+            full_scale = AI4_CHANNELS[name][1]
+            if self.range[0] > -full_scale or self.range[1] < full_scale:
+                self.ai4.close()
+                raise RuntimeError("AI4 range " + str(self.range[0]) + " .. "
+                                   + str(self.range[1]) + " V does not cover +-"
+                                   + str(full_scale) + " V of " + name)
+
+        for name in self.names:
+            ch = AI4_CHANNELS[name][0]
+            for ret in (self.ai4.setParamMode(ch, False, LCAI4Mode.STANDARD),
+                        self.ai4.setParamScanInterval(ch, False, scan_interval),
+                        self.ai4.setParamNrSamples(ch, False, nr_samples)):
+                if ret != IoReturn.IoReturn.IO_RETURN_OK:
+                    self.ai4.close()
+                    raise RuntimeError("can not configure AI4 channel " + str(ch)
+                                  + " (" + name + ")")
+
+    def read(self, name):
+        now = time.perf_counter()
+        if (self.readTime == None
+                or now - self.readTime >= self.scan_interval / 1000.0):
+            self.readGroup()
+            self.readTime = now
+        return self.latest[name]
+
+    def readGroup(self):
+        # All inputs with one GetIoGroup, in volts
+        ret = self.ai4.getIoGroup(self.channels, self.values)
+        if ret != IoReturn.IoReturn.IO_RETURN_OK:
+            raise RuntimeError("AI4 read failed with code " + str(ret))
+        self.latest = dict((name, self.values[AI4_CHANNELS[name][0]].getVoltage())
+                           for name in self.names)
+        return self.latest
+
+    def close(self):
+        self.ai4.close()
+
+
+class LabBackend(Backend):
+    # Lab rig: MCC USB DAQ board for the analog inputs and the relay,
+    # LucidControl AO4 module for the coil voltage. Inputs of an AI4Inputs
+    # (ai4) are read from the AI4 module instead of the MCC board.
+    def __init__(self, ai4=None):
+        self.ai4 = ai4
+
+        # LucidIO
+        self.ao4 = LucidControlAO4('COM16')
+
+        # Open AO4 port. A lost reply must not stall the control loop, so
+        # the timeouts are short and the round trip is measured once.
+        profile = ComProfile(baudrate=115200, readTimeout=0.1,
+                             writeTimeout=0.1, lowLatency=True,
+                             exclusive=True, probeCount=20)
+        if (self.ao4.open(profile) == False):
+            self.ao4.close()
+            exit()
+
+        if self.ao4.roundTrip != None:
+            print("AO4 round trip: mean " + str(self.ao4.roundTrip[0] * 1000)
+                  + " ms  max " + str(self.ao4.roundTrip[1] * 1000) + " ms")
+
+        ret = self.ao4.identify(0)
+        if ret == IoReturn.IoReturn.IO_RETURN_OK:
+            pass
+        else:
+            print ('Error while initializing LucidIO')
+            self.ao4.close()
+            exit()
+
+        # Queue for AO4 writes which do not wait for the module's reply
+        self.ao4Queue = self.ao4.pipeline()
+
+        # Value objects for value type VOS4 (4 bytes signed value), one per
+        # AO4 channel and reused for every write
+        self.outValues = tuple(ValueVOS4() for ch in range(4))
+
+        # Last value written to each channel in uV, None if unknown
+        self.lastOutputs = [None] * 4
+
+        Backend.__init__(self)
+
+        '''
+        # MCC
+        board_num = 0
+        channel = 0
+        ai_range = ULRange.BIP5VOLTS
+
+        try:
+            # Get a value from the device
+            value = ul.a_in(board_num, channel, ai_range)
+            # Convert the raw value to engineering units
+            eng_units_value = ul.to_eng_units(board_num, ai_range, value)
+
+            # Display the raw value
+            print("Raw Value: " + str(value))
+            # Display the engineering value
+            print("Engineering Value: " + '{:.3f}'.format(eng_units_value))
+        except ULError as e:
+            # Display the error
+            print("A UL error occurred. Code: " + str(e.errorcode)
+                  + " Message: " + e.message)
+        '''
+
+    def setOutputs(self, voltages, wait=True):
+        # Write several AO4 channels with one SetIoGroup frame. Channels
+        # whose value did not change since the last write are left out;
+        # nothing is sent if none changed.
+        channels = [False] * 4
+        changed = False
+        for ch, voltage in voltages.items():
+            value = self.outValues[ch]
+            value.setVoltage(float(voltage))
+            if int(value.getValue()) != self.lastOutputs[ch]:
+                channels[ch] = True
+                changed = True
+
+        if not changed:
+            return True
+
+        channels = tuple(channels)
+
+        if not wait:
+            # Queue the write, the reply is checked once it has arrived
+            self.ao4Queue.setIoGroup(channels, self.outValues,
+                                     self._checkOutput)
+            self.ao4Queue.poll()
+            self._storeOutputs(channels)
+            return True
+
+        # Replies of queued writes have to be collected first
+        self.ao4Queue.flush()
+
+        ret = self.ao4.setIoGroup(channels, self.outValues)
+
+        # Check return value for success
+        if (ret != IoReturn.IoReturn.IO_RETURN_OK):
+            print ('Error setting AO4 voltages')
+            self.lastOutputs = [None] * 4
+            self.ao4.close()
+            return False
+
+        self._storeOutputs(channels)
+        return True
+
+    def _storeOutputs(self, channels):
+        for ch in range(4):
+            if channels[ch]:
+                self.lastOutputs[ch] = int(self.outValues[ch].getValue())
+
+    def _checkOutput(self, ret):
+        if (ret != IoReturn.IoReturn.IO_RETURN_OK):
+            print ('Error setting AO4 voltages')
+            # Output state unknown, send every channel again next time
+            self.lastOutputs = [None] * 4
+
+    def readChannel(self, ch):
+        ai_range = ULRange.BIP5VOLTS
+        value = ul.a_in(0, ch, ai_range)
+        dec_value = ul.to_eng_units(0, ai_range, value)
+        return dec_value * 2
+
+    def readInput(self, name):
+        if self.ai4 != None and name in self.ai4.names:
+            return self.ai4.read(name)
+        ch, ai_range, gain = AI_CHANNELS[name]
+        value = ul.a_in(0, ch, ai_range)
+        dec_value = ul.to_eng_units(0, ai_range, value)
+        return dec_value * gain
+
+    def startScan(self, rate, names, seconds):
+        self.stopScan()
+        self.scan = AnalogScan(0, names, rate, seconds)
+        self.scan.start()
+        return self.scan
+
+    def switchRelay(self, state):
+        ul.d_config_port(0, 1, DigitalIODirection.OUT)
+        if state == False:
+            ul.d_out(0, 1, 0)
+        else:
+            ul.d_out(0, 1, 0x01)
+
+    def close(self):
+        self.stopScan()
+        self.ao4Queue.flush()
+        self.ao4.close()
+        if self.ai4 != None:
+            self.ai4.close()
@@ -0,0 +1,77 @@
+import numpy as np
+
+
+class PIDController(object):
+    # PID controller with symmetric output limit, conditional-integration
+    # anti-windup, derivative on the measurement through a first-order
+    # low-pass (time constant d_filter in s, 0 = unfiltered) and bumpless
+    # gain changes.
+    #
+    # Gains may be NumPy arrays: step() then evaluates one controller per
+    # element with setpoints / measurements of the same shape, e.g. to
+    # sweep gains on the simulated balance.
+    def __init__(self, p_gain, i_gain, d_gain, dt, limit=12.0, d_filter=0.0):
+        self.p_gain = p_gain
+        self.i_gain = i_gain
+        self.d_gain = d_gain
+        self.dt = dt
+        self.limit = limit
+        self.d_filter = d_filter
+        self.reset()
+
+    def reset(self):
+        shape = np.broadcast(self.p_gain, self.i_gain, self.d_gain).shape
+        self.i_term = np.zeros(shape)
+        self.d_state = np.zeros(shape)
+        self.error = np.zeros(shape)
+        self.output = np.zeros(shape)
+        self.last_measurement = None
+
+    def setGains(self, p_gain, i_gain, d_gain):
+        # The integral term absorbs the change of the P and D contributions,
+        # so the output does not jump. It holds the sum of i_gain * e * dt,
+        # which makes i_gain changes bumpless by itself.
+        self.i_term = (self.i_term + (self.p_gain - p_gain) * self.error
+                       + (self.d_gain - d_gain) * self.d_state)
+        self.p_gain = p_gain
+        self.i_gain = i_gain
+        self.d_gain = d_gain
+
+    def step(self, setpoint, measurement, rate=None):
+        # rate: derivative of the measurement from an estimator (e.g.
+        # estimators.KalmanTracker), used for the D term instead of the
+        # low-passed difference of successive measurements
+        error = setpoint - measurement
+
+        # Derivative of -measurement: no kick on setpoint changes
+        if rate is not None:
+            self.d_state = -rate + 0.0 * error
+        else:
+            if self.last_measurement is None:
+                d_raw = 0.0 * error
+            else:
+                d_raw = (self.last_measurement - measurement) / self.dt
+            alpha = self.dt / (self.d_filter + self.dt)
+            self.d_state = self.d_state + alpha * (d_raw - self.d_state)
+
+        p_correction = self.p_gain * error
+        d_correction = self.d_gain * self.d_state
+
+        # Integrate only while the output is not driven further into the
+        # limit by this error
+        i_next = self.i_term + self.i_gain * error * self.dt
+        unlimited = p_correction + i_next + d_correction
+        windup = (((unlimited > self.limit) & (error > 0))
+                  | ((unlimited < -self.limit) & (error < 0)))
+        self.i_term = np.where(windup, self.i_term, i_next)
+
+        output = np.clip(p_correction + self.i_term + d_correction,
+                         -self.limit, self.limit)
+
+        self.error = error
+        self.last_measurement = measurement
+        self.output = output
+
+        if np.ndim(output) == 0:
+            return float(output)
+        return output
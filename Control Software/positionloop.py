@@ -0,0 +1,86 @@
+from estimators import KalmanTracker
+from pid import PIDController
+from scheduler import LoopScheduler
+
+
+# Coil position tracker of the velocity mode loops (estimators.KalmanTracker):
+# fotodiode noise of one sample and the acceleration noise of the model.
+# Much smaller accelerations make the loop lag and oscillate.
+FOTO_SIGMA = 4e-6 # m
+TRACKER_ACCEL = 1e-3 # m/s^2/sqrt(Hz)
+
+
+class PositionLoop(object):
+    # Coil position control loop of the velocity and force modes, the
+    # sweep, the fotodiode calibration and the relay tuner: every tick reads
+    # the fotodiode, converts it to the coil position with the fotodiode
+    # calibration and drives the coil with the PID, on the deadlines of a
+    # LoopScheduler. With track the PID acts on the position and velocity
+    # of a KalmanTracker (its D term on the tracker velocity), otherwise on
+    # the raw position with the low-passed difference as D.
+    #
+    #   loop = PositionLoop(hw, gains, foto_slope, foto_yoffset, dt)
+    #   for t in loop.run(duration):
+    #       coil_pos = loop.step(setpoint)
+    #   print(loop.summary())
+    #
+    # Procedures in velocity mode expect hw with the relay off and a running
+    # scan of the fotodiode and induction inputs. Without gains there is no
+    # PID (the relay tuner drives the coil itself), without hw control()
+    # still gives the output for a position measured elsewhere, e.g. on the
+    # simulated balance; gains may then be arrays, see PIDController.
+    def __init__(self, hw, gains, foto_slope, foto_yoffset, dt, track=True,
+                 sigma=FOTO_SIGMA, accel=TRACKER_ACCEL):
+        self.hw = hw
+        self.foto_slope = foto_slope
+        self.foto_yoffset = foto_yoffset
+        self.dt = dt
+        self.pid = None
+        if gains != None:
+            p_gain, i_gain, d_gain = gains
+            self.pid = PIDController(p_gain, i_gain, d_gain, dt, limit=12.0,
+                                     d_filter=2 * dt)
+        self.tracker = KalmanTracker(dt, sigma, accel) if track else None
+        self.scheduler = None
+        self.reset()
+
+    def reset(self):
+        if self.pid != None:
+            self.pid.reset()
+        if self.tracker != None:
+            self.tracker.reset()
+        self.raw = None
+        self.velocity = None
+
+    def position(self):
+        # Coil position [m] from a fotodiode read, its voltage is kept in raw
+        self.raw = self.hw.readFotodiode()
+        return (self.raw - self.foto_yoffset) / self.foto_slope
+
+    def filter(self, coil_pos):
+        # (position, velocity) the loop acts on, velocity None without track
+        if self.tracker == None:
+            return coil_pos, None
+        return self.tracker.push(coil_pos)
+
+    def control(self, setpoint, coil_pos):
+        # PID output for the measured coil position
+        position, self.velocity = self.filter(coil_pos)
+        return self.pid.step(setpoint, position, self.velocity)
+
+    def drive(self, voltage):
+        self.hw.setOutput(voltage, wait=False)
+
+    def step(self, setpoint):
+        # One tick, returns the measured coil position
+        coil_pos = self.position()
+        self.drive(self.control(setpoint, coil_pos))
+        return coil_pos
+
+    def run(self, duration=None):
+        # Scheduled tick times, see LoopScheduler.run
+        self.scheduler = LoopScheduler(self.dt, self.hw.time, self.hw.waitUntil)
+        return self.scheduler.run(duration)
+
+    def summary(self):
+        return self.scheduler.summary()
@@ -0,0 +1,152 @@
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+def _writeHeader(f, count):
+    # The .npy header has a fixed length for any count, so it can be
+    # rewritten in place while the column grows
+    f.seek(0)
+    np.lib.format.write_array_header_1_0(
+        f, {'descr': '<f8', 'fortran_order': False, 'shape': (count,)})
+    f.seek(0, os.SEEK_END)
+
+
+class Stream(object):
+    # Table of float columns filled record by record. Records go into a
+    # preallocated chunk; full chunks are handed to the writer thread and
+    # replaced by a spare one, so append() never touches the disk.
+    def __init__(self, recorder, name, fields, chunk):
+        self.recorder = recorder
+        self.name = name
+        self.fields = tuple(fields)
+        self.dtype = np.dtype([(field, 'f8') for field in self.fields])
+        self.chunk = chunk
+        self.spare = queue.Queue()
+        self.buffer = np.zeros(chunk, dtype=self.dtype)
+        self.n = 0
+        self.count = 0
+
+        self.files = []
+        for field in self.fields:
+            f = open(os.path.join(recorder.path,
+                                  name + '.' + field + '.npy'), 'wb')
+            _writeHeader(f, 0)
+            self.files.append(f)
+
+    def append(self, *values):
+        # One value per field, in field order
+        self.buffer[self.n] = values
+        self.n += 1
+        if self.n == self.chunk:
+            self.flush()
+
+    def extend(self, records):
+        # Rows of an (n x fields) array, e.g. a block of scan frames
+        records = np.asarray(records, dtype=float).reshape(-1, len(self.fields))
+        i = 0
+        while i < len(records):
+            n = min(len(records) - i, self.chunk - self.n)
+            block = self.buffer[self.n:self.n + n]
+            for j, field in enumerate(self.fields):
+                block[field] = records[i:i + n, j]
+            self.n += n
+            i += n
+            if self.n == self.chunk:
+                self.flush()
+
+    def flush(self):
+        if self.n == 0:
+            return
+        self.recorder.queue.put((self, self.buffer, self.n))
+        self.count += self.n
+        try:
+            self.buffer = self.spare.get_nowait()
+        except queue.Empty:
+            self.buffer = np.zeros(self.chunk, dtype=self.dtype)
+        self.n = 0
+
+    def _write(self, buffer, n, count):
+        # Writer thread: one column file per field
+        for field, f in zip(self.fields, self.files):
+            np.ascontiguousarray(buffer[field][:n]).tofile(f)
+            _writeHeader(f, count)
+        self.spare.put(buffer)
+
+    def _close(self):
+        for f in self.files:
+            f.close()
+
+
+class RunRecorder(object):
+    # Records a run into a session directory with one .npy column file per
+    # stream field and an index.json listing the streams. A background
+    # thread does all file I/O; open the session lazily with openRun().
+    def __init__(self, path=None, chunk=4096):
+        if path == None:
+            path = os.path.join('runs', time.strftime('%Y-%m-%d_%H-%M-%S'))
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.chunk = chunk
+        self.streams = {}
+        self.queue = queue.Queue()
+        self.written = {}
+
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stream(self, name, fields):
+        # Returns the stream 'name', created on first use
+        if name not in self.streams:
+            self.streams[name] = Stream(self, name, fields, self.chunk)
+            self._writeIndex()
+        return self.streams[name]
+
+    def flush(self):
+        # Hand all partly filled chunks to the writer
+        for stream in self.streams.values():
+            stream.flush()
+
+    def close(self):
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+        for stream in self.streams.values():
+            stream._close()
+        self._writeIndex()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item == None:
+                return
+            stream, buffer, n = item
+            count = self.written.get(stream.name, 0) + n
+            stream._write(buffer, n, count)
+            self.written[stream.name] = count
+
+    def _writeIndex(self):
+        index = dict((name, list(stream.fields))
+                     for name, stream in self.streams.items())
+        with open(os.path.join(self.path, 'index.json'), 'w') as f:
+            json.dump(index, f, indent=1)
+
+
+def openRun(path):
+    # {stream: {field: array}} of a recorded session. Columns are memory
+    # mapped, nothing is read until it is accessed.
+    with open(os.path.join(path, 'index.json')) as f:
+        index = json.load(f)
+
+    run = {}
+    for name, fields in index.items():
+        run[name] = dict(
+            (field, np.load(os.path.join(path, name + '.' + field + '.npy'),
+                            mmap_mode='r'))
+            for field in fields)
+    return run
@@ -0,0 +1,124 @@
+import math
+import time
+
+
+class Sleeper(object):
+    # Hybrid wait on a monotonic clock: sleep until shortly before the
+    # deadline, then spin. The spin margin grows to the largest oversleep
+    # seen, ~1 ms on Linux and up to the 15.6 ms timer tick on Windows.
+    def __init__(self, clock=time.perf_counter, spin=0.002, max_spin=0.02):
+        self.clock = clock
+        self.spin = spin
+        self.max_spin = max_spin
+
+    def waitUntil(self, deadline):
+        target = deadline - self.spin
+        remaining = target - self.clock()
+        if remaining > 0:
+            time.sleep(remaining)
+            oversleep = self.clock() - target
+            if oversleep > self.spin:
+                self.spin = min(1.5 * oversleep, self.max_spin)
+
+        while self.clock() < deadline:
+            pass
+
+
+class LoopScheduler(object):
+    # Runs a control loop on the absolute deadlines t_start + k * dt, so
+    # timing errors do not accumulate. A tick still running at its
+    # successor's deadline is an overrun; whole periods missed that way are
+    # skipped instead of running late ticks back to back.
+    #
+    #   loop = LoopScheduler(dt, hw.time, hw.waitUntil)
+    #   for t in loop.run(duration):
+    #       ...
+    #   print(loop.summary())
+    def __init__(self, dt, clock=time.perf_counter, wait=None):
+        self.dt = dt
+        self.clock = clock
+        if wait == None:
+            wait = Sleeper(clock).waitUntil
+        self.wait = wait
+        self.reset()
+
+    def reset(self):
+        self.t_start = None
+        self.ticks = 0
+        self.overruns = 0
+        self.missed = 0
+
+        # Running statistics of the tick start lateness and the achieved
+        # period (Welford)
+        self.late_mean = 0.0
+        self.late_m2 = 0.0
+        self.late_max = 0.0
+        self.period_mean = 0.0
+        self.period_m2 = 0.0
+        self.periods = 0
+        self.last_start = None
+
+    def run(self, duration=None):
+        # Yields the scheduled time of every tick relative to the start.
+        # Without duration the loop runs until the caller breaks out.
+        self.reset()
+        self.t_start = self.clock()
+        k = 0
+
+        while duration == None or k * self.dt < duration:
+            start = self.clock()
+            self._record(start, start - (self.t_start + k * self.dt))
+
+            yield k * self.dt
+
+            k += 1
+            deadline = self.t_start + k * self.dt
+            now = self.clock()
+            if now > deadline:
+                self.overruns += 1
+                skip = int((now - deadline) / self.dt)
+                k += skip
+                self.missed += skip
+                deadline = self.t_start + k * self.dt
+            self.wait(deadline)
+
+    def elapsed(self):
+        return self.clock() - self.t_start
+
+    def _record(self, start, late):
+        self.ticks += 1
+        d = late - self.late_mean
+        self.late_mean += d / self.ticks
+        self.late_m2 += d * (late - self.late_mean)
+        self.late_max = max(self.late_max, late)
+
+        if self.last_start != None:
+            period = start - self.last_start
+            self.periods += 1
+            d = period - self.period_mean
+            self.period_mean += d / self.periods
+            self.period_m2 += d * (period - self.period_mean)
+        self.last_start = start
+
+    def stats(self):
+        late_std = math.sqrt(self.late_m2 / self.ticks) if self.ticks else 0.0
+        period_std = (math.sqrt(self.period_m2 / self.periods)
+                      if self.periods else 0.0)
+        return {
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'missed': self.missed,
+            'period': self.period_mean,
+            'period_std': period_std,
+            'late_mean': self.late_mean,
+            'late_std': late_std,
+            'late_max': self.late_max,
+        }
+
+    def summary(self):
+        s = self.stats()
+        return ("Loop timing: " + str(s['ticks']) + " ticks  period = "
+                + '{:.3f}'.format(s['period'] * 1000) + " ms  jitter = "
+                + '{:.3f}'.format(s['period_std'] * 1000) + " ms  max late = "
+                + '{:.3f}'.format(s['late_max'] * 1000) + " ms  overruns = "
+                + str(s['overruns']) + "  missed = " + str(s['missed']))
@@ -0,0 +1,186 @@
+import numpy as np
+
+from backend import Backend, ScanRing
+
+
+class WattBalanceSim(object):
+    # Coil end of the balance beam as a damped mass-spring system. The
+    # relay selects which coil the AO4 voltage drives: the drive coil in
+    # velocity mode (relay off, the main coil is open and its induced
+    # voltage BL * v is measured) or the main coil in force mode (relay on).
+    # Masses act on the beam with g * m * side, side -1 (left) or 1 (right).
+    # The main coil BL varies with the coil position z as
+    # BL * (1 + BL_gradient * z + BL_curvature * z**2).
+    #
+    # Mains pickup adds mains * (sin(w t) + 0.3 sin(3 w t)) volts at the mains
+    # frequency (w = 2 pi mains_freq) to the fotodiode and induction inputs.
+    #
+    # z, v and voltage may be NumPy arrays: the sim then runs one balance
+    # per element on the common clock, e.g. for a batch of PID gain sets
+    # (gainsweep.py).
+    def __init__(self, BL=2.0, BL_drive=1.5, mass=0.08, stiffness=4.0,
+                 damping=0.5, resistance=208.0, shunt=198.0,
+                 foto_slope=4.9042, foto_yoffset=-0.0209, stop=0.005,
+                 foto_noise=2e-5, induction_noise=5e-5, shunt_noise=5e-5,
+                 masses=None, g=9.8326, step=1e-4, seed=None,
+                 BL_gradient=0.0, BL_curvature=0.0, mains=0.0,
+                 mains_freq=50.0):
+        self.BL = BL
+        self.BL_gradient = BL_gradient
+        self.BL_curvature = BL_curvature
+        self.BL_drive = BL_drive
+        self.mass = mass
+        self.stiffness = stiffness
+        self.damping = damping
+        self.resistance = resistance
+        self.shunt = shunt
+        self.foto_slope = foto_slope
+        self.foto_yoffset = foto_yoffset
+        self.stop = stop
+        self.foto_noise = foto_noise
+        self.induction_noise = induction_noise
+        self.shunt_noise = shunt_noise
+        self.mains = mains
+        self.mains_freq = mains_freq
+        self.masses = masses if masses != None else {'tare': 0.008,
+                                                     'test': 0.005}
+        self.g = g
+        self.step = step
+        self.rng = np.random.default_rng(seed)
+
+        self.t = 0.0
+        self.z = 0.0
+        self.v = 0.0
+        self.voltage = 0.0
+        self.relay = False
+        self.sides = dict((name, 0) for name in self.masses)
+
+    def mainBL(self):
+        return self.BL * (1 + self.BL_gradient * self.z
+                          + self.BL_curvature * self.z ** 2)
+
+    def current(self):
+        return self.voltage / self.resistance
+
+    def load(self):
+        # Weight of the placed masses acting on the coil end
+        return self.g * sum(self.masses[name] * side
+                            for name, side in self.sides.items())
+
+    def advance(self, t, sample=None):
+        # Integrate up to time t (semi-implicit Euler); sample(t) is called
+        # after every step, e.g. to record scan frames
+        while self.t < t:
+            h = min(self.step, t - self.t)
+            BL = self.mainBL() if self.relay else self.BL_drive
+            force = (BL * self.current() + self.load()
+                     - self.stiffness * self.z - self.damping * self.v)
+            self.v += force / self.mass * h
+            self.z += self.v * h
+
+            # Mechanical end stops of the beam
+            hit = np.abs(self.z) > self.stop
+            if np.any(hit):
+                self.z = np.where(hit, np.copysign(self.stop, self.z), self.z)
+                self.v = np.where(hit, 0.0, self.v)
+
+            self.t += h
+            if sample != None:
+                sample(self.t)
+
+    def fotodiode(self):
+        return (self.foto_yoffset + self.foto_slope * self.z
+                + self.foto_noise * self._normal() + self.pickup())
+
+    def induction(self):
+        emf = 0.0 * self.v if self.relay else self.mainBL() * self.v
+        return emf + self.induction_noise * self._normal() + self.pickup()
+
+    def pickup(self):
+        phase = 2 * np.pi * self.mains_freq * self.t
+        return self.mains * (np.sin(phase) + 0.3 * np.sin(3 * phase))
+
+    def shuntVoltage(self):
+        return (self.current() * self.shunt
+                + self.shunt_noise * self._normal())
+
+    def _normal(self):
+        # One standard normal sample per simulated balance
+        return self.rng.standard_normal(np.shape(self.z) or None)
+
+
+class SimScan(ScanRing):
+    # Frames sampled from the simulation at the scan rate
+    def __init__(self, backend, names, rate, seconds):
+        ScanRing.__init__(self, names, rate, seconds)
+        self.backend = backend
+        self.next = backend.sim.t
+        self.pending = []
+
+    def sample(self, t):
+        while self.next <= t:
+            self.pending.append([self.backend.readInput(name)
+                                 for name in self.names])
+            self.next += 1.0 / self.rate
+
+    def poll(self):
+        if len(self.pending) == 0:
+            return self.empty
+        block = np.array(self.pending)
+        self.pending = []
+        self._push(block)
+        return block
+
+
+class SimBackend(Backend):
+    # Runs the watt balance simulation on a virtual clock: time only
+    # advances in waitUntil, so loops run as fast as the host allows.
+    # Operator prompts are answered automatically.
+    def __init__(self, sim=None):
+        Backend.__init__(self)
+        self.sim = sim if sim != None else WattBalanceSim()
+
+    def setOutputs(self, voltages, wait=True):
+        if 0 in voltages:
+            self.sim.voltage = float(voltages[0])
+        return True
+
+    def readInput(self, name):
+        if name == 'fotodiode':
+            return self.sim.fotodiode()
+        if name == 'induction':
+            return self.sim.induction()
+        if name == 'shunt':
+            return self.sim.shuntVoltage()
+        raise KeyError(name)
+
+    def readChannel(self, ch):
+        # Fotodiode on channel 3, read through the 2x divider of readChannel
+        if ch == 3:
+            return self.sim.fotodiode() / 100
+        return 0.0
+
+    def startScan(self, rate, names, seconds):
+        self.stopScan()
+        self.scan = SimScan(self, names, rate, seconds)
+        return self.scan
+
+    def switchRelay(self, state):
+        self.sim.relay = bool(state)
+
+    def time(self):
+        return self.sim.t
+
+    def waitUntil(self, t):
+        if self.scan != None:
+            self.sim.advance(t, self.scan.sample)
+        else:
+            self.sim.advance(t)
+
+    def prompt(self, message):
+        print(message)
+
+    def changeMasses(self, message, masses):
+        print(message)
+        for name, side in masses.items():
+            self.sim.sides[name] = side
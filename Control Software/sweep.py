@@ -0,0 +1,127 @@
+import math
+
+import numpy as np
+
+from analysis import LockIn
+from positionloop import PositionLoop
+
+
+# One result row per lock-in frequency of every segment
+SWEEP_FIELDS = ('segment', 'tone', 'harmonic', 'freq', 'amplitude', 'center',
+                'x', 'v', 'lag', 'BL', 'sigma_BL')
+
+
+class VelocitySweep(object):
+    # Runs the velocity mode over a list of segments and pools the BL
+    # results. A segment is (periods, amplitudes, cycles) or (periods,
+    # amplitudes, cycles, center): the coil follows
+    #   center + sum(amplitude * sin(2 pi t / period))
+    # over all tones, a single tone for back-to-back sweeps or several for a
+    # multi-tone drive. After 'settle' seconds (dropped, for the PID
+    # transient) 'cycles' periods of the slowest tone are recorded from the
+    # scan and analysed with the lock-in at the harmonics of every tone.
+    # The coil is driven by a positionloop.PositionLoop in velocity mode.
+    def __init__(self, hw, gains, foto_slope, foto_yoffset, scan_inputs,
+                 scan_rate, dt=0.04, settle=1.0, harmonics=3, stream=None):
+        self.hw = hw
+        self.foto_slope = foto_slope
+        self.foto_yoffset = foto_yoffset
+        self.loop = PositionLoop(hw, gains, foto_slope, foto_yoffset, dt)
+        self.fotodiode = scan_inputs.index('fotodiode')
+        self.induction = scan_inputs.index('induction')
+        self.scan_rate = scan_rate
+        self.dt = dt
+        self.settle = settle
+        self.harmonics = harmonics
+        self.stream = stream
+
+        self.rows = []
+        self.lockins = []
+        # (coil_pos, induction) frames of every segment, e.g. for BLProfile
+        self.records = []
+
+    def run(self, segments):
+        # Runs all segments back to back, returns the pooled BL (see pooled)
+        for segment in segments:
+            self.runSegment(*segment)
+        self.hw.setOutput(0)
+        return self.pooled()
+
+    def runSegment(self, periods, amplitudes, cycles, center=0.0):
+        periods = tuple(float(p) for p in np.atleast_1d(periods))
+        amplitudes = tuple(float(a) for a in np.atleast_1d(amplitudes))
+        omegas = [2 * math.pi / period for period in periods]
+        duration = self.settle + cycles * max(periods)
+        # The record ends with the frame that completes the last cycle, not
+        # at a loop tick; ticks that run late would leave it short of it.
+        # At most twice the duration (e.g. a replay that ends), the lock-in
+        # rejects a record that is still too short.
+        needed = int(math.ceil(cycles * max(periods) * self.scan_rate))
+
+        self.loop.reset()
+        self.hw.readScan() # drop the frames before the segment
+        blocks = []
+        count = 0
+        recording = False
+
+        for t in self.loop.run(2 * duration):
+            self.loop.step(center + sum(a * math.sin(w * t)
+                                        for a, w in zip(amplitudes, omegas)))
+
+            block = self.hw.readScan()
+            if recording:
+                blocks.append(block)
+                count += len(block)
+                if count >= needed:
+                    break
+            elif t >= self.settle:
+                recording = True
+
+        frames = np.concatenate(blocks)[:needed]
+        coil = (frames[:, self.fotodiode] - self.foto_yoffset) / self.foto_slope
+        lockin = LockIn(coil, frames[:, self.induction], 1.0 / self.scan_rate,
+                        periods, self.harmonics)
+        self.lockins.append(lockin)
+        self.records.append((coil, frames[:, self.induction]))
+
+        x, v, u = lockin.amplitude()
+        segment = len(self.lockins) - 1
+        for i in range(len(lockin.freq)):
+            row = (segment, lockin.tone[i], lockin.harmonic[i],
+                   lockin.freq[i], amplitudes[lockin.tone[i]],
+                   center, x[i], v[i], lockin.lag[i], lockin.BL[i],
+                   lockin.sigma_BL[i])
+            self.rows.append(row)
+            if self.stream != None:
+                self.stream.append(*row)
+
+        print("Segment " + str(segment) + ": periods " + str(periods)
+              + " s  amplitudes " + str(amplitudes) + " m  center "
+              + str(center) + " m")
+        print(lockin.summary())
+        return lockin
+
+    def results(self):
+        # All result rows as a structured array with SWEEP_FIELDS
+        dtype = np.dtype([(name, 'f8') for name in SWEEP_FIELDS])
+        return np.array(self.rows, dtype=dtype)
+
+    def pooled(self, harmonic=1):
+        # Inverse variance weighted BL over the given harmonic of all tones
+        # and segments, its uncertainty and the Birge ratio sqrt(chi2/dof):
+        # well above 1 the segments disagree by more than their errors, e.g.
+        # because BL depends on velocity or position
+        r = self.results()
+        r = r[r['harmonic'] == harmonic]
+        w = 1.0 / r['sigma_BL'] ** 2
+        BL = (w * r['BL']).sum() / w.sum()
+        sigma = 1.0 / math.sqrt(w.sum())
+        birge = (math.sqrt((w * (r['BL'] - BL) ** 2).sum() / (len(r) - 1))
+                 if len(r) > 1 else float('nan'))
+        return BL, sigma, birge
+
+    def summary(self):
+        BL, sigma, birge = self.pooled()
+        return ("Sweep: " + str(len(self.lockins)) + " segments  BL = "
+                + '{:.5f}'.format(BL) + " +- " + '{:.5f}'.format(sigma)
+                + " Tm  Birge ratio = " + '{:.2f}'.format(birge))
@@ -0,0 +1,71 @@
+import numpy as np
+
+
+class Telemetry(object):
+    # Fixed-size ring buffer of loop variables as a structured NumPy array
+    # with one float field per variable. Every record is written twice,
+    # at i and i + capacity, so the last n <= capacity records are always
+    # one contiguous slice: window() returns a view without copying.
+    #
+    # With spill set to a file name, each completed lap of the ring (and the
+    # remainder on close) is appended to that file as raw records, so no
+    # record is lost when the ring wraps; read it back with loadSpill().
+    # With stream set to a recorder.Stream of the same fields, every record
+    # is also forwarded to that stream of the run recording.
+    def __init__(self, fields, capacity, spill=None, stream=None):
+        self.fields = tuple(fields)
+        self.dtype = np.dtype([(name, 'f8') for name in self.fields])
+        self.capacity = int(capacity)
+        self.storage = np.zeros(2 * self.capacity, dtype=self.dtype)
+        self.head = 0
+        self.count = 0
+        self.spilled = 0
+
+        self.spill = None
+        if spill != None:
+            self.spill = open(spill, 'wb')
+        self.stream = stream
+
+    def append(self, *values):
+        # One value per field, in field order
+        self.storage[self.head] = values
+        self.storage[self.head + self.capacity] = values
+        self.head += 1
+        self.count += 1
+        if self.stream != None:
+            self.stream.append(*values)
+
+        if self.head == self.capacity:
+            self.head = 0
+            if self.spill != None:
+                self.storage[:self.capacity].tofile(self.spill)
+                self.spilled = self.count
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def window(self, n):
+        # View of the last n records, oldest first
+        n = min(n, len(self))
+        end = self.head + self.capacity
+        return self.storage[end - n:end]
+
+    def data(self):
+        # All records still held in the ring
+        return self.window(self.capacity)
+
+    def mean(self, field, n):
+        return self.window(n)[field].mean()
+
+    def close(self):
+        if self.spill != None:
+            self.storage[:self.count - self.spilled].tofile(self.spill)
+            self.spilled = self.count
+            self.spill.close()
+            self.spill = None
+
+
+def loadSpill(path, fields):
+    # Records written by a Telemetry with spill, as a memory map
+    dtype = np.dtype([(name, 'f8') for name in fields])
+    return np.memmap(path, dtype=dtype, mode='r')